@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterable, List, Mapping, Union
+
+from transactions import TransactionTable, TRANSACTION_TYPES
+
+DATE_FORMAT = '%d/%m/%Y'
+_EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+
+Transactions = Union[TransactionTable, Mapping[str, List[Any]], Iterable[Mapping[str, Any]]]
+
+
+def transactions_frame(transactions: Transactions) -> pd.DataFrame:
+    """Build a DataFrame with one row per transaction.
+
+    Accepts a TransactionTable, a columnar ``{'date': [...], ...}`` mapping (the
+    columnar result layout) or an iterable of transaction records/dicts. Dates
+    are parsed once per distinct date string, which a statement has few of.
+    """
+    if isinstance(transactions, TransactionTable):
+        return _table_frame(transactions)
+    if isinstance(transactions, Mapping):
+        columns = transactions
+    else:
+        rows = list(transactions)
+        columns = {field: [txn[field] for txn in rows]
+                   for field in ('date', 'description', 'amount', 'type', 'category')}
+
+    return _frame(
+        dates=columns['date'],
+        descriptions=columns['description'],
+        amounts=np.asarray(columns['amount'], dtype='float64'),
+        types=pd.Categorical(columns['type'], categories=TRANSACTION_TYPES),
+        categories=pd.Categorical(columns['category']),
+    )
+
+
+def _table_frame(table: TransactionTable) -> pd.DataFrame:
+    # The table's code columns map straight onto categoricals without building
+    # strings. Buffers are copied so the table can still grow afterwards.
+    return _frame(
+        dates=_ordinal_dates(np.frombuffer(table.ordinals, dtype='int32')),
+        descriptions=table.descriptions,
+        amounts=np.frombuffer(table.amounts, dtype='float64').copy(),
+        types=pd.Categorical.from_codes(np.frombuffer(table.types, dtype='uint8').copy(), TRANSACTION_TYPES),
+        categories=pd.Categorical.from_codes(np.frombuffer(table.categories, dtype='uint16').copy(),
+                                             list(table.category_names)),
+    )
+
+
+def _ordinal_dates(ordinals: np.ndarray) -> np.ndarray:
+    """datetime64 dates from date ordinals, with 0 (unparseable) as NaT."""
+    days = (ordinals.astype('int64') - _EPOCH_ORDINAL).astype('datetime64[D]')
+    days[ordinals == 0] = np.datetime64('NaT')
+    return days.astype('datetime64[ns]')
+
+
+def _parse_dates(dates: List[str]) -> np.ndarray:
+    codes, unique_dates = pd.factorize(pd.Series(dates, dtype=object))
+    parsed = pd.to_datetime(pd.Series(unique_dates, dtype=object), format=DATE_FORMAT, errors='coerce')
+    if not len(codes):
+        return np.array([], dtype='datetime64[ns]')
+    return parsed.to_numpy()[codes]
+
+
+def _frame(dates, descriptions, amounts, types, categories) -> pd.DataFrame:
+    df = pd.DataFrame({
+        'date': dates if isinstance(dates, np.ndarray) else _parse_dates(dates),
+        'description': descriptions,
+        'amount': amounts,
+        'type': types,
+        'category': categories,
+    })
+    df['is_income'] = df['type'] == 'Income'
+    # Credits are shown as positive values; charges are already positive
+    df['value'] = np.where(df['is_income'], df['amount'].abs(), df['amount'])
+    return df
+
+
+def _week_labels(dates: pd.Series) -> pd.Series:
+    """Vectorized ``strftime('%Y-W%U')``: weeks start on Sunday, days before
+    the first Sunday of the year are week 00."""
+    sunday_based = (dates.dt.dayofweek + 1) % 7
+    week = (dates.dt.dayofyear - 1 + 7 - sunday_based) // 7
+    keys = dates.dt.year * 100 + week
+    return _format_keys(keys, lambda key: f"{key // 100}-W{key % 100:02d}")
+
+
+def _month_labels(dates: pd.Series) -> pd.Series:
+    keys = dates.dt.year * 100 + dates.dt.month
+    return _format_keys(keys, lambda key: f"{key // 100}-{key % 100:02d}")
+
+
+def _format_keys(keys: pd.Series, fmt) -> pd.Series:
+    # Only the distinct keys are formatted in Python
+    codes, uniques = pd.factorize(keys.astype('int64'), sort=True)
+    labels = pd.Categorical.from_codes(codes, [fmt(int(key)) for key in uniques])
+    return pd.Series(labels, index=keys.index)
+
+
+def summarize(df: pd.DataFrame) -> Dict[str, Any]:
+    """Income/expense totals and counts."""
+    income = df['value'][df['is_income']]
+    expense = df['value'][~df['is_income']]
+    total_income = float(income.sum())
+    total_expense = float(expense.sum())
+    return {
+        'total_income': round(total_income, 2),
+        'total_expense': round(total_expense, 2),
+        'net_balance': round(total_income - total_expense, 2),
+        'income_count': int(len(income)),
+        'expense_count': int(len(expense)),
+        'total_transactions': int(len(df))
+    }
+
+
+def time_series(df: pd.DataFrame, period: str = 'week') -> Dict[str, Any]:
+    """Income and per-category expense totals per week or month.
+
+    Returns ``{'periods': [...], 'series': [{'name', 'data'}, ...]}`` with an
+    "Income" series followed by one "Expense - <category>" series per expense
+    category, in name order.
+    """
+    dated = df[df['date'].notna()]
+    labels = _week_labels(dated['date']) if period == 'week' else _month_labels(dated['date'])
+    periods = list(labels.cat.categories)
+
+    income = dated['value'][dated['is_income']].groupby(labels[dated['is_income']], observed=False).sum()
+    series = [{'name': 'Income', 'data': income.reindex(periods, fill_value=0).round(2).tolist()}]
+
+    is_expense = ~dated['is_income']
+    expense = (dated['value'][is_expense]
+               .groupby([labels[is_expense], dated['category'][is_expense]], observed=True)
+               .sum()
+               .unstack(fill_value=0.0))
+    expense = expense.reindex(index=periods, fill_value=0.0)
+    for category in sorted(expense.columns):
+        series.append({'name': f'Expense - {category}',
+                       'data': expense[category].round(2).tolist()})
+    return {'periods': periods, 'series': series}
+
+
+def category_breakdown(df: pd.DataFrame, type_name: str, with_rows: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Total, count and average per category for one transaction type.
+
+    Categories are ordered by total, largest first. With ``with_rows`` each
+    entry also lists the row numbers of its transactions.
+    """
+    subset = df[df['type'] == type_name]
+    grouped = subset.groupby('category', observed=True)['value']
+    stats = grouped.agg(['sum', 'count']).sort_values('sum', ascending=False, kind='stable')
+    rows = grouped.indices if with_rows else None
+    breakdown = {}
+    for category, total, count in zip(stats.index, stats['sum'], stats['count']):
+        entry = {'total': float(total), 'count': int(count), 'average': float(total) / int(count)}
+        if rows is not None:
+            entry['rows'] = subset.index[rows[category]].tolist()
+        breakdown[category] = entry
+    return breakdown
+
+
+def analyze(transactions: Transactions, with_rows: bool = False) -> Dict[str, Any]:
+    """Summary, weekly/monthly series and category breakdowns in one pass over a frame."""
+    df = transactions if isinstance(transactions, pd.DataFrame) else transactions_frame(transactions)
+    weekly = time_series(df, 'week')
+    monthly = time_series(df, 'month')
+    return {
+        'summary': summarize(df),
+        'weekly': {'weeks': weekly['periods'], 'series': weekly['series']},
+        'monthly': {'months': monthly['periods'], 'series': monthly['series']},
+        'expense_by_category': category_breakdown(df, 'Expense', with_rows),
+        'income_by_category': category_breakdown(df, 'Income', with_rows),
+    }
@@ -1,15 +1,121 @@
-from flask import Flask, request, render_template_string
+from flask import (Flask, Request, Response, abort, current_app, request, render_template, jsonify, redirect,
+                   stream_with_context, url_for)
+import gzip
 import os
-from werkzeug.utils import secure_filename
-import pdfplumber
-from datetime import datetime
-import re
-from typing import Dict, List, Any
-from collections import defaultdict
-import json
+from typing import Dict, Iterable, List, Any, Tuple
+import tempfile
+import time
+import zlib
+
+from analytics import analyze
+from enbd_parser import ENBDStatementParser, CACHE_VERSION, check_page_count
+from instrumentation import MetricsRegistry, StageTimer
+from jobs import JobQueue, QueueFull
+from merchants import MerchantMap
+from result_store import ResultStore, SharedResultStore
+from sandbox import LimitExceeded, sandboxed_parse
+from statement_cache import ParseCache, DEFAULT_MAX_BYTES
+
+class SpooledUploadRequest(Request):
+    """Request that buffers file uploads in memory up to UPLOAD_SPILL_BYTES.
+
+    Werkzeug writes every upload over 500 KB to a temporary file. Spooling
+    keeps typical statements in memory and only larger ones go to disk, and
+    each upload gets its own buffer, so concurrent uploads cannot collide.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=current_app.config['UPLOAD_SPILL_BYTES'])
+
 
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = 'uploads'
+app.request_class = SpooledUploadRequest
+# Uploads are parsed from memory; larger requests are rejected with 413
+app.config['UPLOAD_SPILL_BYTES'] = int(os.environ.get('ENBD_UPLOAD_SPILL_BYTES', 16 * 1024 * 1024))
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('ENBD_MAX_UPLOAD_BYTES', 50 * 1024 * 1024))
+# Keep memory flat on very long statements: reopen each PDF every few pages
+# (LOW_MEMORY), or whenever the worker grows past MEMORY_BUDGET_MB
+app.config['LOW_MEMORY'] = os.environ.get('ENBD_LOW_MEMORY') == '1'
+app.config['MEMORY_BUDGET_MB'] = int(os.environ.get('ENBD_MEMORY_BUDGET_MB', 0)) or None
+# Parse uploads in a child process that is killed after SANDBOX_TIMEOUT
+# seconds, SANDBOX_CPU_SECONDS of CPU time or once it maps more than
+# SANDBOX_MEMORY_MB, so a hostile PDF cannot stall the server. Statements
+# over MAX_PAGES pages are refused either way.
+app.config['SANDBOX'] = os.environ.get('ENBD_SANDBOX') == '1'
+app.config['SANDBOX_TIMEOUT'] = float(os.environ.get('ENBD_SANDBOX_TIMEOUT', 60))
+app.config['SANDBOX_CPU_SECONDS'] = float(os.environ.get('ENBD_SANDBOX_CPU_SECONDS', 0)) or None
+app.config['SANDBOX_MEMORY_MB'] = int(os.environ.get('ENBD_SANDBOX_MEMORY_MB', 1024)) or None
+app.config['MAX_PAGES'] = int(os.environ.get('ENBD_MAX_PAGES', 0)) or None
+# Opt-in: cache entries are plaintext JSON of the parsed transactions,
+# including those of password-protected statements. Without a directory
+# every upload is parsed from scratch.
+app.config['PARSE_CACHE_DIR'] = os.environ.get('ENBD_PARSE_CACHE_DIR') or None
+app.config['PARSE_CACHE_MAX_BYTES'] = int(os.environ.get('ENBD_PARSE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+
+# Entries hold only the transactions and the page count (to check MAX_PAGES
+# on a hit), so they are kept apart from the full results parse_statement caches
+APP_CACHE_VERSION = 'app-2-' + CACHE_VERSION
+_parse_cache = None
+
+# Merchant category map learned across uploads and restarts; unset to use the
+# keyword rules alone
+app.config['MERCHANT_MAP'] = os.environ.get('ENBD_MERCHANT_MAP')
+_merchant_map = None
+
+# Background parsing: POST /jobs always queues; with ASYNC_UPLOADS the upload
+# form does too and redirects to a page that waits for the result
+app.config['ASYNC_UPLOADS'] = os.environ.get('ENBD_ASYNC_UPLOADS') == '1'
+app.config['JOB_WORKERS'] = int(os.environ.get('ENBD_JOB_WORKERS', 2))
+app.config['JOB_QUEUE_SIZE'] = int(os.environ.get('ENBD_JOB_QUEUE_SIZE', 100))
+app.config['JOB_RESULT_TTL'] = int(os.environ.get('ENBD_JOB_RESULT_TTL', 600))
+_job_queue = None
+
+# Parsed statements behind results pages and the JSON API; background job
+# results are served from the job queue instead
+app.config['RESULT_STORE_SIZE'] = int(os.environ.get('ENBD_RESULT_STORE_SIZE', 100))
+app.config['RESULT_TTL'] = int(os.environ.get('ENBD_RESULT_TTL', 600))
+# With several server processes (see serve.py) results and job states are
+# kept in this directory so any process can answer for them
+app.config['RESULT_STORE_DIR'] = os.environ.get('ENBD_RESULT_STORE_DIR')
+app.config['API_PAGE_SIZE'] = 100
+app.config['API_MAX_PAGE_SIZE'] = 1000
+_result_store = None
+
+# Results pages are sent in chunks of about STREAM_CHUNK_BYTES as they are
+# rendered, so the summary arrives before the tables
+app.config['STREAM_RESULTS'] = os.environ.get('ENBD_STREAM_RESULTS', '1') == '1'
+app.config['STREAM_CHUNK_BYTES'] = 8192
+# Gzip HTML, JSON and text responses over COMPRESS_MIN_BYTES for clients
+# that accept it; set ENBD_COMPRESS_RESPONSES=0 when a proxy does this
+app.config['COMPRESS_RESPONSES'] = os.environ.get('ENBD_COMPRESS_RESPONSES', '1') == '1'
+app.config['COMPRESS_LEVEL'] = int(os.environ.get('ENBD_COMPRESS_LEVEL', 6))
+app.config['COMPRESS_MIN_BYTES'] = 500
+COMPRESSIBLE_TYPES = {'text/html', 'text/plain', 'application/json'}
+
+# Stage latencies of this process, served at /metrics
+METRICS = MetricsRegistry()
+
+
+def get_parse_cache():
+    """Return the shared parse cache, or None when caching is disabled."""
+    global _parse_cache
+    directory = app.config.get('PARSE_CACHE_DIR')
+    if not directory:
+        return None
+    if _parse_cache is None or _parse_cache.directory != directory:
+        _parse_cache = ParseCache(directory, app.config['PARSE_CACHE_MAX_BYTES'])
+    return _parse_cache
+
+
+def get_merchant_map():
+    """Return the shared merchant map, or None when none is configured."""
+    global _merchant_map
+    path = app.config.get('MERCHANT_MAP')
+    if not path:
+        return None
+    if _merchant_map is None or _merchant_map.path != path:
+        _merchant_map = MerchantMap(path)
+    return _merchant_map
 
 UPLOAD_HTML = '''
 <!DOCTYPE html>
@@ -49,6 +155,24 @@ UPLOAD_HTML = '''
 </html>
 '''
 
+PENDING_HTML = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Parsing Statement</title>
+    <meta http-equiv="refresh" content="2">
+    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/materialize/1.0.0/css/materialize.min.css">
+</head>
+<body>
+<div class="container center-align">
+    <h4>Parsing your statement...</h4>
+    <p>Job {{ job.id }} is {{ job.status }}. This page refreshes until the results are ready.</p>
+    <div class="progress"><div class="indeterminate"></div></div>
+</div>
+</body>
+</html>
+'''
+
 RESULTS_HTML = '''
 <!DOCTYPE html>
 <html>
@@ -95,8 +219,13 @@ RESULTS_HTML = '''
 
     <h4>Weekly Income vs Expenses</h4>
     <div id="chart"></div>
+    <script>
+        // Started while the rest of the page is still streaming in
+        const chartsRequest = fetch({{ (api_base ~ '/charts') | tojson }});
+    </script>
     
-    <!-- Tabs for Income and Expense Lists -->
+    <!-- Tabs for Income and Expense Lists; the first page of the income table is
+         part of the page, other rows are fetched from the API when a tab is shown -->
     <div class="row">
         <div class="col s12">
             <ul class="tabs">
@@ -109,7 +238,7 @@ RESULTS_HTML = '''
         
         <div id="all-transactions" class="col s12">
             <h5>All Transactions</h5>
-            <table class="striped">
+            <table class="striped lazy-table" data-columns="date description amount type category">
                 <thead>
                     <tr>
                         <th>Date</th>
@@ -119,29 +248,14 @@ RESULTS_HTML = '''
                         <th>Category</th>
                     </tr>
                 </thead>
-                <tbody>
-                    {% for txn in results %}
-                        <tr>
-                            <td>{{ txn.date }}</td>
-                            <td>{{ txn.description }}</td>
-                            <td class="{% if txn.amount >= 0 %}green-text{% else %}red-text{% endif %}">
-                                {{ txn.amount }}
-                            </td>
-                            <td>
-                                <span class="chip {% if txn.type == 'Income' %}green{% else %}red{% endif %} white-text">
-                                    {{ txn.type }}
-                                </span>
-                            </td>
-                            <td>{{ txn.category }}</td>
-                        </tr>
-                    {% endfor %}
-                </tbody>
+                <tbody></tbody>
             </table>
         </div>
         
         <div id="income-transactions" class="col s12">
             <h5>Income Transactions</h5>
-            <table class="striped">
+            <table class="striped lazy-table" data-type="Income" data-columns="date description amount category"
+                   data-page="1" data-pages="{{ income_pages }}" data-total="{{ income_total }}">
                 <thead>
                     <tr>
                         <th>Date</th>
@@ -155,7 +269,7 @@ RESULTS_HTML = '''
                         <tr>
                             <td>{{ txn.date }}</td>
                             <td>{{ txn.description }}</td>
-                            <td class="green-text">{{ txn.amount }}</td>
+                            <td class="green-text">{{ "%.2f"|format(txn.amount) }}</td>
                             <td>{{ txn.category }}</td>
                         </tr>
                     {% endfor %}
@@ -165,7 +279,7 @@ RESULTS_HTML = '''
         
         <div id="expense-transactions" class="col s12">
             <h5>Expense Transactions</h5>
-            <table class="striped">
+            <table class="striped lazy-table" data-type="Expense" data-columns="date description amount category">
                 <thead>
                     <tr>
                         <th>Date</th>
@@ -174,16 +288,7 @@ RESULTS_HTML = '''
                         <th>Category</th>
                     </tr>
                 </thead>
-                <tbody>
-                    {% for txn in expense_transactions %}
-                        <tr>
-                            <td>{{ txn.date }}</td>
-                            <td>{{ txn.description }}</td>
-                            <td class="red-text">{{ txn.amount }}</td>
-                            <td>{{ txn.category }}</td>
-                        </tr>
-                    {% endfor %}
-                </tbody>
+                <tbody></tbody>
             </table>
         </div>
         
@@ -252,7 +357,7 @@ RESULTS_HTML = '''
                 </div>
             </div>
             
-            <!-- Detailed Category Transactions -->
+            <!-- Detailed Category Transactions, fetched when a card is opened -->
             <div class="row">
                 <div class="col s12">
                     <h6>Category Details</h6>
@@ -260,7 +365,8 @@ RESULTS_HTML = '''
                         <div class="card">
                             <div class="card-content">
                                 <span class="card-title">{{ category }} - AED {{ "%.2f"|format(data.total) }} ({{ data.count }} transactions)</span>
-                                <table class="striped">
+                                <table class="striped lazy-table" data-type="Expense" data-category="{{ category }}"
+                                       data-columns="date description amount" data-on-demand="1">
                                     <thead>
                                         <tr>
                                             <th>Date</th>
@@ -268,15 +374,7 @@ RESULTS_HTML = '''
                                             <th>Amount</th>
                                         </tr>
                                     </thead>
-                                    <tbody>
-                                        {% for txn in data.transactions %}
-                                            <tr>
-                                                <td>{{ txn.date }}</td>
-                                                <td>{{ txn.description }}</td>
-                                                <td class="red-text">AED {{ txn.amount }}</td>
-                                            </tr>
-                                        {% endfor %}
-                                    </tbody>
+                                    <tbody></tbody>
                                 </table>
                             </div>
                         </div>
@@ -291,58 +389,179 @@ RESULTS_HTML = '''
     </div>
 </div>
 <script>
-    const chartData = {{ chart_data | safe }};
-    const options = {
-        chart: { type: 'area', height: 400, zoom: { enabled: true } },
-        dataLabels: { enabled: false },
-        stroke: { curve: 'smooth' },
-        series: chartData.series,
-        xaxis: {
-            categories: chartData.weeks,
-            title: { text: 'Week' }
-        },
-        yaxis: {
-            title: { text: 'Amount (AED)' }
-        },
-        colors: ['#4CAF50', '#F44336', '#FF9800', '#2196F3', '#9C27B0', '#607D8B', '#795548', '#E91E63']
-    };
-    const chart = new ApexCharts(document.querySelector("#chart"), options);
-    chart.render();
-    
-    // Create pie charts for category breakdown
-    const expenseCategories = {{ expense_categories_json | safe }};
-    const incomeCategories = {{ income_categories_json | safe }};
-    
-    // Expense pie chart
-    if (Object.keys(expenseCategories).length > 0) {
-        const expensePieOptions = {
-            chart: { type: 'pie', height: 300 },
-            series: Object.values(expenseCategories).map(data => data.total),
-            labels: Object.keys(expenseCategories),
-            colors: ['#F44336', '#E91E63', '#9C27B0', '#673AB7', '#3F51B5', '#2196F3', '#03A9F4', '#00BCD4'],
-            legend: { position: 'bottom' }
-        };
-        const expensePieChart = new ApexCharts(document.querySelector("#expense-pie-chart"), expensePieOptions);
-        expensePieChart.render();
+    const apiBase = {{ api_base | tojson }};
+    const pageSize = {{ page_size | tojson }};
+
+    function amountCell(table, txn) {
+        const td = document.createElement('td');
+        const amount = Number(txn.amount).toFixed(2);
+        if (table.dataset.category) {
+            td.className = 'red-text';
+            td.textContent = 'AED ' + amount;
+        } else if (table.dataset.type) {
+            td.className = table.dataset.type === 'Income' ? 'green-text' : 'red-text';
+            td.textContent = amount;
+        } else {
+            td.className = txn.amount >= 0 ? 'green-text' : 'red-text';
+            td.textContent = amount;
+        }
+        return td;
     }
-    
-    // Income pie chart
-    if (Object.keys(incomeCategories).length > 0) {
-        const incomePieOptions = {
-            chart: { type: 'pie', height: 300 },
-            series: Object.values(incomeCategories).map(data => data.total),
-            labels: Object.keys(incomeCategories),
-            colors: ['#4CAF50', '#8BC34A', '#CDDC39', '#FFC107', '#FF9800', '#FF5722', '#795548', '#607D8B'],
-            legend: { position: 'bottom' }
+
+    function typeCell(txn) {
+        const td = document.createElement('td');
+        const chip = document.createElement('span');
+        chip.className = 'chip white-text ' + (txn.type === 'Income' ? 'green' : 'red');
+        chip.textContent = txn.type;
+        td.appendChild(chip);
+        return td;
+    }
+
+    function appendRows(table, items) {
+        const tbody = table.querySelector('tbody');
+        for (const txn of items) {
+            const tr = document.createElement('tr');
+            for (const column of table.dataset.columns.split(' ')) {
+                let td;
+                if (column === 'amount') {
+                    td = amountCell(table, txn);
+                } else if (column === 'type') {
+                    td = typeCell(txn);
+                } else {
+                    td = document.createElement('td');
+                    td.textContent = txn[column];
+                }
+                tr.appendChild(td);
+            }
+            tbody.appendChild(tr);
+        }
+    }
+
+    function moreButton(table) {
+        if (!table.moreButton) {
+            const button = document.createElement('button');
+            button.className = 'btn-flat';
+            button.type = 'button';
+            button.addEventListener('click', () => loadPage(table));
+            table.after(button);
+            table.moreButton = button;
+        }
+        return table.moreButton;
+    }
+
+    // Fetch the next page of a table's rows
+    async function loadPage(table) {
+        if (table.loading || table.done) {
+            return;
+        }
+        table.loading = true;
+        const page = (table.page || 0) + 1;
+        const params = new URLSearchParams({page: page, per_page: pageSize});
+        if (table.dataset.type) {
+            params.set('type', table.dataset.type);
+        }
+        if (table.dataset.category) {
+            params.set('category', table.dataset.category);
+        }
+        const button = moreButton(table);
+        button.textContent = 'Loading...';
+        try {
+            const response = await fetch(apiBase + '/transactions?' + params);
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            const data = await response.json();
+            appendRows(table, data.items);
+            table.page = page;
+            table.done = page >= data.pages;
+            button.textContent = 'Show more (' + (data.total - Math.min(page * data.per_page, data.total)) + ' left)';
+            button.style.display = table.done ? 'none' : '';
+        } catch (error) {
+            button.textContent = 'Could not load transactions, try again';
+        } finally {
+            table.loading = false;
+        }
+    }
+
+    // Pick up after the rows that came with the page
+    function resumeTable(table) {
+        table.page = Number(table.dataset.page);
+        table.done = table.page >= Number(table.dataset.pages);
+        if (!table.done) {
+            const left = Number(table.dataset.total) - table.page * pageSize;
+            moreButton(table).textContent = 'Show more (' + left + ' left)';
+        }
+    }
+
+    function loadVisibleTables(panel) {
+        for (const table of panel.querySelectorAll('.lazy-table')) {
+            if (!table.page) {
+                if (table.dataset.onDemand) {
+                    const button = moreButton(table);
+                    button.textContent = 'Show transactions';
+                } else {
+                    loadPage(table);
+                }
+            }
+        }
+    }
+
+    async function renderCharts() {
+        const response = await chartsRequest;
+        const charts = await response.json();
+        const chartData = charts.weekly;
+        const options = {
+            chart: { type: 'area', height: 400, zoom: { enabled: true } },
+            dataLabels: { enabled: false },
+            stroke: { curve: 'smooth' },
+            series: chartData.series,
+            xaxis: {
+                categories: chartData.weeks,
+                title: { text: 'Week' }
+            },
+            yaxis: {
+                title: { text: 'Amount (AED)' }
+            },
+            colors: ['#4CAF50', '#F44336', '#FF9800', '#2196F3', '#9C27B0', '#607D8B', '#795548', '#E91E63']
         };
-        const incomePieChart = new ApexCharts(document.querySelector("#income-pie-chart"), incomePieOptions);
-        incomePieChart.render();
+        new ApexCharts(document.querySelector("#chart"), options).render();
+
+        // Create pie charts for category breakdown
+        const expenseCategories = charts.expense_by_category;
+        const incomeCategories = charts.income_by_category;
+
+        // Expense pie chart
+        if (Object.keys(expenseCategories).length > 0) {
+            const expensePieOptions = {
+                chart: { type: 'pie', height: 300 },
+                series: Object.values(expenseCategories).map(data => data.total),
+                labels: Object.keys(expenseCategories),
+                colors: ['#F44336', '#E91E63', '#9C27B0', '#673AB7', '#3F51B5', '#2196F3', '#03A9F4', '#00BCD4'],
+                legend: { position: 'bottom' }
+            };
+            new ApexCharts(document.querySelector("#expense-pie-chart"), expensePieOptions).render();
+        }
+
+        // Income pie chart
+        if (Object.keys(incomeCategories).length > 0) {
+            const incomePieOptions = {
+                chart: { type: 'pie', height: 300 },
+                series: Object.values(incomeCategories).map(data => data.total),
+                labels: Object.keys(incomeCategories),
+                colors: ['#4CAF50', '#8BC34A', '#CDDC39', '#FFC107', '#FF9800', '#FF5722', '#795548', '#607D8B'],
+                legend: { position: 'bottom' }
+            };
+            new ApexCharts(document.querySelector("#income-pie-chart"), incomePieOptions).render();
+        }
     }
-    
-    // Initialize Materialize tabs
+
+    // Initialize Materialize tabs; each tab's table is fetched the first time it is shown
     document.addEventListener('DOMContentLoaded', function() {
         var elems = document.querySelectorAll('.tabs');
-        var instances = M.Tabs.init(elems);
+        var instances = M.Tabs.init(elems, { onShow: loadVisibleTables });
+        document.querySelectorAll('.lazy-table[data-page]').forEach(resumeTable);
+        loadVisibleTables(document.querySelector('#income-transactions'));
+        renderCharts();
     });
 </script>
 <script src="https://cdnjs.cloudflare.com/ajax/libs/materialize/1.0.0/js/materialize.min.js"></script>
@@ -350,181 +569,449 @@ RESULTS_HTML = '''
 </html>
 '''
 
-def categorize(description: str) -> str:
-    desc = description.lower()
-    if any(x in desc for x in ['restaurant', 'talabat', 'kfc', 'hardees', 'soho garden', 'gazebo', 'tasty pizza', 
-                              'pulao', 'shake', 'cafe', 'noon minutes', 'wakha', 'meraki', 'hot n spicy', 'pak darbar',
-                              'apna kabab', 'mcdonalds', 'carrefour food', 'fillicafe']):
-        return "Food & Dining"
-    if any(x in desc for x in ['taxi', 'careem', 'zo feur', 'dubai taxi', 'emarat', 'epcco', 'enoc', 
-                              'car rental', 'hala']):
-        return "Transport" 
-    if any(x in desc for x in ['noon.com', 'carrefour', 'home centre', 'pakistan supermarket', 'supermarket',
-                              'minutes', 'apple.com', 'itunes', 'openai', 'netflix', 'cursor']):
-        return "Shopping"
-    if any(x in desc for x in ['platiniumlist', 'reel entertainment', 'soho garden', 'expedia', 'leisure',
-                              'mmall', 'smart dubai government']):
-        return "Entertainment"
-    if any(x in desc for x in ['dewa', 'electricity', 'smart dubai', 'etisalat', 'du', 'swyp']):
-        return "Utilities"
-    if any(x in desc for x in ['salon', 'barber', 'dry clean', 'laundry', 'spa']):
-        return "Personal Care"
-    if any(x in desc for x in ['openai', 'netflix', 'whoop', 'cursor', 'apple', 'itunes', 'chatgpt']):
-        return "Subscription/Online"
-    return "Others"
-
-def determine_transaction_type(amount: float, description: str) -> str:
-    """Determine if transaction is income or expense based on amount and description."""
-    desc = description.lower()
-    
-    # For credit card statements: positive amounts are expenses, negative amounts are credits/income
-    if amount > 0:
-        # Positive amounts are typically expenses (charges on credit card)
-        return "Expense"
+# Compiled once here rather than on every request
+UPLOAD_TEMPLATE = app.jinja_env.from_string(UPLOAD_HTML)
+PENDING_TEMPLATE = app.jinja_env.from_string(PENDING_HTML)
+RESULTS_TEMPLATE = app.jinja_env.from_string(RESULTS_HTML)
+
+def parse_upload(source, password: str, timer: StageTimer = None) -> List[Dict[str, Any]]:
+    """Parse an uploaded PDF, given as bytes or a seekable binary file,
+    going through the parse cache when enabled.
+
+    Stages are recorded to timer; without one they go straight to the app's
+    metrics, as for background jobs.
+    """
+    if timer is None:
+        timer = StageTimer()
+        try:
+            return parse_upload(source, password, timer)
+        finally:
+            METRICS.observe_timer(timer)
+    cache = get_parse_cache()
+    merchant_map = get_merchant_map()
+    cached = None
+    if cache is not None:
+        with timer.stage('cache_lookup'):
+            version = APP_CACHE_VERSION
+            if merchant_map is not None:
+                version += '-' + merchant_map.version()
+            cache_key = ParseCache.key(source, version, password)
+            cached = cache.get(cache_key)
+    budget = app.config.get('MEMORY_BUDGET_MB')
+    options = dict(low_memory=app.config.get('LOW_MEMORY', False),
+                   memory_budget=budget * 1024 * 1024 if budget else None,
+                   max_pages=app.config.get('MAX_PAGES'))
+    try:
+        if cached is not None:
+            # MAX_PAGES may be lower than when the statement was cached
+            check_page_count(cached['page_count'], options['max_pages'])
+            timer.count('cache_hits')
+            return cached['transactions']
+        if app.config.get('SANDBOX'):
+            transactions, page_count = parse_sandboxed(source, password, timer, merchant_map, options)
+        else:
+            parser = ENBDStatementParser(source, password, instrumentation=timer, categorizer=merchant_map,
+                                         **options)
+            transactions = [txn.to_dict() for txn in parser.iter_transactions()]
+            page_count = parser.page_count
+            if merchant_map is not None:
+                merchant_map.save()
+    except LimitExceeded as e:
+        timer.count(f'limit_{e.limit}')
+        raise
+    if cache is not None:
+        with timer.stage('cache_store'):
+            cache.put(cache_key, {'transactions': transactions, 'page_count': page_count})
+    return transactions
+
+
+def parse_sandboxed(source, password: str, timer: StageTimer, merchant_map: MerchantMap,
+                    options: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int]:
+    """Parse in a child process under the SANDBOX_* limits; returns the
+    transactions and page count, or raises LimitExceeded."""
+    memory_mb = app.config.get('SANDBOX_MEMORY_MB')
+    with timer.stage('sandbox'):
+        result = sandboxed_parse(source, password, timeout=app.config['SANDBOX_TIMEOUT'],
+                                 cpu_time=app.config.get('SANDBOX_CPU_SECONDS'),
+                                 memory_limit=memory_mb * 1024 * 1024 if memory_mb else None,
+                                 merchant_map=merchant_map.path if merchant_map is not None else None,
+                                 **options)
+    for stage, seconds in result['metadata']['stages'].items():
+        timer.add(stage, seconds)
+    for name, n in result['metadata']['counts'].items():
+        timer.count(name, n)
+    if merchant_map is not None:
+        # The child learned into the file
+        merchant_map.load()
+    return result['transactions'], result['metadata']['page_count']
+
+
+class StatementView:
+    """A parsed statement prepared for the results page and the JSON API.
+
+    The analytics pass runs once, when the statement is stored; pages of the
+    transaction list are then sliced out of precomputed row indices.
+    """
+
+    def __init__(self, transactions: List[Dict[str, Any]]):
+        self.transactions = transactions
+        # Totals, weekly chart series and category breakdowns in one vectorized pass
+        stats = analyze(transactions, with_rows=True)
+        self.summary = stats['summary']
+        self.weekly = stats['weekly']
+        self.breakdowns = {'Expense': stats['expense_by_category'],
+                           'Income': stats['income_by_category']}
+        self.type_rows = {
+            type_name: sorted(i for data in breakdown.values() for i in data['rows'])
+            for type_name, breakdown in self.breakdowns.items()
+        }
+
+    def categories(self, type_name: str) -> Dict[str, Dict[str, Any]]:
+        """Total, count and average per category of one type, without the rows."""
+        return {category: {key: value for key, value in data.items() if key != 'rows'}
+                for category, data in self.breakdowns[type_name].items()}
+
+    def rows(self, type_name: str = None, category: str = None) -> List[int]:
+        """Row numbers of the transactions matching the filters, in statement order."""
+        if category is not None:
+            types = [type_name] if type_name else list(self.breakdowns)
+            rows = [i for t in types for i in self.breakdowns[t].get(category, {}).get('rows', ())]
+            return sorted(rows) if len(types) > 1 else rows
+        if type_name is not None:
+            return self.type_rows[type_name]
+        return range(len(self.transactions))
+
+
+def get_result_store() -> ResultStore:
+    """Return the store of parsed statements shown on results pages."""
+    global _result_store
+    if _result_store is None:
+        directory = app.config.get('RESULT_STORE_DIR')
+        if directory:
+            _result_store = SharedResultStore(directory, max_entries=app.config['RESULT_STORE_SIZE'],
+                                              ttl=app.config['RESULT_TTL'])
+        else:
+            _result_store = ResultStore(max_entries=app.config['RESULT_STORE_SIZE'],
+                                        ttl=app.config['RESULT_TTL'])
+    return _result_store
+
+
+def publish_job(job) -> None:
+    """Copy a job's state to the shared result store for other processes."""
+    get_result_store().put(job.snapshot(), key='job-' + job.id)
+
+
+def get_job(job_id: str):
+    """Look up a background job, in this process or published by another one."""
+    job = get_job_queue().get(job_id)
+    if job is None and app.config.get('RESULT_STORE_DIR'):
+        job = get_result_store().get('job-' + job_id)
+    return job
+
+
+def get_statement(statement_id: str):
+    """Look up a stored statement or the result of a finished job by id."""
+    statement = get_result_store().get(statement_id)
+    if statement is None:
+        job = get_job(statement_id)
+        if job is not None and job.status == 'done':
+            statement = job.result
+    return statement
+
+
+def prepare_upload(source, password: str) -> StatementView:
+    """Parse an upload and prepare it for display; runs as a background job."""
+    return StatementView(parse_upload(source, password))
+
+
+def stream_rendered(template, context: Dict[str, Any], metrics: MetricsRegistry = None) -> Iterable[str]:
+    """Render a template in chunks of about STREAM_CHUNK_BYTES.
+
+    The time spent rendering, not waiting on the client, is recorded to
+    metrics as the render stage once the last chunk is out.
+    """
+    chunk_size = app.config['STREAM_CHUNK_BYTES']
+    elapsed = 0.0
+    start = time.perf_counter()
+    buffered, size = [], 0
+    for piece in template.generate(context):
+        buffered.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            elapsed += time.perf_counter() - start
+            yield ''.join(buffered)
+            start = time.perf_counter()
+            buffered, size = [], 0
+    elapsed += time.perf_counter() - start
+    if buffered:
+        yield ''.join(buffered)
+    if metrics is not None:
+        metrics.observe('render', elapsed)
+
+
+def render_results(statement_id: str, statement: StatementView, metrics: MetricsRegistry = METRICS) -> Response:
+    """Render the results page for a parsed statement.
+
+    The summary, category totals and the first page of the income table are
+    rendered; other tables and the charts are fetched from the JSON API by
+    the page. With STREAM_RESULTS the page is sent as it renders, so the
+    summary reaches the browser before the table rows. The render stage is
+    recorded to metrics, if given.
+    """
+    per_page = app.config['API_PAGE_SIZE']
+    income_rows = statement.rows('Income')
+    context = dict(api_base=url_for('api_statement', statement_id=statement_id),
+                   page_size=per_page,
+                   summary=statement.summary,
+                   expense_by_category=statement.categories('Expense'),
+                   income_by_category=statement.categories('Income'),
+                   income_transactions=[statement.transactions[i] for i in income_rows[:per_page]],
+                   income_pages=(len(income_rows) + per_page - 1) // per_page,
+                   income_total=len(income_rows))
+    if app.config.get('STREAM_RESULTS'):
+        app.update_template_context(context)
+        return Response(stream_with_context(stream_rendered(RESULTS_TEMPLATE, context, metrics)),
+                        mimetype='text/html')
+    start = time.perf_counter()
+    response = Response(render_template(RESULTS_TEMPLATE, **context), mimetype='text/html')
+    if metrics is not None:
+        metrics.observe('render', time.perf_counter() - start)
+    return response
+
+
+def _gzip_chunks(chunks: Iterable, level: int) -> Iterable[bytes]:
+    """Gzip a streamed body, flushing after every chunk so none is held back."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    """Gzip HTML, JSON and text responses for clients that accept gzip."""
+    if (not app.config.get('COMPRESS_RESPONSES') or response.direct_passthrough
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings['gzip'] <= 0:
+        return response
+    level = app.config['COMPRESS_LEVEL']
+    if response.is_streamed:
+        response.response = _gzip_chunks(response.response, level)
+        response.headers.pop('Content-Length', None)
     else:
-        # Negative amounts are typically income/credits (payments, refunds, cashbacks)
-        return "Income"
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_BYTES']:
+            return response
+        response.set_data(gzip.compress(data, level, mtime=0))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
 
 
-class ENBDStatementParser:
-    def __init__(self, pdf_path: str, password: str = None):
-        self.pdf_path = pdf_path
-        self.password = password
-        self.transactions = []
-        
-    def extract_text(self) -> List[str]:
-        with pdfplumber.open(self.pdf_path, password=self.password) as pdf:
-            return [page.extract_text() for page in pdf.pages if page.extract_text()]
-
-    def parse_transactions(self, pages: List[str]) -> None:
-        for page in pages:
-            for line in page.split('\n'):
-                match = re.search(r'(\d{2}/\d{2}/\d{4}).+?([A-Z].+?)\s+([-\d,.]+)$', line)
-                if match:
-                    date_str, description, amount_str = match.groups()
-                    try:
-                        date_obj = datetime.strptime(date_str, '%d/%m/%Y')
-                        amount = float(amount_str.replace(',', ''))
-                        transaction_type = determine_transaction_type(amount, description)
-                        self.transactions.append({
-                            'date': date_obj.strftime('%d/%m/%Y'),
-                            'description': description.strip(),
-                            'amount': round(amount, 2),
-                            'type': transaction_type,
-                            'category': categorize(description)
-                        })
-                    except:
-                        continue
-
-    def parse(self) -> List[Dict[str, Any]]:
-        pages = self.extract_text()
-        self.parse_transactions(pages)
-        return self.transactions
+def get_job_queue() -> JobQueue:
+    """Return the shared background parse queue, creating it on first use."""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(workers=app.config['JOB_WORKERS'],
+                              max_queue=app.config['JOB_QUEUE_SIZE'],
+                              result_ttl=app.config['JOB_RESULT_TTL'],
+                              on_update=publish_job if app.config.get('RESULT_STORE_DIR') else None)
+    return _job_queue
+
+
+def shutdown_jobs(timeout: float = None) -> int:
+    """Let this process's background jobs finish before it exits; returns
+    how many were failed instead, after timeout seconds."""
+    if _job_queue is None:
+        return 0
+    return _job_queue.close(timeout)
+
+
+def enqueue_upload():
+    """Validate the upload in the current request and queue it for parsing.
+
+    Returns the job, or an error response if the upload is missing or the
+    queue is full. The job gets the upload's bytes, since the request's
+    buffer is gone once the response is sent.
+    """
+    if 'file' not in request.files:
+        return None, ('No file part', 400)
+    file = request.files['file']
+    password = request.form.get('password', '')
+    if file.filename == '':
+        return None, ('No selected file', 400)
+    try:
+        return get_job_queue().submit(prepare_upload, file.read(), password), None
+    except QueueFull as e:
+        return None, (str(e), 503)
+
 
 @app.route('/', methods=['GET', 'POST'])
 def upload_file():
     if request.method == 'POST':
+        if app.config['ASYNC_UPLOADS']:
+            job, error = enqueue_upload()
+            if error:
+                return error
+            return redirect(url_for('job_result', job_id=job.id), code=303)
+
         if 'file' not in request.files:
             return 'No file part'
         file = request.files['file']
         password = request.form.get('password', '')
         if file.filename == '':
             return 'No selected file'
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(file.filename))
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-        file.save(filepath)
 
+        timer = StageTimer()
         try:
-            parser = ENBDStatementParser(filepath, password)
-            transactions = parser.parse()
+            with timer.stage('request'):
+                # The upload is parsed straight from its spooled request buffer
+                try:
+                    statement = StatementView(parse_upload(file.stream, password, timer))
+                except ValueError as e:
+                    return f'Could not parse the statement: {e}', 422
+                statement_id = get_result_store().put(statement)
+                # Rendering is timed by render_results, as the page is sent
+                return render_results(statement_id, statement)
+        finally:
+            METRICS.observe_timer(timer)
 
-            # Segregate transactions by income and expense
-            income_transactions = [txn for txn in transactions if txn['type'] == 'Income']
-            expense_transactions = [txn for txn in transactions if txn['type'] == 'Expense']
+    return render_template(UPLOAD_TEMPLATE)
 
-            # Calculate totals for credit card statement
-            total_income = sum(abs(txn['amount']) for txn in income_transactions)  # Credits/payments (negative amounts, show as positive)
-            total_expense = sum(txn['amount'] for txn in expense_transactions)  # Charges (positive amounts)
-            net_balance = total_income - total_expense  # Net payment vs charges
 
-            # Weekly data for chart - separate income and expenses
-            weekly_income = defaultdict(float)
-            weekly_expense = defaultdict(lambda: defaultdict(float))
-            
-            for txn in transactions:
-                date_obj = datetime.strptime(txn['date'], '%d/%m/%Y')
-                week = date_obj.strftime('%Y-W%U')
-                
-                if txn['type'] == 'Income':
-                    weekly_income[week] += abs(txn['amount'])  # Show credits as positive values
-                else:
-                    category = txn['category']
-                    weekly_expense[week][category] += txn['amount']  # Expenses are already positive
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue an uploaded statement and return its job id right away."""
+    job, error = enqueue_upload()
+    if error:
+        message, status = error
+        return jsonify({'error': message}), status
+    return jsonify({
+        'job_id': job.id,
+        'status_url': url_for('job_status', job_id=job.id),
+        'result_url': url_for('job_result', job_id=job.id),
+        'api_url': url_for('api_statement', statement_id=job.id)
+    }), 202
 
-            weeks = sorted(set(list(weekly_income.keys()) + list(weekly_expense.keys())))
-            
-            # Create series for chart
-            series = []
-            
-            # Add income series
-            income_data = [round(weekly_income.get(week, 0), 2) for week in weeks]
-            series.append({'name': 'Income', 'data': income_data})
-            
-            # Add expense categories
-            all_expense_categories = set(cat for week_data in weekly_expense.values() for cat in week_data)
-            for cat in sorted(all_expense_categories):
-                data = [round(weekly_expense[week].get(cat, 0), 2) for week in weeks]
-                series.append({'name': f'Expense - {cat}', 'data': data})
 
-            chart_data = {'weeks': weeks, 'series': series}
-            
-            # Prepare summary data
-            summary = {
-                'total_income': round(total_income, 2),
-                'total_expense': round(total_expense, 2),
-                'net_balance': round(net_balance, 2),
-                'income_count': len(income_transactions),
-                'expense_count': len(expense_transactions)
-            }
-            
-            # Calculate category-wise breakdown
-            expense_by_category = {}
-            income_by_category = {}
-            
-            for txn in expense_transactions:
-                category = txn['category']
-                if category not in expense_by_category:
-                    expense_by_category[category] = {'total': 0, 'count': 0, 'transactions': []}
-                expense_by_category[category]['total'] += txn['amount']
-                expense_by_category[category]['count'] += 1
-                expense_by_category[category]['transactions'].append(txn)
-            
-            for txn in income_transactions:
-                category = txn['category']
-                if category not in income_by_category:
-                    income_by_category[category] = {'total': 0, 'count': 0, 'transactions': []}
-                income_by_category[category]['total'] += abs(txn['amount'])
-                income_by_category[category]['count'] += 1
-                income_by_category[category]['transactions'].append(txn)
-            
-            # Sort categories by total amount (descending)
-            expense_by_category = dict(sorted(expense_by_category.items(), key=lambda x: x[1]['total'], reverse=True))
-            income_by_category = dict(sorted(income_by_category.items(), key=lambda x: x[1]['total'], reverse=True))
-            
-            return render_template_string(RESULTS_HTML, 
-                                        results=transactions, 
-                                        chart_data=json.dumps(chart_data),
-                                        summary=summary,
-                                        income_transactions=income_transactions,
-                                        expense_transactions=expense_transactions,
-                                        expense_by_category=expense_by_category,
-                                        income_by_category=income_by_category,
-                                        expense_categories_json=json.dumps(expense_by_category),
-                                        income_categories_json=json.dumps(income_by_category))
-        finally:
-            os.remove(filepath)
+@app.route('/jobs/stats')
+def job_stats():
+    return jsonify(get_job_queue().stats())
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Results page of a finished job; JSON with ?format=json.
+
+    While the job is pending this answers 202, with a page that reloads itself
+    for browsers.
+    """
+    job = get_job(job_id)
+    wants_json = request.args.get('format') == 'json'
+    if job is None:
+        if wants_json:
+            return jsonify({'error': 'Unknown or expired job'}), 404
+        return 'Unknown or expired job', 404
+    if job.status in ('queued', 'running'):
+        if wants_json:
+            return jsonify(job.to_dict()), 202
+        return render_template(PENDING_TEMPLATE, job=job.to_dict()), 202
+    if job.status == 'failed':
+        if wants_json:
+            return jsonify(job.to_dict()), 500
+        return f'Could not parse the statement: {job.error}', 500
+    if wants_json:
+        return jsonify({'job': job.to_dict(), 'transactions': job.result.transactions})
+    return render_results(job.id, job.result)
+
+
+def _statement_or_404(statement_id: str) -> StatementView:
+    statement = get_statement(statement_id)
+    if statement is None:
+        abort(404, description='Unknown or expired statement')
+    return statement
+
+
+@app.errorhandler(404)
+def not_found(error):
+    if request.path.startswith('/api/'):
+        return jsonify({'error': error.description}), 404
+    return error
+
+
+@app.route('/api/statements/<statement_id>')
+def api_statement(statement_id):
+    """Summary and per-category totals of a parsed statement."""
+    statement = _statement_or_404(statement_id)
+    return jsonify({
+        'summary': statement.summary,
+        'expense_by_category': statement.categories('Expense'),
+        'income_by_category': statement.categories('Income')
+    })
+
+
+@app.route('/api/statements/<statement_id>/charts')
+def api_statement_charts(statement_id):
+    """Weekly income/expense series and category totals for the charts."""
+    statement = _statement_or_404(statement_id)
+    return jsonify({
+        'weekly': statement.weekly,
+        'expense_by_category': statement.categories('Expense'),
+        'income_by_category': statement.categories('Income')
+    })
+
+
+@app.route('/api/statements/<statement_id>/transactions')
+def api_statement_transactions(statement_id):
+    """One page of transactions, optionally filtered by ?type= and ?category=.
+
+    ``page`` starts at 1 and ``per_page`` defaults to API_PAGE_SIZE, capped at
+    API_MAX_PAGE_SIZE.
+    """
+    statement = _statement_or_404(statement_id)
+    type_name = request.args.get('type') or None
+    if type_name is not None and type_name not in statement.breakdowns:
+        return jsonify({'error': f'Unknown type {type_name!r}'}), 400
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', app.config['API_PAGE_SIZE'], type=int)
+    if page < 1 or per_page < 1:
+        return jsonify({'error': 'page and per_page must be positive'}), 400
+    per_page = min(per_page, app.config['API_MAX_PAGE_SIZE'])
+
+    rows = statement.rows(type_name, request.args.get('category') or None)
+    start = (page - 1) * per_page
+    return jsonify({
+        'items': [statement.transactions[i] for i in rows[start:start + per_page]],
+        'page': page,
+        'per_page': per_page,
+        'total': len(rows),
+        'pages': (len(rows) + per_page - 1) // per_page
+    })
+
 
-    return render_template_string(UPLOAD_HTML)
+@app.route('/metrics')
+def metrics():
+    """Stage latency histograms and counters in the Prometheus text format."""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
-    app.run(port=8000, debug=True)
+    # Development server; use serve.py in production
+    app.run(port=8000, debug=os.environ.get('ENBD_DEBUG') == '1')
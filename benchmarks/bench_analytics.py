@@ -0,0 +1,118 @@
+"""
+Benchmark for weekly and category aggregation.
+
+Runs the per-transaction loops the upload view used (strptime per row, nested
+defaultdicts, one loop per breakdown) against analytics.analyze() on 1k, 100k
+and 1M synthetic transactions, after checking that both agree.
+
+Usage:
+    python benchmarks/bench_analytics.py [sizes...]
+"""
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import analyze
+from enbd_parser import CATEGORY_RULES
+from transactions import TransactionTable
+
+
+def legacy_aggregate(transactions):
+    """The aggregation code of the original upload_file view."""
+    income_transactions = [txn for txn in transactions if txn['type'] == 'Income']
+    expense_transactions = [txn for txn in transactions if txn['type'] == 'Expense']
+    total_income = sum(abs(txn['amount']) for txn in income_transactions)
+    total_expense = sum(txn['amount'] for txn in expense_transactions)
+
+    weekly_income = defaultdict(float)
+    weekly_expense = defaultdict(lambda: defaultdict(float))
+    for txn in transactions:
+        week = datetime.strptime(txn['date'], '%d/%m/%Y').strftime('%Y-W%U')
+        if txn['type'] == 'Income':
+            weekly_income[week] += abs(txn['amount'])
+        else:
+            weekly_expense[week][txn['category']] += txn['amount']
+    weeks = sorted(set(list(weekly_income.keys()) + list(weekly_expense.keys())))
+    series = [{'name': 'Income', 'data': [round(weekly_income.get(week, 0), 2) for week in weeks]}]
+    for cat in sorted(set(cat for week_data in weekly_expense.values() for cat in week_data)):
+        series.append({'name': f'Expense - {cat}',
+                       'data': [round(weekly_expense[week].get(cat, 0), 2) for week in weeks]})
+
+    expense_by_category = {}
+    income_by_category = {}
+    for txn in expense_transactions:
+        entry = expense_by_category.setdefault(txn['category'], {'total': 0, 'count': 0, 'transactions': []})
+        entry['total'] += txn['amount']
+        entry['count'] += 1
+        entry['transactions'].append(txn)
+    for txn in income_transactions:
+        entry = income_by_category.setdefault(txn['category'], {'total': 0, 'count': 0, 'transactions': []})
+        entry['total'] += abs(txn['amount'])
+        entry['count'] += 1
+        entry['transactions'].append(txn)
+    return {
+        'total_income': round(total_income, 2),
+        'total_expense': round(total_expense, 2),
+        'weeks': weeks,
+        'series': series,
+        'expense_by_category': dict(sorted(expense_by_category.items(), key=lambda x: x[1]['total'], reverse=True)),
+        'income_by_category': dict(sorted(income_by_category.items(), key=lambda x: x[1]['total'], reverse=True)),
+    }
+
+
+def synthetic_table(count: int, seed: int = 3) -> TransactionTable:
+    rng = random.Random(seed)
+    categories = [category for category, _ in CATEGORY_RULES] + ['Others']
+    table = TransactionTable()
+    for _ in range(count):
+        amount = round(rng.uniform(-1500, 3000), 2)
+        table.append({
+            'date': f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.choice([2023, 2024])}",
+            'description': 'MERCHANT',
+            'amount': amount,
+            'type': 'Expense' if amount > 0 else 'Income',
+            'category': rng.choice(categories),
+        })
+    return table
+
+
+def check(legacy, result):
+    assert legacy['weeks'] == result['weekly']['weeks']
+    for old, new in zip(legacy['series'], result['weekly']['series']):
+        assert old['name'] == new['name']
+        assert all(abs(a - b) < 0.011 for a, b in zip(old['data'], new['data']))
+    assert abs(legacy['total_income'] - result['summary']['total_income']) < 0.011
+    assert abs(legacy['total_expense'] - result['summary']['total_expense']) < 0.011
+    for key in ('expense_by_category', 'income_by_category'):
+        assert set(legacy[key]) == set(result[key])
+        for category, entry in legacy[key].items():
+            assert entry['count'] == result[key][category]['count']
+            assert abs(entry['total'] - result[key][category]['total']) < 0.01
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 100_000, 1_000_000]
+    print(f"{'transactions':>12} {'legacy loops':>14} {'analytics':>12} {'speedup':>8}")
+    for size in sizes:
+        table = synthetic_table(size)
+        rows = table.to_dicts()
+
+        start = time.perf_counter()
+        legacy = legacy_aggregate(rows)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = analyze(table)
+        new_time = time.perf_counter() - start
+
+        check(legacy, result)
+        print(f"{size:>12} {legacy_time:>13.3f}s {new_time:>11.3f}s {legacy_time / new_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
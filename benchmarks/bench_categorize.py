@@ -0,0 +1,79 @@
+"""
+Micro-benchmark for transaction categorization.
+
+Compares the original chain of ``any(x in desc ...)`` scans with the compiled
+``Categorizer`` (cold memo and warm memo) on synthetic descriptions.
+
+Usage:
+    python benchmarks/bench_categorize.py [count]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enbd_parser import Categorizer, CATEGORY_RULES
+
+
+def legacy_categorize(description: str) -> str:
+    """The keyword scan categorize() used before the compiled engine."""
+    desc = description.lower()
+    for category, keywords in CATEGORY_RULES:
+        if any(x in desc for x in keywords):
+            return category
+    return "Others"
+
+
+MERCHANTS = [
+    'CAREEM HALA RIDE', 'TALABAT.COM', 'NOON.COM', 'CARREFOUR HYPERMARKET', 'DEWA BILL PAYMENT',
+    'ETISALAT RECHARGE', 'NETFLIX.COM', 'APPLE.COM/BILL', 'OPENAI *CHATGPT SUBSCR', 'ENOC STATION',
+    'GENTS SALON', 'HOME CENTRE', 'KFC', 'STARBUCKS', 'AMAZON.AE', 'LULU HYPERMARKET',
+    'PAYMENT RECEIVED - THANK YOU', 'CASHBACK CREDIT', 'EXPEDIA TRAVEL', 'WHOOP INC',
+]
+CITIES = ['DUBAI AE', 'ABU DHABI AE', 'SHARJAH AE', 'AJMAN AE', '']
+
+
+def synthetic_descriptions(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    descriptions = []
+    for _ in range(count):
+        parts = [rng.choice(MERCHANTS)]
+        if rng.random() < 0.5:
+            parts.append(str(rng.randint(1, 9999)))
+        parts.append(rng.choice(CITIES))
+        descriptions.append(' '.join(p for p in parts if p))
+    return descriptions
+
+
+def bench(label, func, descriptions):
+    start = time.perf_counter()
+    for desc in descriptions:
+        func(desc)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.3f}s  {elapsed / len(descriptions) * 1e6:8.2f} us/txn")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    descriptions = synthetic_descriptions(count)
+
+    categorizer = Categorizer()
+    mismatches = sum(legacy_categorize(d) != categorizer.categorize(d) for d in descriptions)
+    if mismatches:
+        print(f"ERROR: {mismatches} descriptions categorized differently", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"{count} synthetic descriptions, {len(set(descriptions))} distinct")
+    legacy = bench("legacy any() scans", legacy_categorize, descriptions)
+    cold = bench("compiled, no memo", Categorizer(memo_size=0).categorize, descriptions)
+    memo = Categorizer()
+    warm = bench("compiled + LRU memo", memo.categorize, descriptions)
+    print(f"speedup: {legacy / cold:.1f}x without memo, {legacy / warm:.1f}x with memo "
+          f"({memo.cache_info().hits} memo hits)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Scaling benchmark for parallel page text extraction.
+
+Extracts the same statement with 1, 2, 4 and 8 workers, checks that every run
+returns exactly the serial output and prints wall time and speedup.
+
+Usage:
+    python benchmarks/bench_extract_workers.py statement.pdf [password]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enbd_parser import ENBDStatementParser
+
+WORKER_COUNTS = [1, 2, 4, 8]
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__.strip().splitlines()[-1].strip())
+        sys.exit(1)
+    pdf_path = sys.argv[1]
+    password = sys.argv[2] if len(sys.argv) > 2 else None
+
+    print(f"{os.path.basename(pdf_path)} on {os.cpu_count()} CPUs")
+    baseline = None
+    serial_time = None
+    for workers in WORKER_COUNTS:
+        start = time.perf_counter()
+        pages = ENBDStatementParser(pdf_path, password, workers=workers).extract_text()
+        elapsed = time.perf_counter() - start
+        if baseline is None:
+            baseline, serial_time = pages, elapsed
+        elif pages != baseline:
+            print(f"ERROR: output with {workers} workers differs from the serial path", file=sys.stderr)
+            sys.exit(1)
+        print(f"workers={workers:<2} {elapsed:8.3f}s  {len(pages) / elapsed:8.1f} pages/s  "
+              f"speedup {serial_time / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
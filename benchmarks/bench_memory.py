@@ -0,0 +1,119 @@
+"""
+Memory use of a parse over a very long statement.
+
+Generates a statement (1000 pages by default, each with a distinct image as
+real statements have, see statement_generator.py) and parses it once per
+mode, each in a fresh process: the default extraction with and without the
+page filter, low-memory mode and a memory budget. Memory freed by the page
+filter's pdfium pass stays with the allocator in the default mode and hides
+later growth, hence the run without it. RSS is sampled every --every
+extracted pages; the report gives RSS after the first sample, at the end
+and its growth in between.
+Low-memory mode must stay flat (grow less than --max-growth MB), otherwise
+the script exits with status 1.
+
+Usage:
+    python benchmarks/bench_memory.py [--pdf statement.pdf | --pages N --image-kb N] [--budget-mb N] [--extraction text|layout]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from statement_generator import write_statement
+
+from enbd_parser import EXTRACTION_MODES, ENBDStatementParser
+from instrumentation import StageTimer, current_rss
+
+
+class RssSampler(StageTimer):
+    """Stage timer that also samples RSS every `every` extracted pages."""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = every
+        self.samples = []
+
+    def count(self, name: str, n: int = 1) -> None:
+        super().count(name, n)
+        if name == 'pages_extracted' and self.counts[name] % self.every == 0:
+            self.samples.append((self.counts[name], current_rss()))
+
+
+def _run(pdf_path, options, every, queue):
+    sampler = RssSampler(every)
+    parser = ENBDStatementParser(pdf_path, instrumentation=sampler, **options)
+    start = time.perf_counter()
+    transactions = sum(1 for _ in parser.iter_transactions())
+    queue.put({
+        'seconds': time.perf_counter() - start,
+        'transactions': transactions,
+        'reopens': sampler.counts.get('reopens', 0),
+        'samples': sampler.samples
+    })
+
+
+def measure(pdf_path, options, every):
+    """Parse pdf_path in a new process; return its timing and RSS samples."""
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_run, args=(pdf_path, options, every, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Compare memory use of the extraction modes.')
+    arg_parser.add_argument('--pdf', help='statement to parse (default: generate one)')
+    arg_parser.add_argument('--pages', type=int, default=1000, help='generated pages (default: 1000)')
+    arg_parser.add_argument('--image-kb', type=int, default=64,
+                            help='image size on every generated page (default: 64)')
+    arg_parser.add_argument('--extraction', choices=EXTRACTION_MODES, default='text')
+    arg_parser.add_argument('--budget-mb', type=int, default=96,
+                            help='memory budget of the budget run (default: 96)')
+    arg_parser.add_argument('--every', type=int, default=50, help='pages between samples (default: 50)')
+    arg_parser.add_argument('--max-growth', type=float, default=16,
+                            help='MB low-memory mode may grow by (default: 16)')
+    args = arg_parser.parse_args()
+
+    modes = [
+        ('default', {}),
+        ('no page filter', {'page_filter': False}),
+        ('low-memory', {'low_memory': True}),
+        (f'budget {args.budget_mb} MB', {'memory_budget': args.budget_mb * 1024 * 1024}),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf
+        if not pdf_path:
+            pdf_path = os.path.join(tmp, 'long.pdf')
+            write_statement(pdf_path, args.pages, image_kb=args.image_kb)
+        print(f"{os.path.basename(pdf_path)}: {os.path.getsize(pdf_path) / 2 ** 20:.1f} MB, "
+              f"{args.extraction} extraction")
+        results = {}
+        for label, options in modes:
+            result = results[label] = measure(pdf_path, dict(options, extraction=args.extraction), args.every)
+            samples = result['samples']
+            if not samples or samples[0][1] is None:
+                print("RSS is not available on this platform", file=sys.stderr)
+                sys.exit(1)
+            first, last = samples[0][1] / 2 ** 20, samples[-1][1] / 2 ** 20
+            peak = max(rss for _, rss in samples) / 2 ** 20
+            print(f"{label:<16} {result['seconds']:7.1f}s  {result['transactions']} transactions  "
+                  f"RSS {first:6.1f} -> {last:6.1f} MB (peak {peak:6.1f}, growth {last - first:+6.1f})  "
+                  f"{result['reopens']} reopens")
+
+    samples = results['low-memory']['samples']
+    growth = (samples[-1][1] - samples[0][1]) / 2 ** 20
+    if growth > args.max_growth:
+        print(f"ERROR: low-memory mode grew by {growth:.1f} MB", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
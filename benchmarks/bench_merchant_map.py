@@ -0,0 +1,81 @@
+"""
+Benchmark of the persistent merchant map against the keyword categorizer.
+
+Descriptions are the synthetic ones of bench_categorize.py, with store
+numbers, terminal ids and city suffixes drawn from a wide range so most are
+distinct. Three passes are timed: the compiled Categorizer with its LRU
+memo, a MerchantMap starting from an empty file, and a MerchantMap loaded
+from the file the first pass saved (a later run). Each reports the hit rate
+of its memo or map. The map must give every row the categorizer's category
+for the first description seen with the same merchant key; rows where that
+differs from categorizing their own description are counted.
+
+Usage:
+    python benchmarks/bench_merchant_map.py [count]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_categorize import CITIES, MERCHANTS
+
+from enbd_parser import Categorizer
+from merchants import MerchantMap, merchant_key
+
+
+def varied_descriptions(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    descriptions = []
+    for _ in range(count):
+        parts = [rng.choice(MERCHANTS)]
+        if rng.random() < 0.7:
+            parts.append(rng.choice(['', 'T', 'POS']) + str(rng.randint(100, 999999)))
+        parts.append(rng.choice(CITIES))
+        descriptions.append(' '.join(p for p in parts if p))
+    return descriptions
+
+
+def timed(func, descriptions):
+    start = time.perf_counter()
+    categories = [func(desc) for desc in descriptions]
+    return categories, time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    descriptions = varied_descriptions(count)
+    print(f"{count} descriptions, {len(set(descriptions))} distinct")
+
+    categorizer = Categorizer()
+    keywords, elapsed = timed(categorizer.categorize, descriptions)
+    info = categorizer.cache_info()
+    print(f"{'categorizer + LRU memo':<26} {elapsed:8.3f}s  hit rate {info.hits / count:6.1%}")
+    first = {}
+    for desc in descriptions:
+        first.setdefault(merchant_key(desc), categorizer.categorize(desc))
+    expected = [first[merchant_key(desc)] for desc in descriptions]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'merchants.json')
+        for label in ('merchant map, empty', 'merchant map, saved'):
+            merchant_map = MerchantMap(path, categorizer=Categorizer())
+            categories, elapsed = timed(merchant_map.categorize, descriptions)
+            merchant_map.save()
+            stats = merchant_map.stats()
+            print(f"{label:<26} {elapsed:8.3f}s  hit rate {stats['hit_rate']:6.1%}  "
+                  f"({stats['misses']} keyword lookups, {stats['merchants']} merchants)")
+            if categories != expected:
+                mismatches = sum(a != b for a, b in zip(categories, expected))
+                print(f"ERROR: {mismatches} descriptions categorized differently", file=sys.stderr)
+                sys.exit(1)
+    changed = sum(a != b for a, b in zip(expected, keywords))
+    print(f"{changed} rows ({changed / count:.1%}) categorized like an earlier variant of their merchant, "
+          f"not by their own description")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark and check of the page pre-pass that skips non-transaction pages.
+
+Parses the statement with and without the page filter, exits with an error if
+the filtered run loses or changes any transaction or statement detail, and
+prints the pages skipped and the wall time of both runs.
+
+Usage:
+    python benchmarks/bench_page_filter.py statement.pdf [password]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enbd_parser import EXTRACTION_MODES, ENBDStatementParser
+
+
+def timed_parse(pdf_path, password, extraction, page_filter):
+    parser = ENBDStatementParser(pdf_path, password, extraction=extraction, page_filter=page_filter)
+    start = time.perf_counter()
+    result = parser.parse()
+    return result, time.perf_counter() - start
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__.strip().splitlines()[-1].strip())
+        sys.exit(1)
+    pdf_path = sys.argv[1]
+    password = sys.argv[2] if len(sys.argv) > 2 else None
+
+    for extraction in EXTRACTION_MODES:
+        full, full_time = timed_parse(pdf_path, password, extraction, page_filter=False)
+        filtered, filtered_time = timed_parse(pdf_path, password, extraction, page_filter=True)
+        if filtered['transactions'] != full['transactions'] or \
+                filtered['statement_info'] != full['statement_info']:
+            print(f"ERROR: {extraction} extraction lost transactions on skipped pages", file=sys.stderr)
+            sys.exit(1)
+        metadata = filtered['metadata']
+        print(f"{extraction:<7} {metadata['skipped_pages']}/{metadata['page_count']} pages skipped, "
+              f"{len(full['transactions'])} transactions  full {full_time:7.3f}s  "
+              f"filtered {filtered_time:7.3f}s  speedup {full_time / filtered_time:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
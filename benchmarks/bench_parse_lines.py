@@ -0,0 +1,127 @@
+"""
+Line throughput of the shared parser core against the two parsers it replaced.
+
+Builds synthetic page text (transaction rows mixed with headers and blank
+lines) and parses it with:
+  - legacy-library: the old ENBDStatementParser.parse_page of enbd_parser.py
+    (uncompiled re.search per line, float(amount.replace(...)))
+  - legacy-app: the old parser of app.py (strptime/strftime per row)
+  - core: ENBDStatementParser.parse_page (precompiled page-wide pattern,
+    cached date parsing, fast amount parsing)
+It checks that the core returns the same rows as the legacy library parser
+and prints the best of three runs in lines/s for each.
+
+Usage:
+    python benchmarks/bench_parse_lines.py [lines]
+"""
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enbd_parser import ENBDStatementParser, categorize, determine_transaction_type
+from statement_generator import generate_rows
+
+LINES_PER_PAGE = 50
+REPEAT = 3
+
+
+def make_pages(line_count, seed=0):
+    """Page texts of about line_count lines, one in five not a transaction."""
+    rng = random.Random(seed)
+    rows = generate_rows(line_count, seed=seed)
+    pages = []
+    lines = []
+    for day, description, amount in rows:
+        if rng.random() < 0.2:
+            lines.append(rng.choice(['Transaction Date Description Amount', '',
+                                     'Statement Period: 01/01/2024 to 31/01/2024',
+                                     'Card Number: XXXX XXXX XXXX 1234']))
+        else:
+            lines.append(f"{day} {description} {amount:,.2f}")
+        if len(lines) == LINES_PER_PAGE:
+            pages.append('\n'.join(lines))
+            lines = []
+    if lines:
+        pages.append('\n'.join(lines))
+    return pages
+
+
+def legacy_library(pages):
+    rows = []
+    for page in pages:
+        for line in page.split('\n'):
+            if not line.strip():
+                continue
+            transaction_match = re.search(r'(\d{2}/\d{2}/\d{4})\s+(.+?)\s+([-\d,.]+)\s*$', line)
+            if transaction_match:
+                date, description, amount = transaction_match.groups()
+                try:
+                    amount_float = float(amount.replace(',', ''))
+                except ValueError:
+                    continue
+                rows.append({
+                    'date': date,
+                    'description': description.strip(),
+                    'amount': amount_float,
+                    'type': determine_transaction_type(amount_float, description),
+                    'category': categorize(description)
+                })
+    return rows
+
+
+def legacy_app(pages):
+    rows = []
+    for page in pages:
+        for line in page.split('\n'):
+            match = re.search(r'(\d{2}/\d{2}/\d{4}).+?([A-Z].+?)\s+([-\d,.]+)$', line)
+            if match:
+                date_str, description, amount_str = match.groups()
+                try:
+                    date_obj = datetime.strptime(date_str, '%d/%m/%Y')
+                    amount = float(amount_str.replace(',', ''))
+                    rows.append({
+                        'date': date_obj.strftime('%d/%m/%Y'),
+                        'description': description.strip(),
+                        'amount': round(amount, 2),
+                        'type': determine_transaction_type(amount, description),
+                        'category': categorize(description)
+                    })
+                except:
+                    continue
+    return rows
+
+
+def core(pages):
+    # Transaction records are what the parsing pipeline passes on
+    parser = ENBDStatementParser(None)
+    return [txn for page in pages for txn in parser.parse_page(page)]
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    pages = make_pages(line_count)
+    lines = sum(page.count('\n') + 1 for page in pages)
+
+    results = {}
+    for name, func in (('legacy-library', legacy_library), ('legacy-app', legacy_app), ('core', core)):
+        func(pages[:10])  # warm the categorizer memo and regex caches
+        best = None
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            results[name] = func(pages)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{name:<15} {best:8.3f}s  {lines / best:12,.0f} lines/s  {len(results[name])} rows")
+
+    if [txn.to_dict() for txn in results['core']] != results['legacy-library']:
+        print("ERROR: core rows differ from the legacy library parser", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Time to first byte and bytes on the wire of results pages and API responses.
+
+Generates a statement of --transactions transactions, serves the app on a
+local port and requests, with and without ``Accept-Encoding: gzip`` and with
+the results page streamed or rendered in one piece:
+  - the upload form's results page (from the parse cache after the first upload);
+  - a finished job's results page;
+  - a 1000-row page of the transactions API.
+Reports the best of --repeat requests: time to the response headers, to the
+summary cards and to the last byte, and the body size as sent. Exits with
+status 1 if a gzipped response is not at least three times smaller, if
+streaming or compression changes a response, or if a streamed page does not
+arrive in several chunks.
+
+Usage:
+    python benchmarks/bench_results_response.py [--transactions N] [--repeat N]
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import make_server
+
+from statement_generator import write_statement
+
+from app import app
+
+ROWS_PER_PAGE = 40
+# Last text of the summary cards
+SUMMARY_MARK = b'Net Balance'
+
+
+def multipart_upload(pdf: bytes):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="password"\r\n\r\n\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="statement.pdf"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n').encode('utf-8') + pdf + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def fetch(port: int, method: str, path: str, body: bytes = None, headers=None):
+    """One request; returns timings, body size as sent, decoded body and chunk count."""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+    start = time.perf_counter()
+    connection.request(method, path, body=body, headers=headers or {})
+    response = connection.getresponse()
+    headers_at = time.perf_counter() - start
+    gzipped = response.getheader('Content-Encoding') == 'gzip'
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    decoded, wire, chunks, summary_at = b'', 0, 0, None
+    while True:
+        data = response.read1(65536)
+        if not data:
+            break
+        wire += len(data)
+        chunks += 1
+        decoded += decompressor.decompress(data) if gzipped else data
+        if summary_at is None and SUMMARY_MARK in decoded:
+            summary_at = time.perf_counter() - start
+    total = time.perf_counter() - start
+    connection.close()
+    if response.status not in (200, 202):
+        raise RuntimeError(f"{method} {path} answered {response.status}: {decoded[:200]!r}")
+    return {'status': response.status, 'headers': headers_at, 'summary': summary_at, 'total': total,
+            'wire': wire, 'chunks': chunks, 'body': decoded}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Measure TTFB and response sizes of results pages.')
+    arg_parser.add_argument('--transactions', type=int, default=5000,
+                            help='transactions in the statement (default: 5000)')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='requests per case (default: 5)')
+    args = arg_parser.parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    failures = []
+
+    def check(condition, message):
+        if not condition:
+            print(f"FAIL {message}")
+            failures.append(message)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, 'statement.pdf')
+        write_statement(pdf_path, (args.transactions + ROWS_PER_PAGE - 1) // ROWS_PER_PAGE,
+                        rows_per_page=ROWS_PER_PAGE)
+        with open(pdf_path, 'rb') as f:
+            upload, content_type = multipart_upload(f.read())
+        app.config['PARSE_CACHE_DIR'] = os.path.join(tmp, 'parse_cache')
+        app.config['ASYNC_UPLOADS'] = False
+
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        port = server.server_port
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            start = time.perf_counter()
+            fetch(port, 'POST', '/', upload, {'Content-Type': content_type})
+            print(f"{args.transactions} transactions, first upload parsed in {time.perf_counter() - start:.2f}s")
+            job = json.loads(fetch(port, 'POST', '/jobs', upload, {'Content-Type': content_type})['body'])
+            while fetch(port, 'GET', job['status_url'])['body'].find(b'"done"') < 0:
+                time.sleep(0.1)
+
+            cases = [
+                ('upload form', 'POST', '/', upload, {'Content-Type': content_type}),
+                ('job results page', 'GET', job['result_url'], None, {}),
+                ('transactions API', 'GET', job['api_url'] + '/transactions?per_page=1000', None, {}),
+            ]
+            print(f"{'':<18} {'':<9} {'encoding':<8} {'headers':>9} {'summary':>9} {'last byte':>10} "
+                  f"{'bytes':>8} {'chunks':>6}")
+            for label, method, path, body, headers in cases:
+                results = {}
+                for streamed in (False, True):
+                    app.config['STREAM_RESULTS'] = streamed
+                    for encoding in ('identity', 'gzip'):
+                        runs = [fetch(port, method, path, body, dict(headers, **{'Accept-Encoding': encoding}))
+                                for _ in range(args.repeat)]
+                        best = min(runs, key=lambda run: run['total'])
+                        results[streamed, encoding] = best
+                        summary = f"{best['summary'] * 1000:7.1f}ms" if best['summary'] is not None else '-'
+                        print(f"{label:<18} {'streamed' if streamed else 'buffered':<9} {encoding:<8} "
+                              f"{best['headers'] * 1000:7.1f}ms {summary:>9} {best['total'] * 1000:8.1f}ms "
+                              f"{best['wire']:8d} {best['chunks']:6d}")
+                for streamed in (False, True):
+                    identity, gzipped = results[streamed, 'identity'], results[streamed, 'gzip']
+                    check(gzipped['wire'] * 3 <= identity['wire'], f"{label}: gzip saves less than 2/3")
+                    # Each upload is stored under a new id, so only GET bodies are comparable
+                    check(method == 'POST' or gzipped['body'] == identity['body'], f"{label}: gzip changes the body")
+                if label == 'job results page':
+                    check(results[True, 'gzip']['body'] == results[False, 'identity']['body'],
+                          f"{label}: streaming changes the page")
+                    check(results[True, 'identity']['chunks'] > 1, f"{label}: streamed in a single chunk")
+        finally:
+            server.shutdown()
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Sandboxed parsing of oversized and hostile PDFs.
+
+Generates a normal statement, a long one (--pages) and a one-page PDF whose
+content stream inflates to --bomb-mb MB, and checks that the sandbox:
+  - gives the same transactions as an in-process parse, within the limits;
+  - refuses the long statement on --max-pages before extracting anything;
+  - kills it at the wall-clock and at the CPU-time limit;
+  - stops the inflated stream at the memory limit.
+Each case reports how long it took to fail; none may take much longer than
+its limit. Exits with status 1 if a check fails.
+
+Usage:
+    python benchmarks/bench_sandbox.py [--pages N] [--bomb-mb N] [--memory-mb N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from statement_generator import write_statement
+
+from enbd_parser import ENBDStatementParser
+from sandbox import LimitExceeded, sandboxed_parse
+
+
+def write_bomb(path: str, megabytes: int) -> None:
+    """Write a one-page PDF whose content stream is megabytes of compressed blanks."""
+    compressor = zlib.compressobj(9)
+    chunk = b' ' * (1024 * 1024)
+    stream = b''.join(compressor.compress(chunk) for _ in range(megabytes)) + compressor.flush()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R >>",
+        b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream",
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b''.join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def attempt(source, **limits):
+    """Sandboxed parse; returns (seconds, result or LimitExceeded)."""
+    start = time.perf_counter()
+    try:
+        outcome = sandboxed_parse(source, **limits)
+    except LimitExceeded as e:
+        outcome = e
+    return time.perf_counter() - start, outcome
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Check the limits of sandboxed parsing.')
+    arg_parser.add_argument('--pages', type=int, default=400, help='pages of the long statement (default: 400)')
+    arg_parser.add_argument('--bomb-mb', type=int, default=2048,
+                            help='inflated size of the hostile content stream (default: 2048)')
+    arg_parser.add_argument('--memory-mb', type=int, default=512,
+                            help='memory limit of the sandbox (default: 512)')
+    args = arg_parser.parse_args()
+    memory_limit = args.memory_mb * 1024 * 1024
+    failures = []
+
+    def check(label, seconds, outcome, limit, within):
+        if limit is None:
+            ok = not isinstance(outcome, Exception)
+            detail = 'parsed'
+        else:
+            ok = isinstance(outcome, LimitExceeded) and outcome.limit == limit
+            detail = f'{outcome.limit}: {outcome}' if isinstance(outcome, LimitExceeded) else 'no limit hit'
+        ok = ok and seconds <= within
+        print(f"{'ok  ' if ok else 'FAIL'} {label:<28} {seconds:6.2f}s  {detail}")
+        if not ok:
+            failures.append(label)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        normal = os.path.join(tmp, 'normal.pdf')
+        long = os.path.join(tmp, 'long.pdf')
+        bomb = os.path.join(tmp, 'bomb.pdf')
+        write_statement(normal, 5)
+        write_statement(long, args.pages)
+        write_bomb(bomb, args.bomb_mb)
+        print(f"long statement {os.path.getsize(long) / 2 ** 20:.1f} MB, {args.pages} pages; "
+              f"bomb {os.path.getsize(bomb) / 2 ** 20:.1f} MB inflating to {args.bomb_mb} MB")
+
+        expected = ENBDStatementParser(normal).parse()['transactions']
+        seconds, outcome = attempt(normal, timeout=30, cpu_time=30, memory_limit=memory_limit, max_pages=50)
+        check('normal statement', seconds, outcome, None, 30)
+        if not isinstance(outcome, Exception) and outcome['transactions'] != expected:
+            print("FAIL sandboxed transactions differ from an in-process parse")
+            failures.append('same transactions')
+
+        seconds, outcome = attempt(long, max_pages=args.pages // 2)
+        check('page limit', seconds, outcome, 'pages', 5)
+        seconds, outcome = attempt(long, timeout=1)
+        check('wall-clock limit of 1s', seconds, outcome, 'wall_time', 3)
+        seconds, outcome = attempt(long, timeout=60, cpu_time=1)
+        check('CPU limit of 1s', seconds, outcome, 'cpu_time', 5)
+        seconds, outcome = attempt(bomb, timeout=60, memory_limit=memory_limit)
+        check(f'memory limit of {args.memory_mb} MB', seconds, outcome, 'memory', 30)
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
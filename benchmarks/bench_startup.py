@@ -0,0 +1,83 @@
+"""
+Startup cost of the command line and of importing the parser as a library.
+
+Runs each scenario --repeat times in a fresh interpreter under
+``python -X importtime`` and reports the best wall time, the import time
+Python itself measured and the slowest top-level imports. None of the
+scenarios parses a PDF, so none of them may load a PDF library or pandas;
+if one does, or its import time goes over --max-import-ms, the script exits
+with status 1.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat N] [--max-import-ms MS]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that only a parse (or the web app) needs
+HEAVY_MODULES = ('pdfplumber', 'pdfminer', 'pypdfium2', 'pandas', 'numpy', 'pyarrow')
+
+SCENARIOS = [
+    ('enbd_parser.py --help', [os.path.join(ROOT, 'enbd_parser.py'), '--help']),
+    ('enbd_parser.py batch --help', [os.path.join(ROOT, 'enbd_parser.py'), 'batch', '--help']),
+    ('bad arguments', [os.path.join(ROOT, 'enbd_parser.py'), 'missing.pdf']),
+    ('merchants key', [os.path.join(ROOT, 'enbd_parser.py'), 'merchants', 'map.json', 'key',
+                       'CAREEM HALA RIDE DUBAI AE']),
+    ('import + categorize()', ['-c', "from enbd_parser import categorize; categorize('TALABAT.COM DUBAI')"]),
+]
+
+
+def parse_importtime(stderr: str):
+    """(module, cumulative microseconds, depth) of every import in -X importtime output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(cumulative), depth))
+    return imports
+
+
+def run(args):
+    """Run one scenario; returns (wall seconds, imports)."""
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=ROOT,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    return time.perf_counter() - start, parse_importtime(process.stderr)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Measure CLI and library startup time.')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='runs per scenario (default: 5)')
+    arg_parser.add_argument('--max-import-ms', type=float, default=100,
+                            help='import time a scenario may take (default: 100)')
+    args = arg_parser.parse_args()
+
+    failures = []
+    for label, command in SCENARIOS:
+        runs = [run(command) for _ in range(args.repeat)]
+        wall, imports = min(runs, key=lambda result: result[0])
+        import_ms = sum(cumulative for _, cumulative, depth in imports if depth == 0) / 1000
+        heavy = sorted({name.split('.')[0] for name, _, _ in imports} & set(HEAVY_MODULES))
+        slowest = sorted((item for item in imports if item[2] <= 1), key=lambda item: -item[1])[:3]
+        print(f"{label:<28} wall {wall * 1000:7.1f} ms  imports {import_ms:7.1f} ms  "
+              f"slowest: {', '.join(f'{name} {cumulative / 1000:.1f}' for name, cumulative, _ in slowest)}")
+        if heavy:
+            failures.append(f"{label} imported {', '.join(heavy)}")
+        if import_ms > args.max_import_ms:
+            failures.append(f"{label} spent {import_ms:.1f} ms importing")
+
+    for failure in failures:
+        print(f"ERROR: {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Memory and output-size benchmark for the transaction container.
+
+Builds the same synthetic rows as plain dicts split into income/expense lists
+(the original parse() structures) and as a TransactionTable, and compares
+traced allocations and the size of the records vs columnar JSON output.
+
+Usage:
+    python benchmarks/bench_transaction_table.py [rows]
+"""
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enbd_parser import CATEGORY_RULES, TransactionTable
+
+
+def synthetic_rows(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    categories = [category for category, _ in CATEGORY_RULES] + ['Others']
+    for _ in range(count):
+        amount = round(rng.uniform(-2000, 3000), 2)
+        yield {
+            'date': f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2024",
+            'description': f"MERCHANT {rng.randint(1, 5000)} DUBAI AE",
+            'amount': amount,
+            'type': 'Expense' if amount > 0 else 'Income',
+            'category': rng.choice(categories),
+        }
+
+
+def traced(build):
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+
+    def build_dicts():
+        rows = list(synthetic_rows(count))
+        income = [txn for txn in rows if txn['type'] == 'Income']
+        expense = [txn for txn in rows if txn['type'] == 'Expense']
+        return rows, income, expense
+
+    (rows, income, expense), dict_bytes = traced(build_dicts)
+    table, table_bytes = traced(lambda: TransactionTable(synthetic_rows(count)))
+
+    records = json.dumps({'transactions': rows, 'income_transactions': income,
+                          'expense_transactions': expense}, indent=2)
+    columnar = json.dumps({'transactions': table.to_columns(),
+                           'views': {'income': table.income.indices(),
+                                     'expense': table.expense.indices()}}, indent=2)
+
+    print(f"{count} rows")
+    print(f"dicts + type lists   {dict_bytes / 1e6:8.2f} MB in memory")
+    print(f"TransactionTable     {table_bytes / 1e6:8.2f} MB in memory "
+          f"({dict_bytes / table_bytes:.1f}x smaller)")
+    print(f"records JSON         {len(records) / 1e6:8.2f} MB")
+    print(f"columnar JSON        {len(columnar) / 1e6:8.2f} MB "
+          f"({len(records) / len(columnar):.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
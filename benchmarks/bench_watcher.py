@@ -0,0 +1,171 @@
+"""
+Throughput, restart cost and change detection of the watch-folder daemon.
+
+Generates --files statements plus --links hard links to them (many files
+the index must keep track of, cheap to create) in a drop directory and runs
+the watcher over it once. Then checks, each with a fresh Watcher on the same
+index as after a restart:
+  - a restart parses nothing and only stats the files;
+  - a touched file is recognised as unchanged by its hash;
+  - a file rewritten with other content is parsed again;
+  - a file still being written is only parsed once complete.
+In a fresh directory, a settled empty file is recorded as failed instead of
+keeping a run with --once from finishing, and is parsed once written. Last,
+in another one, a worker process dies on one file while others are in
+flight: only that file may be recorded as failed.
+Exits with status 1 if a check fails.
+
+Usage:
+    python benchmarks/bench_watcher.py [--files N] [--pages N] [--links N] [--workers N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from statement_generator import write_statement
+
+import watcher as watcher_module
+from watcher import Watcher
+
+_watch_parse = watcher_module._watch_parse
+
+
+def crash_or_parse(path, output_path, password=None, options=None):
+    """The watcher's parse, except that the worker dies on files named crash-*."""
+    if os.path.basename(path).startswith('crash-'):
+        os._exit(1)
+    return _watch_parse(path, output_path, password, options)
+
+
+def run_once(drop, out, workers, settle=0.5):
+    watcher = Watcher(drop, out, workers, interval=0.2, settle=settle)
+    start = time.perf_counter()
+    stats = watcher.run(once=True)
+    return watcher, stats, time.perf_counter() - start
+
+
+def write_slowly(path, data, pieces, pause):
+    with open(path, 'wb') as f:
+        for i in range(pieces):
+            f.write(data[i * len(data) // pieces:(i + 1) * len(data) // pieces])
+            f.flush()
+            time.sleep(pause)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmark the watch-folder daemon.')
+    arg_parser.add_argument('--files', type=int, default=8, help='generated statements (default: 8)')
+    arg_parser.add_argument('--pages', type=int, default=5, help='pages per statement (default: 5)')
+    arg_parser.add_argument('--links', type=int, default=2000,
+                            help='hard links to them, kept in the index (default: 2000)')
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = arg_parser.parse_args()
+    if args.files < 3:
+        arg_parser.error('--files must be at least 3')
+
+    failures = []
+
+    def check(condition, message):
+        print(f"{'ok  ' if condition else 'FAIL'} {message}")
+        if not condition:
+            failures.append(message)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        drop = os.path.join(tmp, 'drop')
+        out = os.path.join(tmp, 'out')
+        os.makedirs(drop)
+        for i in range(args.files):
+            write_statement(os.path.join(drop, f'statement-{i:03d}.pdf'), args.pages, seed=i)
+        for i in range(args.links):
+            # The last two statements are left unlinked for the touch and rewrite checks
+            os.link(os.path.join(drop, f'statement-{i % (args.files - 2):03d}.pdf'),
+                    os.path.join(drop, f'link-{i:05d}.pdf'))
+        # Old enough to be settled
+        for name in os.listdir(drop):
+            os.utime(os.path.join(drop, name), (time.time() - 60, time.time() - 60))
+
+        _, stats, seconds = run_once(drop, out, args.workers)
+        print(f"first run   {seconds:7.2f}s  {stats['files_processed']} parsed, "
+              f"{stats['files_duplicate']} duplicates, {stats['pages_processed'] / seconds:.1f} pages/s")
+        check(stats['files_processed'] == args.files and stats['files_duplicate'] == args.links,
+              'every distinct statement parsed once, copies recorded as duplicates')
+
+        _, stats, seconds = run_once(drop, out, args.workers)
+        print(f"restart     {seconds * 1000:7.1f} ms for {args.files + args.links} indexed files")
+        check(stats['files_processed'] == stats['files_unchanged'] == 0, 'a restart parses and hashes nothing')
+
+        touched = os.path.join(drop, f'statement-{args.files - 1:03d}.pdf')
+        os.utime(touched, (time.time() - 30, time.time() - 30))
+        _, stats, _ = run_once(drop, out, args.workers)
+        check(stats['files_unchanged'] == 1 and stats['files_processed'] == 0,
+              'a touched file is recognised as unchanged')
+
+        changed = os.path.join(drop, f'statement-{args.files - 2:03d}.pdf')
+        os.remove(changed)
+        write_statement(changed, args.pages + 1, seed=1000)
+        os.utime(changed, (time.time() - 30, time.time() - 30))
+        _, stats, _ = run_once(drop, out, args.workers)
+        check(stats['files_processed'] == 1, 'a rewritten file is parsed again')
+
+        source = os.path.join(tmp, 'late.pdf')
+        write_statement(source, args.pages, seed=2000)
+        with open(source, 'rb') as f:
+            data = f.read()
+        late = os.path.join(drop, 'late.pdf')
+        writer = threading.Thread(target=write_slowly, args=(late, data, 4, 0.4))
+        writer.start()
+        time.sleep(0.1)
+        watcher, stats, _ = run_once(drop, out, args.workers, settle=1.0)
+        writer.join()
+        entry = watcher.files.get('late.pdf', {})
+        check(stats['files_processed'] == 1 and entry.get('status') == 'ok' and entry.get('size') == len(data),
+              'a file still being written is parsed once, when complete')
+
+        empty_drop = os.path.join(tmp, 'empty-drop')
+        os.makedirs(empty_drop)
+        empty = os.path.join(empty_drop, 'empty.pdf')
+        open(empty, 'wb').close()
+        watcher = Watcher(empty_drop, os.path.join(tmp, 'empty-out'), args.workers, interval=0.2, settle=0)
+        runner = threading.Thread(target=watcher.run, kwargs={'once': True})
+        runner.start()
+        runner.join(30)
+        if runner.is_alive():
+            watcher.stop()
+            runner.join()
+        entry = watcher.files.get('empty.pdf', {})
+        check(entry.get('status') == 'error' and not watcher.backlog(),
+              'a settled empty file is recorded as failed and the run finishes')
+        with open(empty, 'wb') as f:
+            f.write(data)
+        watcher, stats, _ = run_once(empty_drop, os.path.join(tmp, 'empty-out'), args.workers, settle=0)
+        check(stats['files_processed'] == 1 and watcher.files['empty.pdf']['status'] == 'ok',
+              'an empty file is parsed once written')
+
+        crash_drop = os.path.join(tmp, 'crash-drop')
+        os.makedirs(crash_drop)
+        names = [f'statement-{i:03d}.pdf' for i in range(args.files)]
+        names.insert(len(names) // 2, 'crash-000.pdf')
+        for i, name in enumerate(names):
+            path = os.path.join(crash_drop, name)
+            write_statement(path, args.pages, seed=3000 + i)
+            os.utime(path, (time.time() - 60, time.time() - 60))
+        watcher_module._watch_parse = crash_or_parse
+        try:
+            crashed, stats, _ = run_once(crash_drop, os.path.join(tmp, 'crash-out'), max(2, args.workers))
+        finally:
+            watcher_module._watch_parse = _watch_parse
+        failed = sorted(name for name, entry in crashed.files.items() if entry['status'] == 'error')
+        check(failed == ['crash-000.pdf'] and stats['files_processed'] == args.files,
+              f'a dying worker only fails its own file (failed: {", ".join(failed) or "none"})')
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Load test of the web app with concurrent statement uploads.
+
+Starts the server (serve.py with --workers, or the development server of
+app.py with --server app) on a free port, or targets --url, then posts a
+generated statement to the upload form from --concurrency threads until
+--requests uploads are done. The parse cache is disabled in started
+servers so every upload is parsed. Reports the latency of the first
+upload (which pays any warm-up left to do), requests/s and p50/p90/p99
+latency.
+
+Usage:
+    python benchmarks/load_test.py [--server serve|app] [--workers N] [--concurrency N] [--requests N] [--pages N] [--url http://host:port]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from statement_generator import write_statement
+
+
+def multipart_upload(pdf: bytes, filename: str = 'statement.pdf'):
+    """Body and content type of an upload form post."""
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="password"\r\n\r\n\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n').encode('utf-8') + pdf + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def upload(url: str, body: bytes, content_type: str):
+    """Post one upload; returns (seconds, HTTP status or None on connection errors)."""
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': content_type})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except OSError:
+        status = None
+    return time.perf_counter() - start, status
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind: str, workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, ENBD_PARSE_CACHE_DIR='')
+    if kind == 'serve':
+        command = [sys.executable, os.path.join(ROOT, 'serve.py'), '--port', str(port),
+                   '--workers', str(workers)]
+    else:
+        command = [sys.executable, '-c', f'import app; app.app.run(port={port}, threaded=True)']
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_up(url: str, timeout: float = 60) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url + '/metrics', timeout=5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Measure upload throughput and latency of the web app.')
+    arg_parser.add_argument('--url', help='server to test (default: start one)')
+    arg_parser.add_argument('--server', choices=('serve', 'app'), default='serve',
+                            help='server to start: serve.py or the app.py development server (default: serve)')
+    arg_parser.add_argument('--workers', type=int, default=4, help='serve.py workers (default: 4)')
+    arg_parser.add_argument('--concurrency', type=int, default=8, help='concurrent uploads (default: 8)')
+    arg_parser.add_argument('--requests', type=int, default=100, help='total uploads (default: 100)')
+    arg_parser.add_argument('--pages', type=int, default=2, help='pages of the uploaded statement (default: 2)')
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, 'statement.pdf')
+        write_statement(pdf_path, args.pages)
+        with open(pdf_path, 'rb') as f:
+            body, content_type = multipart_upload(f.read())
+
+    server = None
+    url = args.url
+    if not url:
+        port = _free_port()
+        url = f'http://127.0.0.1:{port}'
+        server = start_server(args.server, args.workers, port)
+    try:
+        wait_until_up(url)
+        first, status = upload(url + '/', body, content_type)
+        if status != 200:
+            print(f"ERROR: first upload answered {status}", file=sys.stderr)
+            sys.exit(1)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(lambda _: upload(url + '/', body, content_type), range(args.requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    latencies = [seconds for seconds, status in results if status == 200]
+    errors = len(results) - len(latencies)
+    label = args.url or (f'serve.py, {args.workers} workers' if args.server == 'serve' else 'app.py dev server')
+    print(f"{label}: {args.requests} uploads of {args.pages} pages, concurrency {args.concurrency}")
+    print(f"first upload   {first * 1000:8.1f} ms")
+    print(f"throughput     {len(latencies) / elapsed:8.2f} requests/s ({errors} errors)")
+    if latencies:
+        print(f"latency        p50 {percentile(latencies, 0.5) * 1000:.1f} ms  "
+              f"p90 {percentile(latencies, 0.9) * 1000:.1f} ms  p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Stage-by-stage benchmark of the parser and the web app.
+
+Generates a synthetic statement (see statement_generator.py), or uses the
+given PDF, then times each stage of a parse: extract_text,
+parse_transactions (which includes categorization), categorize on its own
+with a cold memo, aggregation (analytics.analyze), JSON serialization of the
+result and Flask rendering of the results page. Each stage is run --repeat
+times and its best time is kept. For every stage the report gives seconds,
+pages/s, transactions/s and the peak RSS reached during the stage, and is
+written as JSON so runs can be compared.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--pdf statement.pdf | --pages N --rows N --terms-pages N] [--repeat N] [--output report.json]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from statement_generator import write_statement
+
+import enbd_parser
+from analytics import analyze
+from app import StatementView, app, render_results
+from enbd_parser import PARSER_VERSION, Categorizer, ENBDStatementParser, StatementSummary
+from transactions import TransactionTable
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter of this process; False if unsupported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_kb() -> int:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # ru_maxrss is in KB on Linux and bytes on macOS, and cannot be reset
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_stage(func, repeat: int):
+    """Run func repeat times; return its last result, best time and peak RSS in KB."""
+    best = None
+    result = None
+    _reset_peak_rss()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best, _peak_rss_kb()
+
+
+def benchmark(pdf_path: str, repeat: int = 3):
+    """Time every stage on pdf_path and return the report as a dict."""
+    parser = ENBDStatementParser(pdf_path)
+    stages = {}
+
+    def record(name, seconds, peak_kb, pages, transactions):
+        stages[name] = {
+            'seconds': round(seconds, 6),
+            'pages_per_second': round(pages / seconds, 2) if seconds else None,
+            'transactions_per_second': round(transactions / seconds, 2) if seconds else None,
+            'peak_rss_mb': round(peak_kb / 1024, 1)
+        }
+
+    pages, seconds, peak = run_stage(parser.extract_text, repeat)
+    page_count = parser.page_count
+
+    def parse_transactions():
+        enbd_parser._default_categorizer.clear_cache()
+        parser.transactions = TransactionTable()
+        parser.parse_transactions(pages)
+        return parser.transactions
+
+    table, parse_seconds, parse_peak = run_stage(parse_transactions, repeat)
+    count = len(table)
+    record('extract_text', seconds, peak, page_count, count)
+    record('parse_transactions', parse_seconds, parse_peak, page_count, count)
+
+    descriptions = list(table.descriptions)
+    _, seconds, peak = run_stage(lambda: list(map(Categorizer().categorize, descriptions)), repeat)
+    record('categorize', seconds, peak, page_count, count)
+
+    _, seconds, peak = run_stage(lambda: analyze(table), repeat)
+    record('aggregation', seconds, peak, page_count, count)
+
+    parser.summary = StatementSummary()
+    for txn in table:
+        parser.summary.add(txn)
+    result = parser.build_result()
+    _, seconds, peak = run_stage(lambda: json.dumps(result, indent=2, ensure_ascii=False), repeat)
+    record('json_serialization', seconds, peak, page_count, count)
+
+    rows = result['transactions']
+    with app.test_request_context():
+        _, seconds, peak = run_stage(lambda: render_results("benchmark", StatementView(rows)).get_data(), repeat)
+    record('flask_render', seconds, peak, page_count, count)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'parser_version': PARSER_VERSION,
+            'peak_rss_per_stage': _reset_peak_rss()
+        },
+        'statement': {
+            'file': os.path.basename(pdf_path),
+            'pages': page_count,
+            'skipped_pages': parser.skipped_pages,
+            'transactions': count
+        },
+        'repeat': repeat,
+        'stages': stages
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Time each stage of parsing a statement.')
+    arg_parser.add_argument('--pdf', help='statement to benchmark (default: generate one)')
+    arg_parser.add_argument('--pages', type=int, default=20, help='generated transaction pages (default: 20)')
+    arg_parser.add_argument('--rows', type=int, default=40, help='generated transactions per page (default: 40)')
+    arg_parser.add_argument('--terms-pages', type=int, default=0, help='generated pages without transactions')
+    arg_parser.add_argument('--seed', type=int, default=0, help='generator seed (default: 0)')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='runs per stage, best kept (default: 3)')
+    arg_parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = arg_parser.parse_args()
+
+    if args.pdf:
+        report = benchmark(args.pdf, args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = os.path.join(tmp, f'synthetic-{args.pages}p-{args.rows}r.pdf')
+            write_statement(pdf_path, args.pages, args.rows, args.terms_pages, seed=args.seed)
+            report = benchmark(pdf_path, args.repeat)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Synthetic ENBD-style statement PDFs for benchmarks.
+
+Writes statements in the layout the parser expects: statement period and card
+number on the first page, then one row per transaction with the date, the
+description and a right-aligned amount. Optional terms pages hold no
+transactions. The PDF is written directly, with the standard Helvetica font,
+so no PDF library is needed. --image-kb adds a distinct grayscale image of
+that size to every page, like the scanned backgrounds and logos of real
+statements, which makes each page heavier to parse and cache.
+
+Usage:
+    python benchmarks/statement_generator.py out.pdf [--pages N] [--rows N] [--terms-pages N] [--image-kb N] [--merchants mix.json] [--seed N]
+
+mix.json is a list of [description, weight] pairs, e.g.
+[["CAREEM HALA RIDE DUBAI AE", 5], ["PAYMENT RECEIVED THANK YOU", 1]].
+"""
+import argparse
+import json
+import random
+from datetime import date, timedelta
+from typing import List, Sequence, Tuple
+
+# Descriptions and relative weights, covering most categorization rules
+DEFAULT_MERCHANTS = [
+    ("CAREEM HALA RIDE DUBAI AE", 8),
+    ("UBER *TRIP DUBAI", 6),
+    ("TALABAT.COM DUBAI", 8),
+    ("DELIVEROO DUBAI", 4),
+    ("CARREFOUR CITY CENTRE", 6),
+    ("LULU HYPERMARKET", 5),
+    ("NOON.COM DUBAI", 5),
+    ("AMAZON.AE", 5),
+    ("NETFLIX.COM", 2),
+    ("SPOTIFY P1234", 2),
+    ("DEWA BILL PAYMENT", 2),
+    ("ETISALAT POSTPAID", 2),
+    ("ENOC STATION 1021", 3),
+    ("STARBUCKS MALL OF EMIRATES", 4),
+    ("EMIRATES AIRLINE", 1),
+    ("LOCAL SHOP 1182", 4),
+    ("PAYMENT RECEIVED THANK YOU", 1),
+    ("CASHBACK CREDIT", 1),
+]
+INCOME_DESCRIPTIONS = ("PAYMENT RECEIVED THANK YOU", "CASHBACK CREDIT")
+
+TERMS_TEXT = ("The cardholder agrees that all charges shall be payable in accordance with "
+              "the terms and conditions of the bank, including fees, finance charges and "
+              "any amounts due under reward programmes.")
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+FONT_SIZE = 9
+ROW_HEIGHT = 14
+DATE_X, DESCRIPTION_X, AMOUNT_RIGHT = 40, 120, 550
+
+# Helvetica advance widths (1/1000 em) of the characters used in amounts
+_HELVETICA_WIDTHS = dict.fromkeys('0123456789', 556)
+_HELVETICA_WIDTHS.update({',': 278, '.': 278, '-': 333})
+
+
+def _text_width(text: str) -> float:
+    return sum(_HELVETICA_WIDTHS[c] for c in text) * FONT_SIZE / 1000
+
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _show(x: float, y: float, text: str) -> str:
+    return f"BT /F1 {FONT_SIZE} Tf {x:.2f} {y} Td ({_escape(text)}) Tj ET"
+
+
+def generate_rows(count: int, merchants: Sequence[Tuple[str, float]] = None,
+                  seed: int = 0, start: date = date(2024, 1, 1)) -> List[Tuple[str, str, float]]:
+    """Return count (date, description, amount) rows in date order.
+
+    Rows whose description is a payment or cashback get negative amounts.
+    """
+    rng = random.Random(seed)
+    merchants = merchants or DEFAULT_MERCHANTS
+    descriptions = [name for name, _ in merchants]
+    weights = [weight for _, weight in merchants]
+    days = max(1, count // 20)
+    rows = []
+    for i, description in enumerate(rng.choices(descriptions, weights, k=count)):
+        day = start + timedelta(days=i * days // count)
+        amount = round(rng.uniform(5, 2500), 2)
+        if description in INCOME_DESCRIPTIONS:
+            amount = -amount
+        rows.append((day.strftime('%d/%m/%Y'), description, amount))
+    return rows
+
+
+def _page_stream(rows, first_page: bool, period: str) -> str:
+    y = PAGE_HEIGHT - 50
+    ops = []
+    if first_page:
+        ops.append(_show(DATE_X, y, "Emirates NBD Credit Card Statement"))
+        ops.append(_show(DATE_X, y - ROW_HEIGHT, f"Statement Period: {period}"))
+        ops.append(_show(DATE_X, y - 2 * ROW_HEIGHT, "Card Number: XXXX XXXX XXXX 1234"))
+        y -= 4 * ROW_HEIGHT
+    ops.append(_show(DATE_X, y, "Transaction Date"))
+    ops.append(_show(DESCRIPTION_X, y, "Description"))
+    ops.append(_show(AMOUNT_RIGHT - 40, y, "Amount"))
+    y -= 2 * ROW_HEIGHT
+    for day, description, amount in rows:
+        text = f"{amount:,.2f}"
+        ops.append(_show(DATE_X, y, day))
+        ops.append(_show(DESCRIPTION_X, y, description))
+        ops.append(_show(AMOUNT_RIGHT - _text_width(text), y, text))
+        y -= ROW_HEIGHT
+    return '\n'.join(ops)
+
+
+def _terms_stream() -> str:
+    y = PAGE_HEIGHT - 50
+    ops = [_show(DATE_X, y, "Rewards Summary and Terms and Conditions")]
+    words = TERMS_TEXT.split()
+    for i in range(50):
+        y -= ROW_HEIGHT
+        start = (i * 7) % len(words)
+        ops.append(_show(DATE_X, y, ' '.join((words[start:] + words)[:14])))
+    return '\n'.join(ops)
+
+
+def _image(index: int, size: int) -> bytes:
+    """Raw 8-bit gray samples of a size-byte, 256-pixel-wide image unique to a page."""
+    row = bytes((index + x) % 256 for x in range(256))
+    return (row * (size // 256 + 1))[:size // 256 * 256]
+
+
+def write_statement(path: str, pages: int = 5, rows_per_page: int = 40, terms_pages: int = 0,
+                    merchants: Sequence[Tuple[str, float]] = None, seed: int = 0,
+                    image_kb: int = 0) -> int:
+    """Write a synthetic statement PDF and return its number of transactions.
+
+    Transaction pages come first, followed by terms_pages pages without any.
+    With image_kb, every page also draws an image of that many kilobytes.
+    """
+    rows = generate_rows(pages * rows_per_page, merchants, seed)
+    period = f"{rows[0][0]} to {rows[-1][0]}" if rows else "01/01/2024 to 31/01/2024"
+    streams = [_page_stream(rows[i * rows_per_page:(i + 1) * rows_per_page], i == 0, period)
+               for i in range(pages)]
+    streams += [_terms_stream() for _ in range(terms_pages)]
+
+    # Objects: 1 catalog, 2 page tree, 3 font, then a page, its content and
+    # its image (if any) per page
+    per_page = 3 if image_kb else 2
+    page_ids = [4 + per_page * i for i in range(len(streams))]
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    for index, (page_id, stream) in enumerate(zip(page_ids, streams)):
+        resources = "/Font << /F1 3 0 R >>"
+        if image_kb:
+            resources += f" /XObject << /Im1 {page_id + 2} 0 R >>"
+            # Drawn behind the text, across the page
+            stream = f"q {PAGE_WIDTH} 0 0 {PAGE_HEIGHT} 0 0 cm /Im1 Do Q\n" + stream
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                       f"/Resources << {resources} >> /Contents {page_id + 1} 0 R >>")
+        data = stream.encode('latin-1')
+        objects.append(f"<< /Length {len(data)} >>\nstream\n{stream}\nendstream")
+        if image_kb:
+            image = _image(index, image_kb * 1024)
+            objects.append((f"<< /Type /XObject /Subtype /Image /Width 256 /Height {len(image) // 256} "
+                            f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Length {len(image)} >>\nstream\n"
+                            ).encode('latin-1') + image + b"\nendstream")
+
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            if isinstance(body, str):
+                body = body.encode('latin-1')
+            f.write(f"{number} 0 obj\n".encode('latin-1') + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1'))
+        for offset in offsets:
+            f.write(f"{offset:010d} 00000 n \n".encode('latin-1'))
+        f.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+                f"startxref\n{xref}\n%%EOF\n".encode('latin-1'))
+    return len(rows)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Write a synthetic ENBD-style statement PDF.')
+    arg_parser.add_argument('output', help='PDF file to write')
+    arg_parser.add_argument('--pages', type=int, default=5, help='transaction pages (default: 5)')
+    arg_parser.add_argument('--rows', type=int, default=40, help='transactions per page (default: 40)')
+    arg_parser.add_argument('--terms-pages', type=int, default=0,
+                            help='pages without transactions appended at the end (default: 0)')
+    arg_parser.add_argument('--image-kb', type=int, default=0,
+                            help='add an image of this many KB to every page (default: none)')
+    arg_parser.add_argument('--merchants', help='JSON file of [description, weight] pairs')
+    arg_parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    args = arg_parser.parse_args()
+
+    merchants = None
+    if args.merchants:
+        with open(args.merchants, 'r', encoding='utf-8') as f:
+            merchants = [(name, weight) for name, weight in json.load(f)]
+    count = write_statement(args.output, args.pages, args.rows, args.terms_pages, merchants, args.seed,
+                            args.image_kb)
+    print(f"Wrote {args.output}: {args.pages + args.terms_pages} pages, {count} transactions")
+
+
+if __name__ == "__main__":
+    main()
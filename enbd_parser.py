@@ -1,38 +1,176 @@
-import pdfplumber
 import json
 from datetime import datetime
 import re
-from typing import Dict, List, Any
+from typing import Dict, List, Any, BinaryIO, Iterator, Optional, Tuple, Union
+from functools import lru_cache
+import io
 import os
+import sys
+import hashlib
+
+# pdfplumber (with pdfminer), pypdfium2 and process pools are imported where
+# they are used, so the CLI's help and argument checks, and library users who
+# only categorize, do not pay for loading them.
+from statement_cache import ParseCache
+from transactions import Transaction, TransactionTable, parse_date
+from stream_writer import OUTPUT_FORMATS, STREAMING_FORMATS, StatementWriter
+from instrumentation import StageTimer, current_rss, release_memory
+from merchants import MerchantMap
+from table_layout import TransactionRegion, group_lines, line_text
+
+# A PDF given by path, raw bytes or a seekable binary file object
+PdfSource = Union[str, os.PathLike, bytes, BinaryIO]
+
+# Bump when a parser change alters its output, so cached results are not reused
+PARSER_VERSION = "2"
+
+# A transaction row of page text: date, an optional posting date, the
+# description and a trailing amount. Matched over a whole page with MULTILINE;
+# [^\S\n] is whitespace that does not run into the next line. The greedy
+# description backtracks from the line end to the amount, which is cheaper
+# than growing a lazy one from the front; callers strip it.
+TRANSACTION_RE = re.compile(
+    r'(\d{2}/\d{2}/\d{4})[^\S\n]+(?:\d{2}/\d{2}/\d{4}[^\S\n]+)?(.+)[^\S\n]+([-\d,.]+)[^\S\n]*$',
+    re.MULTILINE)
+
+# How rows are read: "text" matches lines of each page's extracted text,
+# "layout" finds the transaction table's columns from word positions.
+EXTRACTION_MODES = ('text', 'layout')
+
+# In low-memory mode the PDF is closed and reopened after this many pages,
+# dropping the objects pdfminer caches for the whole document (fonts, images)
+LOW_MEMORY_CHUNK_PAGES = 50
+# Pages read between reopens forced by the memory budget, so a budget below
+# what the process needs anyway does not reopen the PDF for every page
+BUDGET_MIN_PAGES = 10
+
+# Result layouts: "records" lists every transaction as a dict and repeats it
+# under its type; "columnar" emits each transaction once, as columns, with the
+# income/expense views given as row indices.
+LAYOUTS = ('records', 'columnar')
+
+# Keyword rules in priority order: the first category with a keyword found
+# anywhere in the description wins.
+CATEGORY_RULES = [
+    ("Food & Dining", ['restaurant', 'talabat', 'kfc', 'hardees', 'soho garden', 'gazebo', 'tasty pizza',
+                       'pulao', 'shake', 'cafe', 'noon minutes', 'wakha', 'meraki', 'hot n spicy', 'pak darbar',
+                       'apna kabab', 'mcdonalds', 'carrefour food', 'fillicafe']),
+    ("Transport", ['taxi', 'careem', 'zo feur', 'dubai taxi', 'emarat', 'epcco', 'enoc',
+                   'car rental', 'hala']),
+    ("Shopping", ['noon.com', 'carrefour', 'home centre', 'pakistan supermarket', 'supermarket',
+                  'minutes', 'apple.com', 'itunes', 'openai', 'netflix', 'cursor']),
+    ("Entertainment", ['platiniumlist', 'reel entertainment', 'soho garden', 'expedia', 'leisure',
+                       'mmall', 'smart dubai government']),
+    ("Utilities", ['dewa', 'electricity', 'smart dubai', 'etisalat', 'du', 'swyp']),
+    ("Personal Care", ['salon', 'barber', 'dry clean', 'laundry', 'spa']),
+    ("Subscription/Online", ['openai', 'netflix', 'whoop', 'cursor', 'apple', 'itunes', 'chatgpt']),
+]
+
+DEFAULT_CATEGORY = "Others"
+
+
+def _trie_pattern(keywords: List[str]) -> str:
+    """Build a regex matching any keyword, factored by common prefixes.
+
+    Longer branches are tried first, so the match at a position is the longest
+    keyword starting there; every other keyword starting there is a prefix of it.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: dict) -> str:
+        terminal = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if terminal:
+            body = '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+class Categorizer:
+    """Categorize descriptions with all keyword rules compiled into one regex.
+
+    The keywords are folded into a single prefix-trie pattern inside a
+    zero-width lookahead, so one ``finditer`` pass finds the keywords starting
+    at every position. Each match is mapped to the best rule priority among the
+    keyword and its keyword prefixes; the lowest priority seen is the first rule
+    the original ``any()`` chain would have matched. Results are memoized per
+    normalized description in a bounded LRU cache.
+    """
+
+    def __init__(self, rules: List[Tuple[str, List[str]]] = None,
+                 default: str = DEFAULT_CATEGORY, memo_size: int = 4096):
+        self.rules = CATEGORY_RULES if rules is None else rules
+        self.default = default
+        self._categories = [category for category, _ in self.rules]
+        # A keyword listed under several categories belongs to the first one
+        priority = {}
+        for index, (_, keywords) in enumerate(self.rules):
+            for keyword in keywords:
+                priority.setdefault(keyword.lower(), index)
+        # Keywords that are prefixes of a match also start at its position
+        self._priority = {
+            keyword: min(p for other, p in priority.items() if keyword.startswith(other))
+            for keyword in priority
+        }
+        if priority:
+            self._pattern = re.compile('(?=(' + _trie_pattern(list(priority)) + '))')
+        else:
+            self._pattern = None
+        self._lookup = lru_cache(maxsize=memo_size)(self._match)
+
+    @staticmethod
+    def normalize(description: str) -> str:
+        """Normalize a description into its memo key."""
+        return description.lower().strip()
+
+    def _match(self, desc: str) -> str:
+        if self._pattern is None:
+            return self.default
+        best = len(self._categories)
+        for match in self._pattern.finditer(desc):
+            priority = self._priority[match.group(1)]
+            if priority < best:
+                best = priority
+                if best == 0:
+                    break
+        return self._categories[best] if best < len(self._categories) else self.default
+
+    def categorize(self, description: str) -> str:
+        """Categorize transaction based on description."""
+        return self._lookup(self.normalize(description))
+
+    __call__ = categorize
+
+    def cache_info(self):
+        """Return hit/miss statistics of the description memo."""
+        return self._lookup.cache_info()
+
+    def clear_cache(self) -> None:
+        self._lookup.cache_clear()
+
+
+_default_categorizer = Categorizer()
+
+# Cache entries are tied to the parser version and the categorization rules
+CACHE_VERSION = PARSER_VERSION + '-' + hashlib.sha256(
+    json.dumps(CATEGORY_RULES).encode('utf-8')).hexdigest()[:12]
+
 
 def categorize(description: str) -> str:
     """Categorize transaction based on description."""
-    desc = description.lower()
-    if any(x in desc for x in ['restaurant', 'talabat', 'kfc', 'hardees', 'soho garden', 'gazebo', 'tasty pizza', 
-                              'pulao', 'shake', 'cafe', 'noon minutes', 'wakha', 'meraki', 'hot n spicy', 'pak darbar',
-                              'apna kabab', 'mcdonalds', 'carrefour food', 'fillicafe']):
-        return "Food & Dining"
-    if any(x in desc for x in ['taxi', 'careem', 'zo feur', 'dubai taxi', 'emarat', 'epcco', 'enoc', 
-                              'car rental', 'hala']):
-        return "Transport" 
-    if any(x in desc for x in ['noon.com', 'carrefour', 'home centre', 'pakistan supermarket', 'supermarket',
-                              'minutes', 'apple.com', 'itunes', 'openai', 'netflix', 'cursor']):
-        return "Shopping"
-    if any(x in desc for x in ['platiniumlist', 'reel entertainment', 'soho garden', 'expedia', 'leisure',
-                              'mmall', 'smart dubai government']):
-        return "Entertainment"
-    if any(x in desc for x in ['dewa', 'electricity', 'smart dubai', 'etisalat', 'du', 'swyp']):
-        return "Utilities"
-    if any(x in desc for x in ['salon', 'barber', 'dry clean', 'laundry', 'spa']):
-        return "Personal Care"
-    if any(x in desc for x in ['openai', 'netflix', 'whoop', 'cursor', 'apple', 'itunes', 'chatgpt']):
-        return "Subscription/Online"
-    return "Others"
+    return _default_categorizer.categorize(description)
 
 def determine_transaction_type(amount: float, description: str) -> str:
     """Determine if transaction is income or expense based on amount and description."""
-    desc = description.lower()
-    
     # For credit card statements: positive amounts are expenses, negative amounts are credits/income
     if amount > 0:
         # Positive amounts are typically expenses (charges on credit card)
@@ -41,22 +179,263 @@ def determine_transaction_type(amount: float, description: str) -> str:
         # Negative amounts are typically income/credits (payments, refunds, cashbacks)
         return "Income"
 
+def parse_amount(text: str) -> float:
+    """Parse an amount such as "1,234.50" or "-20"; raises ValueError if invalid."""
+    return float(text.replace(',', '') if ',' in text else text)
+
+def open_pdf(source: PdfSource, password: str = None):
+    """Open a PDF given as a path, raw bytes or a seekable binary file object."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif hasattr(source, 'seek'):
+        source.seek(0)
+    import pdfplumber
+    return pdfplumber.open(source, password=password)
+
+
+def source_name(source: PdfSource) -> str:
+    """File name of a PDF source, or None for in-memory data without one."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(source)
+    name = getattr(source, 'name', None)
+    return os.path.basename(name) if isinstance(name, str) else None
+
+
+def _extract_page_range(pdf_path: Union[str, bytes], password: str, start: int, stop: int,
+                        keep: List[bool] = None) -> List[str]:
+    """Extract the text of pages [start, stop); runs inside a worker process.
+
+    If given, ``keep`` flags the pages of the range to extract; the others
+    come back as empty strings.
+    """
+    texts = []
+    with open_pdf(pdf_path, password=password) as pdf:
+        for i, page in enumerate(pdf.pages[start:stop]):
+            if keep is None or keep[i]:
+                texts.append(page.extract_text())
+                page.close()
+            else:
+                texts.append('')
+    return texts
+
+
+def check_page_count(page_count: int, max_pages: Optional[int]) -> None:
+    """Raise LimitExceeded if a statement has more than max_pages pages."""
+    if max_pages and page_count > max_pages:
+        from sandbox import LimitExceeded
+        raise LimitExceeded('pages', max_pages, page_count,
+                            f"statement has {page_count} pages, more than the limit of {max_pages}")
+
+
+def _page_ranges(page_count: int, chunks: int) -> List[Tuple[int, int]]:
+    """Split page_count pages into at most `chunks` contiguous (start, stop) ranges."""
+    chunks = max(1, min(chunks, page_count))
+    size, extra = divmod(page_count, chunks)
+    ranges = []
+    start = 0
+    for i in range(chunks):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+class StatementSummary:
+    """Running income/expense totals, updated one transaction at a time."""
+
+    def __init__(self):
+        self.total_income = 0.0
+        self.total_expense = 0.0
+        self.income_count = 0
+        self.expense_count = 0
+
+    def add(self, txn: Transaction) -> None:
+        if txn['type'] == 'Income':
+            self.total_income += abs(txn['amount'])  # Credits/payments (show as positive)
+            self.income_count += 1
+        else:
+            self.total_expense += txn['amount']  # Charges (already positive)
+            self.expense_count += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        net_balance = self.total_income - self.total_expense  # Net payment vs charges
+        return {
+            'total_income': round(self.total_income, 2),
+            'total_expense': round(self.total_expense, 2),
+            'net_balance': round(net_balance, 2),
+            'income_count': self.income_count,
+            'expense_count': self.expense_count,
+            'total_transactions': self.income_count + self.expense_count
+        }
+
+
 class ENBDStatementParser:
-    def __init__(self, pdf_path: str, password: str = None):
+    def __init__(self, pdf_path: PdfSource, password: str = None, workers: int = 1,
+                 filename: str = None, extraction: str = 'text', page_filter: bool = True,
+                 instrumentation: StageTimer = None, categorizer: Categorizer = None,
+                 low_memory: bool = False, memory_budget: int = None, max_pages: int = None):
+        if extraction not in EXTRACTION_MODES:
+            raise ValueError(f"Unknown extraction mode {extraction!r}, expected one of {EXTRACTION_MODES}")
         self.pdf_path = pdf_path
+        self.extraction = extraction
+        self.page_filter = page_filter
+        # Stage durations and counts of the parse, reported in the metadata
+        self.instrumentation = instrumentation or StageTimer()
+        # Anything with a categorize(description) method, e.g. a MerchantMap
+        self.categorizer = categorizer or _default_categorizer
+        self.filename = filename or source_name(pdf_path)
         self.password = password
-        self.transactions = []
+        self.workers = max(1, workers or 1)
+        # Reopen the PDF every LOW_MEMORY_CHUNK_PAGES pages, and/or whenever
+        # the process grows past memory_budget bytes
+        self.low_memory = low_memory
+        self.memory_budget = memory_budget
+        # Statements with more pages are refused before any text is extracted
+        self.max_pages = max_pages
+        self.transactions = TransactionTable()
         self.statement_info = {}
-        
+        self.summary = StatementSummary()
+        self.page_count = 0
+        self.skipped_pages = 0
+
     def extract_text(self) -> List[str]:
         """Extract text from all pages of the PDF."""
-        with pdfplumber.open(self.pdf_path, password=self.password) as pdf:
-            pages = []
-            for page in pdf.pages:
+        return list(self.iter_pages())
+
+    def candidate_pages(self, page_count: int) -> Optional[List[bool]]:
+        """Flag the pages worth a full extraction, or None to extract them all.
+
+        See ``page_filter.transaction_pages``; also sets ``self.skipped_pages``.
+        """
+        self.skipped_pages = 0
+        if not self.page_filter:
+            return None
+        from page_filter import transaction_pages
+        with self.instrumentation.stage('page_filter'):
+            keep = transaction_pages(self.pdf_path, self.password)
+        if keep is None or len(keep) != page_count:
+            return None
+        self.skipped_pages = keep.count(False)
+        return keep
+
+    def iter_pages(self) -> Iterator[str]:
+        """Yield the text of each non-empty page in order as it is extracted.
+
+        Pages that cannot hold transactions are skipped without extracting
+        their text (see ``candidate_pages``).
+        """
+        if self.workers > 1:
+            yield from self._iter_pages_parallel()
+            return
+        timer = self.instrumentation
+        for page in self.iter_pdf_pages():
+            with timer.stage('extract'):
                 text = page.extract_text()
-                if text:
-                    pages.append(text)
-        return pages
+                # Drop the page's cached layout objects once its text is out
+                page.close()
+            timer.count('pages_extracted')
+            if text:
+                yield text
+
+    def iter_pdf_pages(self) -> Iterator[Any]:
+        """Yield the pdfplumber pages worth extracting, in order.
+
+        The document is open while the generator runs; callers should be done
+        with a page, and close it, before asking for the next. In low-memory
+        mode, or once RSS is over the memory budget, the document is closed
+        and reopened between pages so pdfminer's document-wide object cache is
+        dropped too (counted as "reopens"), and freed memory is handed back to
+        the OS, including what the page filter's pdfium pass used.
+        """
+        timer = self.instrumentation
+        with timer.stage('open'):
+            pdf = open_pdf(self.pdf_path, password=self.password)
+            self.page_count = len(pdf.pages)
+        timer.count('pages', self.page_count)
+        try:
+            self._check_page_count()
+            keep = self.candidate_pages(self.page_count)
+            if self.low_memory or self.memory_budget:
+                release_memory()
+            since_open = 0
+            for index in range(self.page_count):
+                if keep is not None and not keep[index]:
+                    continue
+                if since_open and self._needs_flush(since_open):
+                    pdf.close()
+                    pdf = None
+                    release_memory()
+                    with timer.stage('open'):
+                        pdf = open_pdf(self.pdf_path, password=self.password)
+                    timer.count('reopens')
+                    since_open = 0
+                since_open += 1
+                yield pdf.pages[index]
+        finally:
+            if pdf is not None:
+                pdf.close()
+
+    def _check_page_count(self) -> None:
+        check_page_count(self.page_count, self.max_pages)
+
+    def _needs_flush(self, pages_since_open: int) -> bool:
+        if self.low_memory and pages_since_open >= LOW_MEMORY_CHUNK_PAGES:
+            return True
+        if self.memory_budget and pages_since_open >= BUDGET_MIN_PAGES:
+            rss = current_rss()
+            return rss is not None and rss > self.memory_budget
+        return False
+
+    def _iter_pages_parallel(self) -> Iterator[str]:
+        """Extract page text across a process pool, keeping page order.
+
+        Each worker opens the PDF itself, so nothing but the path, password and
+        page range is sent to it. Ranges are twice as many as workers to even
+        out pages that take longer to lay out. In-memory PDFs are sent to the
+        workers as bytes.
+        """
+        source = self.pdf_path
+        if not isinstance(source, (str, os.PathLike, bytes)):
+            if hasattr(source, 'read'):
+                source.seek(0)
+                source = source.read()
+            else:
+                source = bytes(source)
+        timer = self.instrumentation
+        with timer.stage('open'), open_pdf(source, password=self.password) as pdf:
+            page_count = self.page_count = len(pdf.pages)
+        timer.count('pages', page_count)
+        self._check_page_count()
+        keep = self.candidate_pages(page_count)
+        timer.count('pages_extracted', page_count - self.skipped_pages)
+        chunks = self.workers * 2
+        if self.low_memory or self.memory_budget:
+            # Each range is a fresh open of the PDF in a worker
+            chunks = max(chunks, -(-page_count // LOW_MEMORY_CHUNK_PAGES))
+        ranges = _page_ranges(page_count, chunks)
+        if len(ranges) < 2:
+            with timer.stage('extract'):
+                texts = _extract_page_range(source, self.password, 0, page_count, keep)
+            yield from (text for text in texts if text)
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(ranges))) as executor:
+            chunks = executor.map(
+                _extract_page_range,
+                [source] * len(ranges),
+                [self.password] * len(ranges),
+                [start for start, _ in ranges],
+                [stop for _, stop in ranges],
+                [keep and keep[start:stop] for start, stop in ranges],
+            )
+            while True:
+                # Time spent waiting on the workers
+                with timer.stage('extract'):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                yield from (text for text in chunk if text)
 
     def parse_statement_info(self, text: str) -> None:
         """Parse basic statement information."""
@@ -70,95 +449,319 @@ class ENBDStatementParser:
         if card_match:
             self.statement_info['card_number'] = card_match.group(1).strip()
 
+    def parse_page(self, page: str) -> Iterator[Transaction]:
+        """Yield the transactions found in the text of one page."""
+        # One scan of the page with a precompiled pattern (see TRANSACTION_RE)
+        build_transaction = self.build_transaction
+        for date, description, amount in TRANSACTION_RE.findall(page):
+            txn = build_transaction(date, description, amount)
+            if txn is not None:
+                yield txn
+
+    def build_transaction(self, date: str, description: str, amount: str) -> Optional[Transaction]:
+        """Build a transaction from the date, description and amount of a row,
+        or return None if the date is not a real date or the amount not a number."""
+        if parse_date(date) is None:
+            return None
+        try:
+            amount_float = parse_amount(amount)
+        except ValueError:
+            return None
+        description = description.strip()
+        # Same rule as determine_transaction_type, without the call per row
+        transaction_type = 'Expense' if amount_float > 0 else 'Income'
+        return Transaction(date, description, amount_float,
+                           transaction_type, self.categorizer.categorize(description))
+
     def parse_transactions(self, pages: List[str]) -> None:
         """Parse transactions from the statement."""
         for page in pages:
-            # Split the page into lines
-            lines = page.split('\n')
-            
-            for line in lines:
-                # Skip empty lines
-                if not line.strip():
-                    continue
-                
-                # Try to match transaction patterns
-                # This pattern needs to be adjusted based on the actual format of your statement
-                # Example pattern for date, description, and amount
-                transaction_match = re.search(r'(\d{2}/\d{2}/\d{4})\s+(.+?)\s+([-\d,.]+)\s*$', line)
-                
-                if transaction_match:
-                    date, description, amount = transaction_match.groups()
-                    try:
-                        amount_float = float(amount.replace(',', ''))
-                        transaction_type = determine_transaction_type(amount_float, description)
-                        transaction = {
-                            'date': date,
-                            'description': description.strip(),
-                            'amount': amount_float,
-                            'type': transaction_type,
-                            'category': categorize(description)
-                        }
-                        self.transactions.append(transaction)
-                    except ValueError:
-                        continue
+            self.transactions.extend(self.parse_page(page))
 
-    def parse(self) -> Dict[str, Any]:
-        """Main parsing function."""
-        pages = self.extract_text()
-        if not pages:
+    def iter_transactions(self) -> Iterator[Transaction]:
+        """Yield transactions while pages are extracted, one page at a time.
+
+        Statement info is read from the first page and ``self.summary`` is
+        updated as each transaction is produced, so both are complete once the
+        generator is exhausted. Only the page being parsed is held in memory.
+        """
+        self.statement_info = {}
+        self.summary = StatementSummary()
+        if self.extraction == 'layout':
+            transactions = self._iter_layout_transactions()
+        else:
+            transactions = self._iter_text_transactions()
+        for txn in transactions:
+            self.summary.add(txn)
+            yield txn
+
+    def _iter_text_transactions(self) -> Iterator[Transaction]:
+        timer = self.instrumentation
+        first_page = True
+        for text in self.iter_pages():
+            with timer.stage('parse'):
+                if first_page:
+                    # Parse statement information from the first page
+                    self.parse_statement_info(text)
+                    first_page = False
+                # One page of rows at a time, so consumer time is not counted
+                transactions = list(self.parse_page(text))
+            timer.count('lines', text.count('\n') + 1)
+            timer.count('transactions', len(transactions))
+            yield from transactions
+        if first_page:
             raise ValueError("No text could be extracted from the PDF")
 
-        # Parse statement information from the first page
-        self.parse_statement_info(pages[0])
-        
-        # Parse transactions from all pages
-        self.parse_transactions(pages)
+    def _iter_layout_transactions(self) -> Iterator[Transaction]:
+        """Read rows from word positions instead of full-page text.
+
+        Pages are read in full until the transaction table's columns are found;
+        every later page is cropped to the table before its words are
+        extracted. Always runs in this process.
+        """
+        timer = self.instrumentation
+        found_text = False
+        region = None
+        for page in self.iter_pdf_pages():
+            with timer.stage('extract'):
+                if region is None:
+                    words = page.extract_words()
+                else:
+                    words = page.crop(region.bbox(page)).extract_words()
+                page.close()
+            timer.count('pages_extracted')
+            with timer.stage('parse'):
+                lines = group_lines(words)
+                if region is None:
+                    if lines and not found_text:
+                        # Parse statement information from the first page
+                        self.parse_statement_info('\n'.join(map(line_text, lines)))
+                    region = TransactionRegion.detect(lines)
+                found_text = found_text or bool(lines)
+                rows = region.rows(lines) if region is not None else ()
+                transactions = [txn for txn in (self.build_transaction(*row) for row in rows)
+                                if txn is not None]
+            timer.count('lines', len(lines))
+            timer.count('transactions', len(transactions))
+            yield from transactions
+        if not found_text:
+            raise ValueError("No text could be extracted from the PDF")
 
-        # Segregate transactions by type
-        income_transactions = [txn for txn in self.transactions if txn['type'] == 'Income']
-        expense_transactions = [txn for txn in self.transactions if txn['type'] == 'Expense']
+    def parse(self, layout: str = 'records') -> Dict[str, Any]:
+        """Main parsing function."""
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout {layout!r}, expected one of {LAYOUTS}")
+        self.transactions = TransactionTable(self.iter_transactions())
+        return self.build_result(layout)
+
+    def build_result(self, layout: str = 'records') -> Dict[str, Any]:
+        """Build the output document from the parsed transaction table."""
+        table = self.transactions
+        result = {'statement_info': self.statement_info}
+        with self.instrumentation.stage('build_result'):
+            if layout == 'columnar':
+                result['transactions'] = table.to_columns()
+                result['summary'] = self.summary.as_dict()
+                result['views'] = {
+                    'income': table.income.indices(),
+                    'expense': table.expense.indices()
+                }
+            else:
+                # Segregate transactions by type, sharing the row dicts
+                rows = table.to_dicts()
+                result['transactions'] = rows
+                result['summary'] = self.summary.as_dict()
+                result['income_transactions'] = [rows[i] for i in table.income.indices()]
+                result['expense_transactions'] = [rows[i] for i in table.expense.indices()]
+        result['metadata'] = self.build_metadata(layout)
+        return result
+
+    def build_metadata(self, layout: str = 'records') -> Dict[str, Any]:
+        metadata = {
+            'parsed_at': datetime.now().isoformat(),
+            'source_file': self.filename,
+            'page_count': self.page_count,
+            'skipped_pages': self.skipped_pages,
+            'layout': layout,
+            **self.instrumentation.as_dict()
+        }
+        if isinstance(self.categorizer, MerchantMap):
+            metadata['merchant_map'] = self.categorizer.stats()
+        return metadata
 
-        # Calculate financial summary for credit card statement
-        total_income = sum(abs(txn['amount']) for txn in income_transactions)  # Credits/payments (show as positive)
-        total_expense = sum(txn['amount'] for txn in expense_transactions)  # Charges (already positive)
-        net_balance = total_income - total_expense  # Net payment vs charges
+    def write_stream(self, fp: BinaryIO, fmt: str = 'compact', backend: str = 'auto') -> Dict[str, Any]:
+        """Parse the statement, writing each transaction to fp as it is produced.
 
-        # Prepare the final output
-        result = {
+        Nothing but the current page is kept in memory. Returns the statement
+        info, summary and metadata that were written.
+        """
+        writer = StatementWriter(fp, fmt, backend)
+        started = False
+        for txn in self.iter_transactions():
+            if not started:
+                # The statement info is known once the first page is read
+                writer.begin(self.statement_info)
+                started = True
+            writer.add(txn)
+        if not started:
+            writer.begin(self.statement_info)
+        document = {
             'statement_info': self.statement_info,
-            'transactions': self.transactions,
-            'summary': {
-                'total_income': round(total_income, 2),
-                'total_expense': round(total_expense, 2),  
-                'net_balance': round(net_balance, 2),
-                'income_count': len(income_transactions),
-                'expense_count': len(expense_transactions),
-                'total_transactions': len(self.transactions)
-            },
-            'income_transactions': income_transactions,
-            'expense_transactions': expense_transactions,
-            'metadata': {
-                'parsed_at': datetime.now().isoformat(),
-                'source_file': os.path.basename(self.pdf_path)
-            }
+            'summary': self.summary.as_dict(),
+            'metadata': dict(self.build_metadata('records'), format=fmt)
         }
-        
-        return result
+        writer.finish(document['summary'], document['metadata'])
+        return document
 
-def parse_statement(pdf_path: str, output_path: str = None, password: str = None) -> Dict[str, Any]:
+def parse_statement_iter(pdf_path: PdfSource, password: str = None, workers: int = 1,
+                         extraction: str = 'text', page_filter: bool = True,
+                         low_memory: bool = False, memory_budget: int = None) -> Iterator[Transaction]:
+    """
+    Yield the transactions of an ENBD bank statement as its pages are extracted.
+
+    Use ``ENBDStatementParser.iter_transactions()`` directly to also read the
+    running ``summary`` and ``statement_info`` of the parser.
+
+    Args:
+        pdf_path (str, bytes or file object): Path to the PDF file, or its contents
+        password (str, optional): Password for protected PDF file
+        workers (int, optional): Number of processes used to extract page text
+        extraction (str, optional): "text" (default) or "layout"
+        page_filter (bool, optional): Skip pages without date-shaped text
+        low_memory (bool, optional): Reopen the PDF every few pages
+        memory_budget (int, optional): RSS in bytes above which the PDF is reopened
+
+    Yields:
+        Transaction records in statement order
+    """
+    parser = ENBDStatementParser(pdf_path, password, workers=workers, extraction=extraction,
+                                 page_filter=page_filter, low_memory=low_memory,
+                                 memory_budget=memory_budget)
+    yield from parser.iter_transactions()
+
+def parse_statement(pdf_path: PdfSource, output_path: str = None, password: str = None,
+                    workers: int = 1, cache: Union[ParseCache, str] = None,
+                    layout: str = 'records', analytics: bool = False,
+                    output_format: str = 'json', extraction: str = 'text',
+                    page_filter: bool = True, instrumentation: StageTimer = None,
+                    merchant_map: Union[MerchantMap, str] = None, low_memory: bool = False,
+                    memory_budget: int = None, max_pages: int = None,
+                    sandbox: Dict[str, Any] = None) -> Dict[str, Any]:
     """
     Parse an ENBD bank statement and optionally save to JSON file.
     
     Args:
-        pdf_path (str): Path to the PDF file
+        pdf_path (str, bytes or file object): Path to the PDF file, or its
+            contents as bytes or a seekable binary file object
         output_path (str, optional): Path to save the JSON output
         password (str, optional): Password for protected PDF file
+        workers (int, optional): Number of processes used to extract page text
+        cache (ParseCache or str, optional): Parse cache, or its directory, to
+            reuse results of a PDF with the same content
+        layout (str, optional): "records" (default) or "columnar"
+        analytics (bool, optional): Add weekly/monthly series and category
+            breakdowns under "analytics"
+        output_format (str, optional): "json" (default, indented), or
+            "compact"/"ndjson" to stream transactions to output_path while
+            parsing. Streaming bypasses the cache, layout and analytics options.
+        extraction (str, optional): "text" (default) matches lines of page
+            text; "layout" reads the transaction table from word positions
+        page_filter (bool, optional): Find pages without date-shaped text
+            with a quick scan and skip their full extraction (default: True)
+        instrumentation (StageTimer, optional): Records stage durations and
+            counts, which are also reported under metadata "stages"/"counts"
+        merchant_map (MerchantMap or str, optional): Merchant category map, or
+            its JSON file, to categorize through; newly learned merchants are
+            saved to it after the parse
+        low_memory (bool, optional): Reopen the PDF every
+            LOW_MEMORY_CHUNK_PAGES pages so memory stays flat on very long
+            statements, at some cost in time
+        memory_budget (int, optional): RSS in bytes above which the PDF is
+            reopened to drop its caches
+        max_pages (int, optional): Refuse statements with more pages
+        sandbox (dict, optional): Parse in a child process under these
+            limits, e.g. ``{'timeout': 30, 'cpu_time': 20, 'memory_limit':
+            2 ** 30}`` (see ``sandbox.sandboxed_parse``); ``{}`` for the
+            default timeout alone. Not available when streaming.
         
     Returns:
-        Dict containing the parsed statement data
+        Dict containing the parsed statement data. When streaming, only the
+        statement info, summary and metadata, as transactions are not kept.
+
+    Raises:
+        sandbox.LimitExceeded: when the statement hits a limit (a ValueError)
     """
-    parser = ENBDStatementParser(pdf_path, password)
-    result = parser.parse()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}, expected one of {OUTPUT_FORMATS}")
+    timer = instrumentation or StageTimer()
+    if isinstance(merchant_map, str):
+        merchant_map = MerchantMap(merchant_map)
+    if output_path and output_format in STREAMING_FORMATS:
+        if sandbox is not None:
+            raise ValueError("A sandboxed parse cannot stream its output")
+        parser = ENBDStatementParser(pdf_path, password, workers=workers, extraction=extraction,
+                                     page_filter=page_filter, instrumentation=timer,
+                                     categorizer=merchant_map, low_memory=low_memory,
+                                     memory_budget=memory_budget, max_pages=max_pages)
+        with open(output_path, 'wb') as f:
+            document = parser.write_stream(f, output_format)
+        if merchant_map is not None:
+            merchant_map.save()
+        return document
+
+    if isinstance(cache, str):
+        cache = ParseCache(cache)
+
+    result = None
+    if cache is not None:
+        with timer.stage('cache_lookup'):
+            version = f"{CACHE_VERSION}-{layout}-{extraction}"
+            if merchant_map is not None:
+                # Overrides change categories, so they are part of the key
+                version += '-' + merchant_map.version()
+            key = ParseCache.key(pdf_path, version, password)
+            result = cache.get(key)
+        if result is not None:
+            # The limit may be lower than when the result was cached
+            check_page_count(result['metadata']['page_count'], max_pages)
+            result['metadata']['source_file'] = source_name(pdf_path)
+            result['metadata']['cache_hit'] = True
+
+    if result is None and sandbox is not None:
+        from sandbox import sandboxed_parse
+        if merchant_map is not None and not merchant_map.path:
+            raise ValueError("A sandboxed parse needs the merchant map as a file")
+        with timer.stage('sandbox'):
+            result = sandboxed_parse(pdf_path, password, layout, max_pages=max_pages, extraction=extraction,
+                                     page_filter=page_filter, low_memory=low_memory,
+                                     memory_budget=memory_budget,
+                                     merchant_map=merchant_map and merchant_map.path, **sandbox)
+        for stage, seconds in result['metadata']['stages'].items():
+            timer.add(stage, seconds)
+        if merchant_map is not None:
+            # The child learned into the file
+            merchant_map.load()
+        if cache is not None:
+            with timer.stage('cache_store'):
+                cache.put(key, result)
+    elif result is None:
+        parser = ENBDStatementParser(pdf_path, password, workers=workers, extraction=extraction,
+                                     page_filter=page_filter, instrumentation=timer,
+                                     categorizer=merchant_map, low_memory=low_memory,
+                                     memory_budget=memory_budget, max_pages=max_pages)
+        result = parser.parse(layout)
+        if merchant_map is not None:
+            merchant_map.save()
+        if cache is not None:
+            with timer.stage('cache_store'):
+                cache.put(key, result)
+
+    if analytics:
+        from analytics import analyze
+        with timer.stage('analytics'):
+            result['analytics'] = analyze(result['transactions'])
+    # A cache hit reports the time of this call, not of the original parse
+    result['metadata']['stages'] = timer.as_dict()['stages']
     
     if output_path:
         with open(output_path, 'w', encoding='utf-8') as f:
@@ -166,29 +769,332 @@ def parse_statement(pdf_path: str, output_path: str = None, password: str = None
     
     return result
 
-if __name__ == "__main__":
-    import sys
+def _batch_parse(pdf_path: str, password: str = None, options: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Parse one statement for batch mode, turning failures into error records.
+
+    options are passed on to parse_statement().
+    """
+    try:
+        result = parse_statement(pdf_path, password=password, **(options or {}))
+    except Exception as e:
+        return {'source_path': pdf_path, 'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+    return {'source_path': pdf_path, 'status': 'ok', 'result': result}
+
+
+def find_statements(inputs: List[str]) -> List[str]:
+    """Expand directories and glob patterns into a sorted list of PDF paths."""
+    import glob
+
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = [os.path.join(item, name) for name in os.listdir(item)]
+        else:
+            matches = glob.glob(item, recursive=True)
+        paths.update(os.path.abspath(path) for path in matches
+                     if path.lower().endswith('.pdf') and os.path.isfile(path))
+    return sorted(paths)
+
+
+def _done_paths(output_path: str) -> set:
+    """Return the source paths already recorded in a JSONL output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)['source_path'])
+            except (ValueError, KeyError, TypeError):
+                # A line cut short by an interrupted run; that file is parsed again
+                continue
+    return done
+
+
+def _megabytes(mb: Optional[int]) -> Optional[int]:
+    return mb * 1024 * 1024 if mb else None
+
+
+def _add_limit_arguments(arg_parser) -> None:
+    arg_parser.add_argument('--max-pages', type=int, metavar='N',
+                            help='refuse statements with more pages')
+    arg_parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                            help='parse in a sandboxed child process, killed after this long')
+    arg_parser.add_argument('--cpu-time', type=float, metavar='SECONDS',
+                            help='parse in a sandboxed child process allowed this much CPU time')
+    arg_parser.add_argument('--max-memory', type=int, metavar='MB',
+                            help='parse in a sandboxed child process limited to this much address space')
+
+
+def _sandbox_limits(args) -> Optional[Dict[str, Any]]:
+    """parse_statement()'s sandbox argument for the limit options, None without any."""
+    if args.timeout is None and args.cpu_time is None and args.max_memory is None:
+        return None
+    limits = {'cpu_time': args.cpu_time, 'memory_limit': _megabytes(args.max_memory)}
+    if args.timeout is not None:
+        limits['timeout'] = args.timeout
+    return limits
+
+
+def _check_limits(arg_parser, args) -> None:
+    """Reject worker counts and memory budgets that cannot work, before any PDF is opened."""
+    if args.workers < 1:
+        arg_parser.error('--workers must be at least 1')
+    if args.memory_budget is not None and args.memory_budget <= 0:
+        arg_parser.error('--memory-budget must be a positive number of MB')
+    for option in ('max_pages', 'timeout', 'cpu_time', 'max_memory'):
+        value = getattr(args, option)
+        if value is not None and value <= 0:
+            arg_parser.error(f"--{option.replace('_', '-')} must be positive")
+
+
+def batch_main(argv: List[str] = None) -> int:
+    """Command line entry point for ``enbd_parser.py batch``."""
+    import argparse
+    import time
+
+    arg_parser = argparse.ArgumentParser(
+        prog='enbd_parser.py batch',
+        description='Parse many statements concurrently into one JSON line per file.')
+    arg_parser.add_argument('inputs', nargs='+', help='directories or glob patterns of statement PDFs')
+    arg_parser.add_argument('-o', '--output', default='-',
+                            help='JSONL file to write (default: stdout)')
+    arg_parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                            help='parallel worker processes (default: CPU count)')
+    arg_parser.add_argument('-p', '--password', help='password for protected statements')
+    arg_parser.add_argument('--resume', action='store_true',
+                            help='skip files already recorded in the output file')
+    arg_parser.add_argument('--cache-dir', help='reuse and store parse results in this directory')
+    arg_parser.add_argument('--layout', choices=LAYOUTS, default='records',
+                            help='result layout (default: records)')
+    arg_parser.add_argument('--extraction', choices=EXTRACTION_MODES, default='text',
+                            help='read rows from page text or from word positions (default: text)')
+    arg_parser.add_argument('--no-page-filter', dest='page_filter', action='store_false',
+                            help='fully extract every page, even those without dates')
+    arg_parser.add_argument('--merchant-map', metavar='PATH',
+                            help='categorize through, and learn into, this merchant map JSON file')
+    arg_parser.add_argument('--low-memory', action='store_true',
+                            help='reopen each PDF every few pages to keep memory flat')
+    arg_parser.add_argument('--memory-budget', type=int, metavar='MB',
+                            help='reopen a PDF whenever a worker grows past this many MB')
+    _add_limit_arguments(arg_parser)
+    arg_parser.add_argument('--dataset',
+                            help='also append transactions to a dataset partitioned by year/month here')
+    arg_parser.add_argument('--dataset-format', choices=('parquet', 'feather', 'csv'), default='parquet',
+                            help='file format of the dataset (default: parquet, which needs pyarrow)')
+    args = arg_parser.parse_args(argv)
+
+    if args.resume and args.output == '-':
+        arg_parser.error('--resume needs an --output file')
+    _check_limits(arg_parser, args)
+    if args.dataset:
+        from exporters import append_to_dataset
+        if args.dataset_format != 'csv':
+            try:
+                import pyarrow
+            except ImportError:
+                arg_parser.error(f'--dataset-format {args.dataset_format} needs pyarrow; use csv instead')
+
+    paths = find_statements(args.inputs)
+    skipped = 0
+    if args.resume:
+        done = _done_paths(args.output)
+        pending = [path for path in paths if path not in done]
+        skipped = len(paths) - len(pending)
+        paths = pending
+
+    if args.output == '-':
+        out = sys.stdout
+    else:
+        out = open(args.output, 'a' if args.resume else 'w', encoding='utf-8')
+
+    from collections import deque
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    from concurrent.futures.process import BrokenProcessPool
+
+    options = {'cache': args.cache_dir, 'layout': args.layout, 'extraction': args.extraction,
+               'page_filter': args.page_filter, 'merchant_map': args.merchant_map,
+               'low_memory': args.low_memory, 'memory_budget': _megabytes(args.memory_budget),
+               'max_pages': args.max_pages, 'sandbox': _sandbox_limits(args)}
+    workers = max(1, args.workers)
+    files = errors = pages = 0
+    start = time.perf_counter()
+    # A worker that dies breaks the pool and every file in flight with it.
+    # The pool is replaced and those files are parsed again one at a time
+    # (suspects), so only a file that kills its process alone gets an error.
+    pending = deque(paths)
+    suspects = deque()
+    running = {}
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while pending or suspects or running:
+            # A suspect runs with nothing else in flight; other files keep the pool busy
+            while len(running) < workers * 2 and not any(alone for _, alone in running.values()):
+                if suspects:
+                    if running:
+                        break
+                    path, alone = suspects.popleft(), True
+                elif pending:
+                    path, alone = pending.popleft(), False
+                else:
+                    break
+                running[executor.submit(_batch_parse, path, args.password, options)] = (path, alone)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                path, alone = running.pop(future)
+                try:
+                    record = future.result()
+                except BrokenProcessPool as exc:
+                    broken = True
+                    if not alone:
+                        suspects.append(path)
+                        continue
+                    record = {'source_path': path, 'status': 'error',
+                              'error': f"{type(exc).__name__}: the parse process died"}
+                files += 1
+                if record['status'] == 'ok':
+                    pages += record['result']['metadata']['page_count']
+                    if args.dataset:
+                        append_to_dataset(record['result'], args.dataset, args.dataset_format)
+                else:
+                    errors += 1
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                out.flush()
+            if broken:
+                # Every other file in flight fails with the pool; parse them again alone
+                suspects.extend(path for path, _ in running.values())
+                running.clear()
+                executor.shutdown()
+                print(f"A parse process died; restarted the pool ({len(suspects)} files to retry)",
+                      file=sys.stderr)
+                executor = ProcessPoolExecutor(max_workers=workers)
+    finally:
+        executor.shutdown()
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Parsed {files} files ({errors} errors, {skipped} skipped) and {pages} pages "
+          f"in {elapsed:.2f}s: {files / elapsed if elapsed else 0:.2f} files/s, "
+          f"{pages / elapsed if elapsed else 0:.2f} pages/s", file=sys.stderr)
+    return 1 if errors else 0
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point."""
+    import argparse
     import getpass
-    
-    if len(sys.argv) < 2:
-        print("Usage: python enbd_parser.py <pdf_file> [output_json_file]")
-        sys.exit(1)
-    
-    pdf_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
-    
+
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == 'batch':
+        return batch_main(argv[1:])
+    if argv and argv[0] in ('ingest', 'query'):
+        from ledger import main as ledger_main
+        return ledger_main(argv)
+    if argv and argv[0] == 'merchants':
+        from merchants import main as merchants_main
+        return merchants_main(argv[1:])
+    if argv and argv[0] == 'watch':
+        from watcher import main as watch_main
+        return watch_main(argv[1:])
+
+    arg_parser = argparse.ArgumentParser(
+        prog='enbd_parser.py',
+        description='Parse an ENBD credit card statement PDF into JSON.',
+        epilog='Run "enbd_parser.py batch --help" to parse many statements at once, and '
+               '"enbd_parser.py ingest --help" / "query --help" to keep them in a SQLite ledger. '
+               '"enbd_parser.py merchants --help" edits merchant map overrides, and '
+               '"enbd_parser.py watch --help" parses statements as they land in a directory.')
+    arg_parser.add_argument('pdf_file', help='statement PDF to parse')
+    arg_parser.add_argument('output_file', nargs='?', help='write JSON here instead of stdout')
+    arg_parser.add_argument('-w', '--workers', type=int, default=1,
+                            help='processes used for page text extraction (default: 1)')
+    arg_parser.add_argument('--cache-dir', help='reuse and store parse results in this directory')
+    arg_parser.add_argument('--layout', choices=LAYOUTS, default='records',
+                            help='"columnar" writes each transaction once, with income/expense '
+                                 'as row indices (default: records)')
+    arg_parser.add_argument('--analytics', action='store_true',
+                            help='add weekly/monthly series and category breakdowns')
+    arg_parser.add_argument('--extraction', choices=EXTRACTION_MODES, default='text',
+                            help='"layout" reads the transaction table from word positions '
+                                 'instead of matching lines of page text (default: text)')
+    arg_parser.add_argument('--no-page-filter', dest='page_filter', action='store_false',
+                            help='fully extract every page, even those without dates')
+    arg_parser.add_argument('--merchant-map', metavar='PATH',
+                            help='categorize through, and learn into, this merchant map JSON file')
+    arg_parser.add_argument('--low-memory', action='store_true',
+                            help='reopen the PDF every few pages to keep memory flat on very long statements')
+    arg_parser.add_argument('--memory-budget', type=int, metavar='MB',
+                            help='reopen the PDF whenever the process grows past this many MB')
+    _add_limit_arguments(arg_parser)
+    arg_parser.add_argument('--format', choices=OUTPUT_FORMATS, default='json',
+                            help='"json" is the indented document; "compact" and "ndjson" '
+                                 'stream transactions while parsing (default: json)')
+    arg_parser.add_argument('--export', metavar='PATH',
+                            help='also write the transactions as a typed table: .csv, or .parquet/.feather '
+                                 'with pyarrow installed')
+    arg_parser.add_argument('--export-format', help='export format if the extension does not tell')
+    args = arg_parser.parse_args(argv)
+    if args.format in STREAMING_FORMATS and (args.layout != 'records' or args.analytics or args.cache_dir
+                                             or args.export):
+        arg_parser.error(f'--format {args.format} cannot be combined with --layout, --analytics, '
+                         f'--cache-dir or --export')
+    _check_limits(arg_parser, args)
+    sandbox = _sandbox_limits(args)
+    if sandbox is not None and (args.format in STREAMING_FORMATS or args.workers > 1):
+        arg_parser.error('--timeout, --cpu-time and --max-memory cannot be combined with '
+                         f'--format {args.format} or --workers')
+    if not os.path.isfile(args.pdf_file):
+        arg_parser.error(f'{args.pdf_file}: no such file')
+    if args.export:
+        from exporters import EXPORTERS, format_for_path
+        if args.export_format is None:
+            try:
+                format_for_path(args.export)
+            except ValueError as e:
+                arg_parser.error(str(e))
+        elif args.export_format not in EXPORTERS:
+            arg_parser.error(f'--export-format must be one of {tuple(EXPORTERS)}')
+
     try:
         # Prompt for password if needed
         try:
-            with pdfplumber.open(pdf_file) as pdf:
+            with open_pdf(args.pdf_file):
                 pass
             password = None
         except:
             password = getpass.getpass("Enter PDF password: ")
             
-        result = parse_statement(pdf_file, output_file, password)
-        if not output_file:
+        merchant_map = MerchantMap(args.merchant_map) if args.merchant_map else None
+        if args.format in STREAMING_FORMATS and not args.output_file:
+            parser = ENBDStatementParser(args.pdf_file, password, workers=args.workers,
+                                         extraction=args.extraction, page_filter=args.page_filter,
+                                         categorizer=merchant_map, low_memory=args.low_memory,
+                                         memory_budget=_megabytes(args.memory_budget),
+                                         max_pages=args.max_pages)
+            parser.write_stream(sys.stdout.buffer, args.format)
+            sys.stdout.buffer.flush()
+            if merchant_map is not None:
+                merchant_map.save()
+            return 0
+
+        result = parse_statement(args.pdf_file, args.output_file, password,
+                                 workers=args.workers, cache=args.cache_dir, layout=args.layout,
+                                 analytics=args.analytics, output_format=args.format,
+                                 extraction=args.extraction, page_filter=args.page_filter,
+                                 merchant_map=merchant_map, low_memory=args.low_memory,
+                                 memory_budget=_megabytes(args.memory_budget),
+                                 max_pages=args.max_pages, sandbox=sandbox)
+        if args.export:
+            from exporters import export
+            export(result, args.export, args.export_format)
+        if not args.output_file:
             print(json.dumps(result, indent=2, ensure_ascii=False))
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
-        sys.exit(1)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import csv
+import os
+import uuid
+from datetime import date
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List
+
+from transactions import parse_date
+
+# Columns of every export, in order. Statement-level fields are repeated per
+# row so exports of many statements can be concatenated or partitioned.
+EXPORT_COLUMNS = ('date', 'description', 'amount', 'type', 'category', 'card_number', 'source_file')
+# Low-cardinality columns, dictionary-encoded in Arrow formats
+DICTIONARY_COLUMNS = ('type', 'category', 'card_number', 'source_file')
+
+Columns = Dict[str, List[Any]]
+Exporter = Callable[[Columns, str], None]
+
+
+def export_columns(result: Dict[str, Any]) -> Columns:
+    """Typed export columns of a parse_statement() result in either layout.
+
+    Dates become ``datetime.date`` objects (through the cached ``parse_date``)
+    and amounts floats.
+    """
+    transactions = result['transactions']
+    if isinstance(transactions, dict):
+        columns = {field: list(transactions[field]) for field in EXPORT_COLUMNS[:5]}
+    else:
+        columns = {field: [txn[field] for txn in transactions] for field in EXPORT_COLUMNS[:5]}
+    dates = [parse_date(value) for value in columns['date']]
+    if None in dates:
+        raise ValueError(f"invalid statement date {columns['date'][dates.index(None)]!r}")
+    columns['date'] = dates
+    columns['amount'] = [float(value) for value in columns['amount']]
+    rows = len(columns['date'])
+    columns['card_number'] = [result.get('statement_info', {}).get('card_number')] * rows
+    columns['source_file'] = [result.get('metadata', {}).get('source_file')] * rows
+    return columns
+
+
+def _require_pyarrow(fmt: str):
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(f"{fmt} export needs pyarrow (pip install pyarrow); "
+                          f"CSV export works without it") from None
+    return pyarrow
+
+
+def arrow_table(columns: Columns, decimal_amounts: bool = False):
+    """Build a pyarrow Table: date32 dates, float64 (or decimal128(18, 2))
+    amounts and dictionary-encoded type, category, card and file columns."""
+    pa = _require_pyarrow('Arrow')
+    if decimal_amounts:
+        amounts = pa.array([Decimal(f'{value:.2f}') for value in columns['amount']], pa.decimal128(18, 2))
+    else:
+        amounts = pa.array(columns['amount'], pa.float64())
+    arrays = {
+        'date': pa.array(columns['date'], pa.date32()),
+        'description': pa.array(columns['description'], pa.string()),
+        'amount': amounts,
+    }
+    for name in DICTIONARY_COLUMNS:
+        arrays[name] = pa.array(columns[name], pa.string()).dictionary_encode()
+    return pa.table([arrays[name] for name in columns], names=list(columns))
+
+
+def write_csv(columns: Columns, path: str) -> None:
+    """CSV with ISO dates and two-decimal amounts; needs no extra packages."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(list(columns))
+        rows = zip(*columns.values())
+        amount = list(columns).index('amount')
+        for row in rows:
+            row = list(row)
+            row[amount] = f'{row[amount]:.2f}'
+            writer.writerow(row)
+
+
+def write_parquet(columns: Columns, path: str) -> None:
+    _require_pyarrow('Parquet')
+    import pyarrow.parquet as pq
+    pq.write_table(arrow_table(columns), path)
+
+
+def write_feather(columns: Columns, path: str) -> None:
+    _require_pyarrow('Feather')
+    import pyarrow.feather as feather
+    feather.write_feather(arrow_table(columns), path)
+
+
+EXPORTERS: Dict[str, Exporter] = {
+    'csv': write_csv,
+    'parquet': write_parquet,
+    'feather': write_feather,
+}
+SUFFIXES = {'.csv': 'csv', '.parquet': 'parquet', '.pq': 'parquet', '.feather': 'feather', '.arrow': 'feather'}
+
+
+def register_exporter(name: str, exporter: Exporter, suffixes: Iterable[str] = ()) -> None:
+    """Add an export format; exporter(columns, path) writes the columns to path."""
+    EXPORTERS[name] = exporter
+    for suffix in suffixes:
+        SUFFIXES[suffix.lower()] = name
+
+
+def format_for_path(path: str) -> str:
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix not in SUFFIXES:
+        raise ValueError(f"Cannot tell the export format of {path!r}; pass one of {tuple(EXPORTERS)}")
+    return SUFFIXES[suffix]
+
+
+def export(result: Dict[str, Any], path: str, fmt: str = None) -> int:
+    """Write the transactions of a parse result to path; returns the row count.
+
+    The format defaults to the one matching the file extension.
+    """
+    fmt = fmt or format_for_path(path)
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Unknown export format {fmt!r}, expected one of {tuple(EXPORTERS)}")
+    columns = export_columns(result)
+    EXPORTERS[fmt](columns, path)
+    return len(columns['date'])
+
+
+def append_to_dataset(result: Dict[str, Any], directory: str, fmt: str = 'parquet') -> List[str]:
+    """Append the transactions of a parse result to a partitioned dataset.
+
+    Rows are split by month into hive-style ``year=YYYY/month=MM`` directories
+    and each call adds one new file per month, so appends never rewrite
+    existing data. ``pandas.read_parquet(directory)`` (or
+    ``pyarrow.dataset.dataset(directory, partitioning='hive')``) loads the
+    whole history, and filters on year/month only read the matching files.
+    Returns the paths written.
+    """
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Unknown export format {fmt!r}, expected one of {tuple(EXPORTERS)}")
+    columns = export_columns(result)
+    partitions: Dict[date, List[int]] = {}
+    for i, day in enumerate(columns['date']):
+        partitions.setdefault(day.replace(day=1), []).append(i)
+
+    suffix = next((s for s, name in SUFFIXES.items() if name == fmt), '')
+    basename = f'part-{uuid.uuid4().hex}{suffix}'
+    paths = []
+    for month, rows in sorted(partitions.items()):
+        part_dir = os.path.join(directory, f'year={month.year}', f'month={month.month:02d}')
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, basename)
+        # Write under a temporary name so readers never see a partial file
+        tmp_path = os.path.join(part_dir, '.' + basename + '.tmp')
+        EXPORTERS[fmt]({name: [values[i] for i in rows] for name, values in columns.items()}, tmp_path)
+        os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
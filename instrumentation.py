@@ -0,0 +1,177 @@
+import gc
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes, or None where /proc is missing."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def release_memory() -> None:
+    """Collect garbage and hand freed heap memory back to the OS.
+
+    Freed memory otherwise stays with the process allocator and keeps counting
+    towards RSS; ``malloc_trim`` returns it on glibc, elsewhere only the
+    garbage collection is done.
+    """
+    gc.collect()
+    global _malloc_trim
+    if _malloc_trim is None:
+        import ctypes
+        import ctypes.util
+
+        _malloc_trim = False
+        libc = ctypes.util.find_library('c')
+        if libc:
+            try:
+                _malloc_trim = ctypes.CDLL(libc).malloc_trim
+            except (OSError, AttributeError):
+                pass
+    if _malloc_trim:
+        _malloc_trim(0)
+
+
+_malloc_trim = None
+
+
+class _Stage:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer: 'StageTimer', name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class StageTimer:
+    """Default instrumentation of a parse: seconds per stage and named counts.
+
+    Stages can be entered many times (once per page, say) and their durations
+    add up. Anything with the same ``stage``, ``add``, ``count`` and
+    ``as_dict`` methods can be passed as a parser's ``instrumentation``, e.g.
+    a subclass that also forwards each stage to a tracing library.
+    """
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    def stage(self, name: str) -> _Stage:
+        """Context manager timing one run of a stage."""
+        return _Stage(self, name)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'stages': {name: round(seconds, 6) for name, seconds in self.durations.items()},
+            'counts': dict(self.counts)
+        }
+
+
+class Histogram:
+    """Cumulative latency histogram in the Prometheus sense."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Iterable[Tuple[str, int]]:
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield repr(float(bound)), total
+        yield '+Inf', total + self.counts[-1]
+
+
+class MetricsRegistry:
+    """Per-stage latency histograms, counters and gauges across parses, in one process.
+
+    Feed it finished timers with ``observe_timer`` and serve ``render()`` as
+    ``text/plain; version=0.0.4``. Metrics are kept per process; when the app
+    runs in several worker processes each one reports its own.
+    """
+
+    def __init__(self, prefix: str = 'enbd', buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def increment(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Record the current value of something that goes up and down, e.g. a queue length."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe_timer(self, timer: StageTimer) -> None:
+        """Record every stage duration and count of one finished parse or request."""
+        for stage, seconds in timer.durations.items():
+            self.observe(stage, seconds)
+        for name, n in timer.counts.items():
+            self.increment(name, n)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        name = f'{self.prefix}_stage_duration_seconds'
+        lines = [f'# HELP {name} Time spent in each processing stage.',
+                 f'# TYPE {name} histogram']
+        with self._lock:
+            for stage in sorted(self._histograms):
+                histogram = self._histograms[stage]
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum!r}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+            for counter in sorted(self._counters):
+                metric = f'{self.prefix}_{counter}_total'
+                lines.append(f'# TYPE {metric} counter')
+                lines.append(f'{metric} {self._counters[counter]}')
+            for gauge in sorted(self._gauges):
+                metric = f'{self.prefix}_{gauge}'
+                lines.append(f'# TYPE {metric} gauge')
+                lines.append(f'{metric} {self._gauges[gauge]!r}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,201 @@
+import copy
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted to a queue that is at capacity or closed."""
+
+
+class Job:
+    """One queued call and its outcome."""
+
+    def __init__(self, func: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = 'queued'
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status fields of the job, without its result."""
+        now = time.time()
+        return {
+            'id': self.id,
+            'status': self.status,
+            'submitted_at': self.submitted_at,
+            'wait_seconds': round((self.started_at or now) - self.submitted_at, 3),
+            'run_seconds': round((self.finished_at or now) - self.started_at, 3) if self.started_at else None,
+            'error': self.error
+        }
+
+    def snapshot(self) -> 'Job':
+        """A copy of the job's state and result, without the pending call."""
+        job = copy.copy(self)
+        job.func = job.args = job.kwargs = None
+        return job
+
+
+class JobQueue:
+    """Bounded in-process job queue served by a fixed pool of worker threads.
+
+    Finished jobs keep their result for ``result_ttl`` seconds and are then
+    dropped. Worker threads start on the first submit, so importing a module
+    that creates a queue does not spawn threads (which would not survive a
+    fork anyway). ``on_update`` is called with the job when it is queued,
+    starts and finishes, e.g. to publish its state to other processes.
+    ``close`` lets the jobs finish before the process exits.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 100, result_ttl: float = 600,
+                 on_update: Callable[[Job], None] = None):
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.on_update = on_update
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._waits = deque(maxlen=1000)
+        self._closed = False
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Job:
+        """Queue func(*args, **kwargs) and return its job; raises QueueFull."""
+        if self._closed:
+            raise QueueFull("Job queue is shutting down")
+        self._start()
+        self._expire()
+        job = Job(func, args, kwargs)
+        with self._lock:
+            self._jobs[job.id] = job
+        # Before the job is queued, so this never overwrites a later state
+        self._notify(job)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFull(f"Job queue is full ({self._queue.maxsize} jobs waiting)") from None
+        return job
+
+    def _notify(self, job: Job) -> None:
+        if self.on_update is None:
+            return
+        try:
+            self.on_update(job)
+        except Exception:
+            # Publishing is best effort; the job itself is unaffected
+            pass
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            job.started_at = time.time()
+            job.status = 'running'
+            with self._lock:
+                self._running += 1
+                self._waits.append(job.started_at - job.submitted_at)
+            self._notify(job)
+            try:
+                job.result = job.func(*job.args, **job.kwargs)
+                job.status = 'done'
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                job.status = 'failed'
+            finally:
+                job.finished_at = time.time()
+                # The arguments may hold whole uploads; drop them with the call
+                job.func = job.args = job.kwargs = None
+                with self._lock:
+                    self._running -= 1
+                    if job.status == 'done':
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+                self._notify(job)
+                self._queue.task_done()
+
+    def close(self, timeout: float = None) -> int:
+        """Stop taking jobs and wait up to timeout seconds for the queued and
+        running ones to finish.
+
+        Jobs still unfinished after that are failed, and published through
+        ``on_update``, so their status does not stay queued or running after
+        the process is gone. Returns how many were failed.
+        """
+        self._closed = True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._queue.all_tasks_done.wait(remaining)
+        # Jobs no thread has started are not started any more
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+        with self._lock:
+            unfinished = [job for job in self._jobs.values() if job.status in ('queued', 'running')]
+        for job in unfinished:
+            job.error = "The server stopped before the job finished; submit the statement again"
+            job.status = 'failed'
+            job.finished_at = time.time()
+            self._notify(job)
+        return len(unfinished)
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, worker activity and wait times of recently started jobs."""
+        now = time.time()
+        with self._lock:
+            waits = list(self._waits)
+            queued = [job.submitted_at for job in self._jobs.values() if job.status == 'queued']
+            return {
+                'depth': self._queue.qsize(),
+                'capacity': self._queue.maxsize,
+                'workers': self.workers,
+                'running': self._running,
+                'completed': self._completed,
+                'failed': self._failed,
+                'stored_jobs': len(self._jobs),
+                'oldest_queued_seconds': round(now - min(queued), 3) if queued else 0.0,
+                'avg_wait_seconds': round(sum(waits) / len(waits), 3) if waits else 0.0,
+                'max_wait_seconds': round(max(waits), 3) if waits else 0.0
+            }
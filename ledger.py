@@ -0,0 +1,301 @@
+import hashlib
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from enbd_parser import find_statements, parse_statement, source_name
+from statement_cache import file_digest
+from transactions import parse_date
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS statements (
+    id INTEGER PRIMARY KEY,
+    file_digest TEXT NOT NULL UNIQUE,
+    source_file TEXT,
+    card_number TEXT NOT NULL,
+    statement_period TEXT,
+    ingested_at TEXT NOT NULL,
+    transaction_count INTEGER NOT NULL,
+    new_transactions INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    txn_hash TEXT NOT NULL UNIQUE,
+    statement_id INTEGER NOT NULL REFERENCES statements(id),
+    date TEXT NOT NULL,
+    description TEXT NOT NULL,
+    amount REAL NOT NULL,
+    type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    card_number TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date);
+CREATE INDEX IF NOT EXISTS transactions_category_date ON transactions (category, date);
+CREATE INDEX IF NOT EXISTS transactions_type_date ON transactions (type, date);
+CREATE INDEX IF NOT EXISTS transactions_card_date ON transactions (card_number, date);
+'''
+
+# Expressions the query API can group by; dates are stored as YYYY-MM-DD
+GROUPS = {
+    'category': 'category',
+    'type': 'type',
+    'card': 'card_number',
+    'month': 'substr(date, 1, 7)',
+    'year': 'substr(date, 1, 4)',
+    'day': 'date',
+}
+
+
+def iso_date(date: str) -> str:
+    """Turn a statement date (DD/MM/YYYY) into YYYY-MM-DD, which sorts by date."""
+    parsed = parse_date(date)
+    if parsed is None:
+        raise ValueError(f"invalid statement date {date!r}")
+    return parsed.isoformat()
+
+
+def transaction_hashes(rows: Iterable[Dict[str, Any]], card_number: str) -> List[str]:
+    """Stable hashes of a statement's transactions, in order.
+
+    A hash covers the card, date, description and amount, plus how many
+    identical rows came before it in the statement, so two equal charges on
+    the same day stay two rows while the same charge printed on two
+    overlapping statements collapses into one.
+    """
+    seen = {}
+    hashes = []
+    for txn in rows:
+        fields = (card_number, txn['date'], txn['description'], f"{txn['amount']:.2f}")
+        occurrence = seen.get(fields, 0)
+        seen[fields] = occurrence + 1
+        hashes.append(hashlib.sha256('\0'.join(fields + (str(occurrence),)).encode('utf-8')).hexdigest())
+    return hashes
+
+
+def _parse_for_ledger(path: str, password: str = None) -> Dict[str, Any]:
+    """Parse one statement for ingestion; runs inside a worker process."""
+    try:
+        return {'path': path, 'result': parse_statement(path, password=password)}
+    except Exception as e:
+        return {'path': path, 'error': f"{type(e).__name__}: {e}"}
+
+
+class Ledger:
+    """SQLite store of parsed transactions across many statements.
+
+    Statements are recognised by the digest of their file and only ingested
+    once; transactions are deduplicated across statements by a stable hash
+    (see ``transaction_hashes``). Aggregations are served from indexes on
+    date, category, type and card number.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> 'Ledger':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def has_statement(self, digest: str) -> bool:
+        return self.conn.execute('SELECT 1 FROM statements WHERE file_digest = ?', (digest,)).fetchone() is not None
+
+    def add_statement(self, digest: str, result: Dict[str, Any], source_file: str = None) -> Tuple[int, int]:
+        """Store a parse_statement() result; returns (new, duplicate) transaction counts."""
+        info = result.get('statement_info', {})
+        card_number = info.get('card_number', '')
+        rows = result['transactions']
+        with self.conn:
+            cursor = self.conn.execute(
+                'INSERT INTO statements (file_digest, source_file, card_number, statement_period, '
+                'ingested_at, transaction_count, new_transactions) VALUES (?, ?, ?, ?, ?, ?, 0)',
+                (digest, source_file, card_number, info.get('statement_period'),
+                 datetime.now().isoformat(), len(rows)))
+            statement_id = cursor.lastrowid
+            before = self.conn.total_changes
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO transactions (txn_hash, statement_id, date, description, '
+                'amount, type, category, card_number) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                ((txn_hash, statement_id, iso_date(txn['date']), txn['description'], txn['amount'],
+                  txn['type'], txn['category'], card_number)
+                 for txn_hash, txn in zip(transaction_hashes(rows, card_number), rows)))
+            added = self.conn.total_changes - before
+            self.conn.execute('UPDATE statements SET new_transactions = ? WHERE id = ?', (added, statement_id))
+        return added, len(rows) - added
+
+    def ingest(self, paths: List[str], password: str = None, workers: int = 1) -> Dict[str, Any]:
+        """Parse and store every statement not ingested before.
+
+        Statements are parsed in up to ``workers`` processes and written from
+        this one. Returns counts of ingested, skipped and failed statements
+        and of new and duplicate transactions.
+        """
+        stats = {'ingested': 0, 'skipped': 0, 'failed': 0, 'new_transactions': 0,
+                 'duplicate_transactions': 0, 'errors': []}
+        pending = {}
+        for path in paths:
+            digest = file_digest(path)
+            if self.has_statement(digest) or digest in pending.values():
+                stats['skipped'] += 1
+            else:
+                pending[path] = digest
+
+        if workers > 1 and len(pending) > 1:
+            executor = ProcessPoolExecutor(max_workers=min(workers, len(pending)))
+            parsed = executor.map(_parse_for_ledger, pending, [password] * len(pending))
+        else:
+            executor = None
+            parsed = (_parse_for_ledger(path, password) for path in pending)
+        try:
+            for record in parsed:
+                path = record['path']
+                if 'error' in record:
+                    stats['failed'] += 1
+                    stats['errors'].append({'source_path': path, 'error': record['error']})
+                    continue
+                added, duplicates = self.add_statement(pending[path], record['result'], source_name(path))
+                stats['ingested'] += 1
+                stats['new_transactions'] += added
+                stats['duplicate_transactions'] += duplicates
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return stats
+
+    def aggregate(self, group_by: str = 'category', start: str = None, end: str = None,
+                  type_name: str = None, category: str = None, card_number: str = None) -> List[Dict[str, Any]]:
+        """Total, count and average of transactions per group.
+
+        Args:
+            group_by (str): "category", "type", "card", "month", "year" or "day"
+            start (str, optional): First date included, YYYY-MM-DD
+            end (str, optional): Last date included, YYYY-MM-DD
+            type_name (str, optional): "Income" or "Expense"
+            category (str, optional): Only this category
+            card_number (str, optional): Only this card, as printed on the statement
+
+        Returns:
+            One dict per group with group, total, count and average, largest total first
+            (in date order when grouping by a period).
+        """
+        if group_by not in GROUPS:
+            raise ValueError(f"Unknown group {group_by!r}, expected one of {tuple(GROUPS)}")
+        conditions, params = self._filters(start, end, type_name, category, card_number)
+        order = 'grp' if group_by in ('month', 'year', 'day') else 'total DESC'
+        sql = (f'SELECT {GROUPS[group_by]} AS grp, SUM(amount) AS total, COUNT(*) AS count '
+               f'FROM transactions {conditions} GROUP BY grp ORDER BY {order}')
+        return [{'group': row['grp'], 'total': round(row['total'], 2), 'count': row['count'],
+                 'average': round(row['total'] / row['count'], 2)}
+                for row in self.conn.execute(sql, params)]
+
+    def transactions(self, start: str = None, end: str = None, type_name: str = None,
+                     category: str = None, card_number: str = None, limit: int = None) -> List[Dict[str, Any]]:
+        """Stored transactions matching the filters, oldest first, with DD/MM/YYYY dates."""
+        conditions, params = self._filters(start, end, type_name, category, card_number)
+        sql = (f'SELECT date, description, amount, type, category, card_number '
+               f'FROM transactions {conditions} ORDER BY date, id')
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        rows = []
+        for row in self.conn.execute(sql, params):
+            txn = dict(row)
+            # Stored by iso_date(), so always YYYY-MM-DD
+            year, month, day = txn['date'].split('-')
+            txn['date'] = f'{day}/{month}/{year}'
+            rows.append(txn)
+        return rows
+
+    def statements(self) -> List[Dict[str, Any]]:
+        """Ingested statements, most recent first."""
+        return [dict(row) for row in self.conn.execute(
+            'SELECT source_file, card_number, statement_period, ingested_at, transaction_count, '
+            'new_transactions FROM statements ORDER BY id DESC')]
+
+    @staticmethod
+    def _filters(start: Optional[str], end: Optional[str], type_name: Optional[str],
+                 category: Optional[str], card_number: Optional[str]) -> Tuple[str, list]:
+        conditions = []
+        params = []
+        for column, op, value in (('date', '>=', start), ('date', '<=', end), ('type', '=', type_name),
+                                  ('category', '=', category), ('card_number', '=', card_number)):
+            if value is not None:
+                conditions.append(f'{column} {op} ?')
+                params.append(value)
+        return ('WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point for ``enbd_parser.py ingest|query`` and ``ledger.py``."""
+    import argparse
+    import json
+
+    arg_parser = argparse.ArgumentParser(
+        prog='enbd_parser.py',
+        description='Store parsed statements in a SQLite ledger and query it without re-parsing.')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help='parse and store statements not seen before')
+    ingest.add_argument('database', help='SQLite ledger file (created if missing)')
+    ingest.add_argument('inputs', nargs='+', help='directories or glob patterns of statement PDFs')
+    ingest.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='parallel parse processes (default: CPU count)')
+    ingest.add_argument('-p', '--password', help='password for protected statements')
+
+    query = commands.add_parser('query', help='aggregate stored transactions')
+    query.add_argument('database', help='SQLite ledger file')
+    query.add_argument('--group-by', choices=tuple(GROUPS), default='category',
+                       help='aggregate per group (default: category)')
+    query.add_argument('--from', dest='start', help='first date, YYYY-MM-DD')
+    query.add_argument('--to', dest='end', help='last date, YYYY-MM-DD')
+    query.add_argument('--type', dest='type_name', choices=('Income', 'Expense'))
+    query.add_argument('--category')
+    query.add_argument('--card', dest='card_number', help='card number as printed on the statement')
+    query.add_argument('--transactions', action='store_true',
+                       help='list matching transactions instead of aggregating')
+    query.add_argument('--limit', type=int, help='with --transactions, at most this many')
+    args = arg_parser.parse_args(argv)
+
+    if args.command == 'query' and not os.path.exists(args.database):
+        arg_parser.error(f'no ledger at {args.database}')
+    for option in ('start', 'end'):
+        value = getattr(args, option, None)
+        if value is not None:
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                arg_parser.error(f'dates must be YYYY-MM-DD, got {value!r}')
+
+    with Ledger(args.database) as ledger:
+        if args.command == 'ingest':
+            stats = ledger.ingest(find_statements(args.inputs), args.password, args.workers)
+            for error in stats['errors']:
+                print(f"Error: {error['source_path']}: {error['error']}", file=sys.stderr)
+            print(f"Ingested {stats['ingested']} statements ({stats['skipped']} already stored, "
+                  f"{stats['failed']} failed): {stats['new_transactions']} new transactions, "
+                  f"{stats['duplicate_transactions']} duplicates", file=sys.stderr)
+            return 1 if stats['failed'] else 0
+
+        filters = dict(start=args.start, end=args.end, type_name=args.type_name,
+                       category=args.category, card_number=args.card_number)
+        if args.transactions:
+            rows = ledger.transactions(limit=args.limit, **filters)
+        else:
+            rows = ledger.aggregate(args.group_by, **filters)
+        print(json.dumps(rows, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List
+
+# Bump when merchant_key() or the way entries are learned changes, so maps
+# learned the old way start afresh
+KEY_VERSION = 2
+
+# Trailing words of a card description that say where, not who
+COUNTRY_CODES = {'ae', 'are', 'uae', 'gb', 'gbr', 'ie', 'irl', 'us', 'usa', 'nl', 'nld', 'lu', 'lux',
+                 'sg', 'sgp', 'de', 'deu', 'fr', 'fra', 'in', 'ind', 'pk', 'pak', 'sa', 'sau'}
+CITIES = ('abu dhabi', 'ras al khaimah', 'umm al quwain', 'al ain', 'dubai', 'sharjah', 'ajman',
+          'fujairah', 'deira', 'jebel ali', 'karama', 'london', 'dublin', 'amsterdam', 'luxembourg',
+          'singapore')
+
+_SEPARATORS = str.maketrans('*#', '  ')
+# Trailing location phrases as word tuples, longest first
+_LOCATIONS = {tuple(city.split()) for city in CITIES} | {(code,) for code in COUNTRY_CODES}
+_LOCATION_LENGTHS = sorted({len(words) for words in _LOCATIONS}, reverse=True)
+_DIGITS_RE = re.compile(r'\d')
+
+
+def merchant_key(description: str) -> str:
+    """Reduce a card description to a canonical merchant key.
+
+    Lower-cases it, drops ``*``/``#`` separators, numbers and words with three
+    or more digits (store numbers, terminal ids) and trailing city names and country
+    codes: ``"CAREEM HALA RIDE DUBAI AE"`` becomes ``"careem hala ride"``.
+    A description made only of those parts is kept whole.
+    """
+    desc = description.lower()
+    words = [word for word in desc.translate(_SEPARATORS).split()
+             if word.isalpha() or not (word.isdigit() or len(_DIGITS_RE.findall(word)) >= 3)]
+    end = len(words)
+    while end:
+        for length in _LOCATION_LENGTHS:
+            if length <= end and tuple(words[end - length:end]) in _LOCATIONS:
+                end -= length
+                break
+        else:
+            break
+    return ' '.join(words[:end]) or ' '.join(desc.split())
+
+
+def rules_fingerprint(categorizer) -> str:
+    """Hash of a categorizer's rules; learned categories are only valid for the same rules."""
+    rules = getattr(categorizer, 'rules', None)
+    default = getattr(categorizer, 'default', None)
+    if rules is None:
+        # Not a keyword Categorizer; learned entries last as long as its type
+        rules = type(categorizer).__qualname__
+    data = json.dumps([KEY_VERSION, rules, default], default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:12]
+
+
+class MerchantMap:
+    """Persistent map from merchant keys to categories, learned across runs.
+
+    ``categorize`` reduces a description to its merchant key (see
+    ``merchant_key``) and looks it up: first in the user's overrides, then in
+    the categories learned on earlier lookups. The first description seen for
+    a key goes through the keyword categorizer in full, as it would without a
+    map, and its category (including the default one) is remembered for the
+    key, so every later variant of the merchant lands in the same category.
+    ``save`` writes the map as JSON; learned entries are dropped on load when
+    the categorizer's rules have changed, overrides are always kept.
+
+    Hits, override hits and misses are counted for ``stats``. Several
+    processes may share one file: ``save`` merges what is on disk before
+    replacing it, and an entry lost to a concurrent save is learned again.
+    """
+
+    def __init__(self, path: str = None, categorizer=None, memo_size: int = 4096):
+        if categorizer is None:
+            from enbd_parser import _default_categorizer as categorizer
+        self.path = path
+        self.categorizer = categorizer
+        self.fingerprint = rules_fingerprint(categorizer)
+        self.overrides: Dict[str, str] = {}
+        self.learned: Dict[str, str] = {}
+        self.hits = 0
+        self.override_hits = 0
+        self.misses = 0
+        self._new: Dict[str, str] = {}
+        self._overrides_changed = False
+        self._lock = threading.Lock()
+        self._key = lru_cache(maxsize=memo_size)(merchant_key)
+        if path:
+            self.load()
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            raise ValueError(f"{self.path} is not a merchant map: {e}") from None
+        return data if isinstance(data, dict) else {}
+
+    def load(self) -> None:
+        """Read overrides, and learned entries if they match the current rules."""
+        data = self._read()
+        self.overrides = dict(data.get('overrides', {}))
+        if data.get('rules') == self.fingerprint:
+            self.learned = dict(data.get('merchants', {}))
+        else:
+            self.learned = {}
+
+    def save(self) -> None:
+        """Write the map if anything changed since it was loaded or saved."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._new and not self._overrides_changed:
+                return
+            data = self._read()
+            merchants = data.get('merchants', {}) if data.get('rules') == self.fingerprint else {}
+            merchants.update(self._new)
+            overrides = self.overrides if self._overrides_changed else data.get('overrides', self.overrides)
+            document = {
+                'version': KEY_VERSION,
+                'rules': self.fingerprint,
+                'overrides': dict(sorted(overrides.items())),
+                'merchants': dict(sorted(merchants.items()))
+            }
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(document, f, ensure_ascii=False, indent=1)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            self.overrides = dict(overrides)
+            self.learned.update(merchants)
+            self._new = {}
+            self._overrides_changed = False
+
+    def categorize(self, description: str) -> str:
+        """Category of a description, learning it if its merchant is new."""
+        key = self._key(description)
+        category = self.overrides.get(key)
+        if category is not None:
+            self.override_hits += 1
+            return category
+        category = self.learned.get(key)
+        if category is not None:
+            self.hits += 1
+            return category
+        self.misses += 1
+        category = self.categorizer.categorize(description)
+        self.learned[key] = self._new[key] = category
+        return category
+
+    __call__ = categorize
+
+    def set_override(self, merchant: str, category: str) -> str:
+        """Always put a merchant, given as a key or a description, in category.
+
+        Returns the merchant key the override was stored under.
+        """
+        key = merchant_key(merchant)
+        self.overrides[key] = category
+        self._overrides_changed = True
+        return key
+
+    def remove_override(self, merchant: str) -> bool:
+        key = merchant_key(merchant)
+        if self.overrides.pop(key, None) is None:
+            return False
+        self._overrides_changed = True
+        return True
+
+    def version(self) -> str:
+        """Changes whenever the overrides or the rules do, which can change
+        categories; learned entries only repeat what the categorizer says."""
+        data = json.dumps([self.fingerprint, sorted(self.overrides.items())])
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()[:12]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.override_hits + self.misses
+        return {
+            'merchants': len(self.learned),
+            'overrides': len(self.overrides),
+            'lookups': lookups,
+            'hits': self.hits,
+            'override_hits': self.override_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.override_hits) / lookups, 4) if lookups else None
+        }
+
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point for ``enbd_parser.py merchants``."""
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(
+        prog='enbd_parser.py merchants',
+        description='Show a merchant category map and edit its overrides.')
+    arg_parser.add_argument('map', help='merchant map JSON file')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    show = commands.add_parser('show', help='list merchants and their categories')
+    show.add_argument('--category', help='only merchants in this category')
+    override = commands.add_parser('override', help='always put a merchant in a category')
+    override.add_argument('merchant', help='merchant key, or a description to derive it from')
+    override.add_argument('category')
+    remove = commands.add_parser('remove', help='drop the override of a merchant')
+    remove.add_argument('merchant', help='merchant key, or a description to derive it from')
+    key = commands.add_parser('key', help='print the merchant key of descriptions')
+    key.add_argument('descriptions', nargs='+')
+    args = arg_parser.parse_args(argv)
+
+    if args.command == 'key':
+        for description in args.descriptions:
+            print(merchant_key(description))
+        return 0
+
+    merchant_map = MerchantMap(args.map)
+    if args.command == 'show':
+        entries = {**merchant_map.learned, **merchant_map.overrides}
+        for merchant in sorted(entries):
+            category = entries[merchant]
+            if args.category and category != args.category:
+                continue
+            marker = ' (override)' if merchant in merchant_map.overrides else ''
+            print(f"{merchant}\t{category}{marker}")
+        return 0
+    if args.command == 'override':
+        key = merchant_map.set_override(args.merchant, args.category)
+        merchant_map.save()
+        print(f"{key}\t{args.category}")
+        return 0
+    if not merchant_map.remove_override(args.merchant):
+        print(f"No override for {merchant_key(args.merchant)!r}", file=sys.stderr)
+        return 1
+    merchant_map.save()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import io
+import os
+import re
+import threading
+from typing import BinaryIO, List, Optional, Union
+
+import pypdfium2
+
+# Loose on purpose: pdfium may put spaces between glyphs that pdfplumber joins,
+# and a page is only skipped when nothing on it looks like a date at all.
+DATE_TOKEN_RE = re.compile(r'\d\s*\d\s*/\s*\d\s*\d\s*/\s*\d\s*\d\s*\d\s*\d')
+
+# pdfium is not thread-safe, and the web app parses on several threads
+_PDFIUM_LOCK = threading.Lock()
+
+
+def _open_document(source: Union[str, bytes, BinaryIO], password: str = None) -> pypdfium2.PdfDocument:
+    if isinstance(source, (bytearray, memoryview)):
+        source = bytes(source)
+    elif isinstance(source, os.PathLike):
+        source = os.fspath(source)
+    elif not isinstance(source, (str, bytes)):
+        source.seek(0)
+        source = io.BytesIO(source.read())
+    return pypdfium2.PdfDocument(source, password=password)
+
+
+def transaction_pages(source: Union[str, bytes, BinaryIO], password: str = None) -> Optional[List[bool]]:
+    """Flag the pages of a PDF that may hold transactions.
+
+    Reads each page's text with pdfium, which takes a fraction of the time of
+    pdfplumber's layout analysis, and flags pages with a date-shaped token.
+    Pages up to and including the first one with any text are always flagged,
+    since statement details are read from it. Returns None if pdfium cannot
+    read the document, in which case every page should be extracted.
+    """
+    with _PDFIUM_LOCK:
+        try:
+            pdf = _open_document(source, password)
+        except pypdfium2.PdfiumError:
+            return None
+        try:
+            flags = []
+            seen_text = False
+            for index in range(len(pdf)):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close()
+                page.close()
+                flags.append(not seen_text or bool(DATE_TOKEN_RE.search(text)))
+                seen_text = seen_text or bool(text.strip())
+            return flags
+        except pypdfium2.PdfiumError:
+            return None
+        finally:
+            pdf.close()
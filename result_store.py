@@ -0,0 +1,139 @@
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class ResultStore:
+    """Thread-safe in-process store of recent results, keyed by random ids.
+
+    Entries expire ``ttl`` seconds after they were stored, and once more than
+    ``max_entries`` are held the oldest ones are dropped.
+    """
+
+    def __init__(self, max_entries: int = 100, ttl: float = 600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, value: Any, key: str = None) -> str:
+        """Store value, under key or a new random id, and return the id."""
+        key = key or uuid.uuid4().hex
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time(), value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return key
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value stored under key, or None if unknown or expired."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            # Entries are in insertion order, so expired ones are at the front
+            while self._entries:
+                oldest = next(iter(self._entries.values()))
+                if oldest[0] >= cutoff:
+                    break
+                self._entries.popitem(last=False)
+            entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SharedResultStore:
+    """ResultStore kept in a directory, so every process of a server sees it.
+
+    Each value is pickled to its own file, written to a temporary name and
+    moved into place, so readers never see a partial entry. Entries expire
+    ``ttl`` seconds after they were stored and the oldest ones are removed
+    past ``max_entries``. Values read back are kept in a small in-process
+    cache, since a results page reads the same statement once per API call.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 100, ttl: float = 600, memo_size: int = 8):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.memo_size = memo_size
+        self._memo: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        # Ids come from URLs; keep them to a file name inside the directory
+        return os.path.join(self.directory, os.path.basename(key) + '.pickle')
+
+    def put(self, value: Any, key: str = None) -> str:
+        key = key or uuid.uuid4().hex
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        with self._lock:
+            self._memo.pop(key, None)
+        self._expire()
+        return key
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        if mtime < time.time() - self.ttl:
+            return None
+        with self._lock:
+            memo = self._memo.get(key)
+            if memo is not None and memo[0] == mtime:
+                self._memo.move_to_end(key)
+                return memo[1]
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        with self._lock:
+            self._memo[key] = (mtime, value)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return value
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.pickle'):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except FileNotFoundError:
+                        pass
+        return sorted(entries)
+
+    def _expire(self) -> None:
+        entries = self._entries()
+        cutoff = time.time() - self.ttl
+        excess = len(entries) - self.max_entries
+        for i, (mtime, path) in enumerate(entries):
+            if mtime >= cutoff and i >= excess:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def __len__(self) -> int:
+        cutoff = time.time() - self.ttl
+        return sum(1 for mtime, _ in self._entries() if mtime >= cutoff)
@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import signal
+import time
+from typing import Any, Dict, Optional
+
+# Limits a parse can run into, as reported by LimitExceeded.limit
+LIMITS = ('wall_time', 'cpu_time', 'memory', 'pages', 'crashed')
+
+DEFAULT_TIMEOUT = 60.0
+
+# Modules the fork server imports once, so each sandboxed parse starts warm
+_PRELOAD = ['enbd_parser', 'pdfplumber', 'page_filter']
+
+
+class LimitExceeded(ValueError):
+    """A parse was stopped by one of its limits.
+
+    ``limit`` is one of LIMITS, ``value`` the limit that was set (seconds,
+    bytes or pages) and ``actual`` what was measured, when known. It is a
+    ValueError, so callers that report unparseable statements report these
+    the same way; ``to_dict()`` gives the fields for JSON responses.
+    """
+
+    def __init__(self, limit: str, value: Any = None, actual: Any = None, message: str = None):
+        self.limit = limit
+        self.value = value
+        self.actual = actual
+        super().__init__(message or f"{limit} limit of {value} exceeded")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'limit': self.limit, 'value': self.value, 'actual': self.actual, 'message': str(self)}
+
+
+def _context():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        # Unlike fork, safe from a threaded server; the preload only takes
+        # effect before the fork server is first started
+        multiprocessing.set_forkserver_preload(_PRELOAD)
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def _set_limits(cpu_time: Optional[float], memory_limit: Optional[int]) -> None:
+    import resource
+
+    if cpu_time:
+        seconds = max(1, int(cpu_time + 0.999))
+        # SIGXCPU at the soft limit, SIGKILL a second later
+        resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 1))
+    if memory_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def _sandbox_child(conn, source, password, layout, limits, options) -> None:
+    """Parse in the sandboxed process and send back ('ok', result) or an error."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        _set_limits(limits.get('cpu_time'), limits.get('memory_limit'))
+        from enbd_parser import ENBDStatementParser
+        from merchants import MerchantMap
+
+        merchant_map = options.pop('merchant_map', None)
+        categorizer = MerchantMap(merchant_map) if merchant_map else None
+        parser = ENBDStatementParser(source, password, categorizer=categorizer,
+                                     max_pages=limits.get('max_pages'), **options)
+        result = parser.parse(layout)
+        if categorizer is not None:
+            categorizer.save()
+        message = ('ok', result)
+    except LimitExceeded as e:
+        message = ('limit', e.to_dict())
+    except MemoryError:
+        message = ('limit', LimitExceeded('memory', limits.get('memory_limit'),
+                                          message=f"memory limit of {limits.get('memory_limit')} bytes "
+                                                  f"exceeded").to_dict())
+    except Exception as e:
+        message = ('error', f"{type(e).__name__}: {e}")
+    try:
+        conn.send(message)
+    except MemoryError:
+        # The result is too large to send within the memory limit
+        conn.send(('limit', {'limit': 'memory', 'value': limits.get('memory_limit'), 'actual': None,
+                             'message': 'memory limit exceeded while sending the result'}))
+    conn.close()
+
+
+def _limit_from(data: Dict[str, Any]) -> LimitExceeded:
+    return LimitExceeded(data['limit'], data.get('value'), data.get('actual'), data.get('message'))
+
+
+def sandboxed_parse(source, password: str = None, layout: str = 'records', timeout: float = DEFAULT_TIMEOUT,
+                    cpu_time: float = None, memory_limit: int = None, max_pages: int = None,
+                    **options) -> Dict[str, Any]:
+    """
+    Run ``ENBDStatementParser.parse()`` in a child process under hard limits.
+
+    Args:
+        source (str, bytes or file object): Path to the PDF file, or its contents
+        password (str, optional): Password for protected PDF file
+        layout (str, optional): "records" (default) or "columnar"
+        timeout (float, optional): Wall-clock seconds before the child is killed;
+            None for no limit
+        cpu_time (float, optional): CPU seconds the child may use (RLIMIT_CPU)
+        memory_limit (int, optional): Bytes of address space the child may map
+            (RLIMIT_AS); an idle child maps about 60 MB
+        max_pages (int, optional): Refuse statements with more pages, before
+            any text is extracted
+        **options: Further ENBDStatementParser arguments (extraction,
+            page_filter, low_memory, memory_budget) and ``merchant_map`` as
+            a JSON file path
+
+    Returns:
+        The ``parse(layout)`` result, with the child's stage durations.
+
+    Raises:
+        LimitExceeded: when a limit is hit or the child dies; the child is
+            always gone by then
+        ValueError: when the statement cannot be parsed
+    """
+    if isinstance(source, os.PathLike):
+        source = os.fspath(source)
+    elif not isinstance(source, (str, bytes)):
+        if hasattr(source, 'read'):
+            source.seek(0)
+            source = source.read()
+        else:
+            source = bytes(source)
+    options.pop('workers', None)
+    limits = {'cpu_time': cpu_time, 'memory_limit': memory_limit, 'max_pages': max_pages}
+
+    context = _context()
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_sandbox_child,
+                              args=(sender, source, password, layout, limits, options), daemon=True)
+    process.start()
+    start = time.monotonic()
+    sender.close()
+    try:
+        message = None
+        if receiver.poll(timeout):
+            try:
+                message = receiver.recv()
+            except EOFError:
+                pass
+        elapsed = time.monotonic() - start
+        if message is None and process.is_alive() and timeout is not None and elapsed >= timeout:
+            raise LimitExceeded('wall_time', timeout, round(elapsed, 3),
+                                f"parse took longer than {timeout:g}s")
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+    if message is not None:
+        status, payload = message
+        if status == 'ok':
+            return payload
+        if status == 'limit':
+            raise _limit_from(payload)
+        raise ValueError(payload)
+
+    exitcode = process.exitcode
+    if exitcode in (-signal.SIGXCPU, -signal.SIGKILL) and cpu_time:
+        raise LimitExceeded('cpu_time', cpu_time, message=f"parse used more than {cpu_time:g}s of CPU")
+    if memory_limit and exitcode in (-signal.SIGSEGV, -signal.SIGABRT, -signal.SIGBUS):
+        # Allocation failures in C code often end this way
+        raise LimitExceeded('memory', memory_limit, message=f"parse died with signal {-exitcode} "
+                                                            f"under a memory limit of {memory_limit} bytes")
+    raise LimitExceeded('crashed', None, exitcode, f"parse process died with exit code {exitcode}")
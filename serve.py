@@ -0,0 +1,254 @@
+"""
+Production server for the web app: a pre-forked pool of worker processes.
+
+The master process imports the app, the PDF libraries and pandas, and runs
+one warm-up parse and render before it opens the listening socket to the
+workers, so each forked worker starts warm and shares those pages with the
+others. Workers accept connections on the shared socket and handle one
+request at a time; each one is replaced after --max-requests requests (plus
+a random jitter, so they do not all restart together) or once its RSS is
+over --max-worker-memory. Results and background job states are kept in a
+directory shared by the workers (ENBD_RESULT_STORE_DIR, or a temporary
+one), so any worker, or its replacement, can answer the API calls of a
+results page.
+
+SIGTERM or SIGINT stops the workers after their current request; SIGHUP
+replaces them all, e.g. after a deploy. A worker that stops, for any of
+these reasons, first waits up to --graceful-timeout seconds for the
+background jobs it accepted, and marks those still unfinished as failed.
+Debug mode is never enabled.
+
+Usage:
+    python serve.py [--host 127.0.0.1] [--port 8000] [--workers N] [--max-requests N]
+"""
+import argparse
+import os
+import random
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict
+
+from werkzeug.serving import BaseWSGIServer
+
+# A one-page statement in the layout the parser expects, for the warm-up parse
+_WARMUP_LINES = [
+    "Statement Period: 01/01/2024 to 31/01/2024",
+    "Card Number: XXXX XXXX XXXX 1234",
+    "01/01/2024 CAREEM HALA RIDE DUBAI AE 25.00",
+    "02/01/2024 TALABAT.COM DUBAI 48.50",
+    "03/01/2024 DEWA BILL PAYMENT 310.20",
+    "04/01/2024 PAYMENT RECEIVED THANK YOU -500.00",
+]
+
+
+def warmup_pdf() -> bytes:
+    """Bytes of a one-page PDF with a few transaction lines."""
+    text = '\n'.join(f"BT /F1 9 Tf 40 {800 - 14 * i} Td ({line}) Tj ET"
+                     for i, line in enumerate(_WARMUP_LINES))
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [4 0 R] /Count 1 >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        "/Resources << /Font << /F1 3 0 R >> >> /Contents 5 0 R >>",
+        f"<< /Length {len(text)} >>\nstream\n{text}\nendstream",
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    out += ''.join(f"{offset:010d} 00000 n \n" for offset in offsets).encode('latin-1')
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+    return out
+
+
+def warm_up(app_module) -> float:
+    """Parse, analyze and render the warm-up statement once; returns seconds.
+
+    Goes around the parse cache, merchant map and metrics, so a warm-up
+    leaves no trace in them.
+    """
+    from enbd_parser import ENBDStatementParser
+
+    start = time.perf_counter()
+    parser = ENBDStatementParser(warmup_pdf())
+    statement = app_module.StatementView([txn.to_dict() for txn in parser.iter_transactions()])
+    with app_module.app.test_request_context():
+        app_module.render_results('warmup', statement, metrics=None).get_data()
+    return time.perf_counter() - start
+
+
+class WorkerServer(BaseWSGIServer):
+    """Single-threaded WSGI server on an inherited socket that counts requests."""
+
+    handled = 0
+
+    def process_request(self, request, client_address):
+        try:
+            super().process_request(request, client_address)
+        finally:
+            self.handled += 1
+
+
+def _log(message: str) -> None:
+    print(f"[{os.getpid()}] {message}", file=sys.stderr, flush=True)
+
+
+def run_worker(app, listener: socket.socket, max_requests: int, max_memory: int = None) -> None:
+    """Serve requests until told to stop, the request limit or the memory limit."""
+    from instrumentation import current_rss
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    master = os.getppid()
+    host, port = listener.getsockname()[:2]
+    server = WorkerServer(host, port, app, fd=listener.fileno())
+    # Wake up every second to notice signals and a dead master. The socket is
+    # shared, so another worker may take a connection this one was woken
+    # for; with a timeout on the socket, accept then returns to the loop.
+    # (A non-blocking socket would make handle_request poll without waiting.)
+    server.timeout = 1.0
+    server.socket.settimeout(1.0)
+    while not stopping and os.getppid() == master:
+        server.handle_request()
+        if max_requests and server.handled >= max_requests:
+            _log(f"recycling after {server.handled} requests")
+            break
+        rss = current_rss() if max_memory else None
+        if rss is not None and rss > max_memory:
+            _log(f"recycling at {rss / 2 ** 20:.0f} MB RSS after {server.handled} requests")
+            break
+
+
+def finish_jobs(app_module, timeout: float) -> None:
+    """Wait for the worker's background jobs before it exits; fail the rest."""
+    failed = app_module.shutdown_jobs(timeout)
+    if failed:
+        _log(f"failed {failed} background jobs still unfinished after {timeout:g}s")
+
+
+def serve(host: str = '127.0.0.1', port: int = 8000, workers: int = 2, max_requests: int = 1000,
+          max_requests_jitter: int = 50, max_worker_memory: int = None, warmup: bool = True,
+          graceful_timeout: float = 30) -> int:
+    """Run the pre-forked server until SIGTERM or SIGINT; returns the exit status."""
+    if not hasattr(os, 'fork'):
+        print("serve.py needs os.fork; run app.py on this platform", file=sys.stderr)
+        return 1
+
+    shared_dir = None
+    # Also with one worker, so its replacement finds the jobs it finished
+    if not os.environ.get('ENBD_RESULT_STORE_DIR'):
+        shared_dir = tempfile.mkdtemp(prefix='enbd-results-')
+        os.environ['ENBD_RESULT_STORE_DIR'] = shared_dir
+    import app as app_module
+    app_module.app.debug = False
+    if shared_dir:
+        app_module.app.config['RESULT_STORE_DIR'] = shared_dir
+
+    if warmup:
+        _log(f"warmed up in {warm_up(app_module):.2f}s")
+
+    listener = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(128)
+    _log(f"listening on http://{host}:{listener.getsockname()[1]} with {workers} workers")
+
+    children: Dict[int, float] = {}
+    state = {'stopping': False}
+
+    def spawn() -> None:
+        limit = max_requests + random.randint(0, max_requests_jitter) if max_requests else 0
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                random.seed()
+                run_worker(app_module.app, listener, limit, max_worker_memory)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                status = 1
+            try:
+                finish_jobs(app_module, graceful_timeout)
+            finally:
+                os._exit(status)
+        children[pid] = time.time()
+
+    def stop(signum, frame) -> None:
+        state['stopping'] = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def recycle(signum, frame) -> None:
+        _log("replacing all workers")
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, recycle)
+    try:
+        for _ in range(workers):
+            spawn()
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = children.pop(pid, None)
+            if started is None or state['stopping']:
+                continue
+            if os.waitstatus_to_exitcode(status) != 0 and time.time() - started < 1:
+                # Crashing right after start; do not fork in a tight loop
+                time.sleep(1)
+            spawn()
+    finally:
+        listener.close()
+        if shared_dir:
+            shutil.rmtree(shared_dir, ignore_errors=True)
+    _log("stopped")
+    return 0
+
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Serve the statement parser web app with pre-forked workers.')
+    arg_parser.add_argument('--host', default=os.environ.get('ENBD_HOST', '127.0.0.1'),
+                            help='address to listen on (default: 127.0.0.1)')
+    arg_parser.add_argument('--port', type=int, default=int(os.environ.get('ENBD_PORT', 8000)),
+                            help='port to listen on (default: 8000)')
+    arg_parser.add_argument('-w', '--workers', type=int, default=int(os.environ.get('ENBD_WORKERS', os.cpu_count() or 1)),
+                            help='worker processes (default: CPU count)')
+    arg_parser.add_argument('--max-requests', type=int, default=1000,
+                            help='replace a worker after this many requests, 0 for never (default: 1000)')
+    arg_parser.add_argument('--max-requests-jitter', type=int, default=50,
+                            help='random extra requests per worker, to stagger restarts (default: 50)')
+    arg_parser.add_argument('--max-worker-memory', type=int, metavar='MB',
+                            help='replace a worker once its RSS is over this many MB')
+    arg_parser.add_argument('--graceful-timeout', type=float, default=30,
+                            help='seconds a stopping worker waits for its background jobs (default: 30)')
+    arg_parser.add_argument('--no-warmup', dest='warmup', action='store_false',
+                            help='skip the warm-up parse before forking')
+    args = arg_parser.parse_args(argv)
+    return serve(args.host, args.port, max(1, args.workers), args.max_requests, args.max_requests_jitter,
+                 args.max_worker_memory * 1024 * 1024 if args.max_worker_memory else None, args.warmup,
+                 args.graceful_timeout)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
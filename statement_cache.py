@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, Optional, Union, BinaryIO
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(source: Union[str, bytes, BinaryIO]) -> str:
+    """Return the SHA-256 hex digest of a PDF given as a path, bytes or binary file."""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    else:
+        position = source.tell()
+        source.seek(0)
+        for chunk in iter(lambda: source.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+        source.seek(position)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """On-disk cache of parse results keyed by PDF content and parser version.
+
+    Each entry is one JSON file named after its key. Entries are written to a
+    temporary file and moved into place with ``os.replace``, so concurrent
+    readers only ever see complete entries and concurrent writers of the same
+    key simply replace each other. A hit refreshes the entry's mtime, and once
+    the directory grows past ``max_bytes`` the least recently used entries are
+    removed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(source: Union[str, bytes, BinaryIO], version: str, password: str = None) -> str:
+        """Build the cache key of a PDF.
+
+        The password is part of the key so a cached result of an encrypted
+        statement is only returned to callers that could open it themselves.
+        """
+        parts = [version, file_digest(source), password or '']
+        return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached value for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except ValueError:
+            # Not written by this class; drop it and parse again
+            self._remove(path)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # Evicted by another process after we read it
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Store value under key, then evict old entries if over the size limit."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.startswith('.') or not entry.name.endswith('.json'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            self._remove(path)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.json'):
+                    self._remove(entry.path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
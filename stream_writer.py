@@ -0,0 +1,93 @@
+import json
+import shutil
+import tempfile
+from typing import Any, BinaryIO, Callable, Dict
+
+# "json" is the original indented document and is written by json.dump, since
+# it needs the complete result. The other formats are written as rows arrive.
+OUTPUT_FORMATS = ('json', 'compact', 'ndjson')
+STREAMING_FORMATS = ('compact', 'ndjson')
+
+_SPOOL_SIZE = 1024 * 1024
+
+
+def _stdlib_encoder(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def get_encoder(backend: str = 'auto') -> Callable[[Any], bytes]:
+    """Return a function that encodes one JSON value to compact UTF-8 bytes.
+
+    ``backend`` is "json", "orjson" or "auto", which uses orjson when it is
+    installed and the standard library otherwise.
+    """
+    if backend in ('auto', 'orjson'):
+        try:
+            import orjson
+        except ImportError:
+            if backend == 'orjson':
+                raise
+        else:
+            return orjson.dumps
+    return _stdlib_encoder
+
+
+class StatementWriter:
+    """Write a parsed statement to a binary stream one transaction at a time.
+
+    ``compact`` writes the same document as ``parse_statement()`` without
+    indentation. Rows go out as soon as they are added; the income and expense
+    copies are spooled to temporary files (in memory up to 1 MB) and appended
+    after the summary. ``ndjson`` writes a ``{"statement_info": ...}`` line,
+    one line per transaction and a closing ``{"summary": ..., "metadata": ...}``
+    line, so nothing is buffered at all.
+
+    Call ``begin()`` once, ``add()`` for every transaction and ``finish()``.
+    """
+
+    def __init__(self, fp: BinaryIO, fmt: str = 'compact', backend: str = 'auto'):
+        if fmt not in STREAMING_FORMATS:
+            raise ValueError(f"Unknown streaming format {fmt!r}, expected one of {STREAMING_FORMATS}")
+        self.fp = fp
+        self.fmt = fmt
+        self.encode = get_encoder(backend)
+        self.count = 0
+        self._spools = {}
+
+    def begin(self, statement_info: Dict[str, Any]) -> None:
+        if self.fmt == 'ndjson':
+            self.fp.write(self.encode({'statement_info': statement_info}) + b'\n')
+            return
+        self.fp.write(b'{"statement_info":' + self.encode(statement_info) + b',"transactions":[')
+        self._spools = {
+            'Income': tempfile.SpooledTemporaryFile(max_size=_SPOOL_SIZE),
+            'Expense': tempfile.SpooledTemporaryFile(max_size=_SPOOL_SIZE),
+        }
+
+    def add(self, txn: Any) -> None:
+        row = self.encode(txn.to_dict() if hasattr(txn, 'to_dict') else txn)
+        if self.fmt == 'ndjson':
+            self.fp.write(row + b'\n')
+        else:
+            if self.count:
+                self.fp.write(b',')
+            self.fp.write(row)
+            spool = self._spools['Income' if txn['type'] == 'Income' else 'Expense']
+            if spool.tell():
+                spool.write(b',')
+            spool.write(row)
+        self.count += 1
+
+    def finish(self, summary: Dict[str, Any], metadata: Dict[str, Any]) -> None:
+        if self.fmt == 'ndjson':
+            self.fp.write(self.encode({'summary': summary, 'metadata': metadata}) + b'\n')
+            return
+        self.fp.write(b'],"summary":' + self.encode(summary))
+        for key, type_name in (('income_transactions', 'Income'), ('expense_transactions', 'Expense')):
+            spool = self._spools[type_name]
+            self.fp.write(b',"' + key.encode('ascii') + b'":[')
+            spool.seek(0)
+            shutil.copyfileobj(spool, self.fp)
+            spool.close()
+            self.fp.write(b']')
+        self.fp.write(b',"metadata":' + self.encode(metadata) + b'}')
@@ -0,0 +1,111 @@
+import re
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DATE_RE = re.compile(r'\d{2}/\d{2}/\d{4}')
+AMOUNT_RE = re.compile(r'-?\d[\d,]*(?:\.\d+)?')
+
+# Words whose tops are this close (in points) belong to the same line
+LINE_TOLERANCE = 3
+# Slack around detected column edges, in points
+COLUMN_TOLERANCE = 4
+
+Word = Dict[str, Any]
+
+
+def group_lines(words: List[Word]) -> List[List[Word]]:
+    """Group words into lines by their top coordinate, each sorted left to right."""
+    lines = []
+    current = []
+    current_top = None
+    for word in sorted(words, key=lambda w: (round(w['top']), w['x0'])):
+        if current and abs(word['top'] - current_top) > LINE_TOLERANCE:
+            lines.append(sorted(current, key=lambda w: w['x0']))
+            current = []
+        if not current:
+            current_top = word['top']
+        current.append(word)
+    if current:
+        lines.append(sorted(current, key=lambda w: w['x0']))
+    return lines
+
+
+def line_text(line: List[Word]) -> str:
+    return ' '.join(word['text'] for word in line)
+
+
+def _row_parts(line: List[Word]) -> Optional[Tuple[Word, List[Word], Word]]:
+    """Split a line into (date word, description words, amount word) if it has
+    a leading date, a trailing amount and something in between."""
+    if len(line) < 3:
+        return None
+    first, last = line[0], line[-1]
+    if not DATE_RE.fullmatch(first['text']) or not AMOUNT_RE.fullmatch(last['text']):
+        return None
+    middle = line[1:-1]
+    # A second leading date is the posting date, not part of the description
+    if middle and DATE_RE.fullmatch(middle[0]['text']):
+        middle = middle[1:]
+    if not middle:
+        return None
+    return first, middle, last
+
+
+class TransactionRegion:
+    """Column geometry of a statement's transaction table.
+
+    Detected once per statement from the first page with transaction rows:
+    the date column is where row-leading dates sit, the amount column is where
+    the right-aligned trailing amounts end, and everything between is the
+    description. Later pages are cropped to the table's horizontal extent
+    before their words are extracted, and rows are assembled by position.
+    """
+
+    def __init__(self, date_x0: float, date_x1: float, amount_x0: float, amount_x1: float):
+        self.date_x0 = date_x0
+        self.date_x1 = date_x1
+        self.amount_x0 = amount_x0
+        self.amount_x1 = amount_x1
+
+    @classmethod
+    def detect(cls, lines: List[List[Word]]) -> Optional['TransactionRegion']:
+        """Find the table columns from lines of words, or None without rows.
+
+        Table rows share the left edge of their dates and the right edge of
+        their amounts, so the most common edges pick out the table and stray
+        lines that merely start with a date and end with a number are ignored.
+        """
+        rows = [parts for parts in map(_row_parts, lines) if parts]
+        if not rows:
+            return None
+        date_left = Counter(round(date['x0']) for date, _, _ in rows).most_common(1)[0][0]
+        amount_right = Counter(round(amount['x1']) for _, _, amount in rows).most_common(1)[0][0]
+        rows = [(date, description, amount) for date, description, amount in rows
+                if abs(date['x0'] - date_left) <= COLUMN_TOLERANCE
+                and abs(amount['x1'] - amount_right) <= COLUMN_TOLERANCE]
+        return cls(
+            date_x0=min(date['x0'] for date, _, _ in rows),
+            date_x1=max(date['x1'] for date, _, _ in rows),
+            amount_x0=min(amount['x0'] for _, _, amount in rows),
+            amount_x1=max(amount['x1'] for _, _, amount in rows),
+        )
+
+    def bbox(self, page) -> Tuple[float, float, float, float]:
+        """Crop box of the table on a page: the table's columns, full height."""
+        x0 = max(page.bbox[0], self.date_x0 - COLUMN_TOLERANCE)
+        x1 = min(page.bbox[2], self.amount_x1 + COLUMN_TOLERANCE)
+        return (x0, page.bbox[1], x1, page.bbox[3])
+
+    def rows(self, lines: List[List[Word]]) -> Iterator[Tuple[str, str, str]]:
+        """Yield (date, description, amount) for every line that fits the columns."""
+        for line in lines:
+            parts = _row_parts(line)
+            if parts is None:
+                continue
+            date, description, amount = parts
+            if abs(date['x0'] - self.date_x0) > COLUMN_TOLERANCE:
+                continue
+            # Amounts are right-aligned, so their right edges line up
+            if abs(amount['x1'] - self.amount_x1) > COLUMN_TOLERANCE:
+                continue
+            yield date['text'], line_text(description), amount['text']
@@ -0,0 +1,165 @@
+from array import array
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Union
+
+TRANSACTION_FIELDS = ('date', 'description', 'amount', 'type', 'category')
+TRANSACTION_TYPES = ('Expense', 'Income')
+
+
+@lru_cache(maxsize=4096)
+def parse_date(text: str) -> Optional[date]:
+    """Parse a DD/MM/YYYY statement date, or return None if it is not a valid one.
+
+    Slices the fixed-width fields instead of going through strptime; a
+    statement has few distinct dates, so results are cached.
+    """
+    if len(text) != 10 or text[2] != '/' or text[5] != '/':
+        return None
+    try:
+        return date(int(text[6:]), int(text[3:5]), int(text[:2]))
+    except ValueError:
+        return None
+
+
+class Transaction:
+    """One statement row.
+
+    Attribute access is the fast path, but ``txn['amount']`` and ``dict(txn)``
+    keep working for code written against the plain transaction dicts.
+    """
+
+    __slots__ = TRANSACTION_FIELDS
+
+    def __init__(self, date: str, description: str, amount: float, type: str, category: str):
+        self.date = date
+        self.description = description
+        self.amount = amount
+        self.type = type
+        self.category = category
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in TRANSACTION_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in TRANSACTION_FIELDS else default
+
+    def keys(self):
+        return TRANSACTION_FIELDS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in TRANSACTION_FIELDS}
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Transaction):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __repr__(self) -> str:
+        return f"Transaction({self.date!r}, {self.description!r}, {self.amount!r}, {self.type!r}, {self.category!r})"
+
+
+class TransactionView:
+    """Lazily filtered view of the rows of one transaction type."""
+
+    def __init__(self, table: 'TransactionTable', type_name: str):
+        self._table = table
+        self._code = TRANSACTION_TYPES.index(type_name)
+
+    def indices(self) -> List[int]:
+        """Row numbers of the transactions in this view."""
+        code = self._code
+        return [i for i, t in enumerate(self._table.types) if t == code]
+
+    def __len__(self) -> int:
+        return self._table.types.count(self._code)
+
+    def __iter__(self) -> Iterator[Transaction]:
+        table = self._table
+        code = self._code
+        for i, t in enumerate(table.types):
+            if t == code:
+                yield table[i]
+
+
+class TransactionTable:
+    """Column-oriented transaction storage.
+
+    Amounts live in a ``double`` array, types and categories as small integer
+    codes and repeated date strings are shared, so a row costs a fraction of
+    a five-key dict. Dates are also kept as proleptic Gregorian ordinals (0
+    for an unparseable date) so analytics need not parse the strings again.
+    Rows are materialized as ``Transaction`` objects only when read, and the
+    income/expense views filter the type column on demand instead of copying
+    rows into extra lists.
+    """
+
+    def __init__(self, rows: Iterator[Union[Transaction, Mapping[str, Any]]] = ()):
+        self.dates: List[str] = []
+        self.ordinals = array('i')
+        self.descriptions: List[str] = []
+        self.amounts = array('d')
+        self.types = bytearray()
+        self.categories = array('H')
+        self.category_names: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+        self._dates: Dict[str, tuple] = {}
+        self.extend(rows)
+
+    def append(self, txn: Union[Transaction, Mapping[str, Any]]) -> None:
+        category = txn['category']
+        code = self._category_codes.get(category)
+        if code is None:
+            code = self._category_codes[category] = len(self.category_names)
+            self.category_names.append(category)
+        text = txn['date']
+        interned = self._dates.get(text)
+        if interned is None:
+            parsed = parse_date(text)
+            interned = self._dates[text] = (text, parsed.toordinal() if parsed else 0)
+        self.dates.append(interned[0])
+        self.ordinals.append(interned[1])
+        self.descriptions.append(txn['description'])
+        self.amounts.append(txn['amount'])
+        self.types.append(TRANSACTION_TYPES.index(txn['type']))
+        self.categories.append(code)
+
+    def extend(self, rows: Iterator[Union[Transaction, Mapping[str, Any]]]) -> None:
+        for txn in rows:
+            self.append(txn)
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def __getitem__(self, index: int) -> Transaction:
+        return Transaction(self.dates[index], self.descriptions[index], self.amounts[index],
+                           TRANSACTION_TYPES[self.types[index]],
+                           self.category_names[self.categories[index]])
+
+    def __iter__(self) -> Iterator[Transaction]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def income(self) -> TransactionView:
+        return TransactionView(self, 'Income')
+
+    @property
+    def expense(self) -> TransactionView:
+        return TransactionView(self, 'Expense')
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Rows as plain dicts, in the original transaction schema."""
+        return [txn.to_dict() for txn in self]
+
+    def to_columns(self) -> Dict[str, List[Any]]:
+        """Columns as plain lists, keyed by field name."""
+        return {
+            'date': list(self.dates),
+            'description': list(self.descriptions),
+            'amount': self.amounts.tolist(),
+            'type': [TRANSACTION_TYPES[t] for t in self.types],
+            'category': [self.category_names[c] for c in self.categories],
+        }
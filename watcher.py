@@ -0,0 +1,404 @@
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from enbd_parser import parse_statement
+from instrumentation import MetricsRegistry
+from statement_cache import file_digest
+
+# Bump when the index layout changes; an index of another version is ignored
+INDEX_VERSION = 1
+INDEX_NAME = '.watch-index.json'
+
+# (size, mtime in ns) of a file when it was looked at
+FileState = Tuple[int, int]
+
+
+def _write_atomic(path: str, text: str) -> None:
+    """Replace path with text, so readers never see a partial file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def output_name(name: str) -> str:
+    """File name of the JSON result of a statement PDF."""
+    return os.path.splitext(name)[0] + '.json'
+
+
+def _ignore_sigint() -> None:
+    # Ctrl-C reaches the whole process group; the watcher lets workers finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _watch_parse(path: str, output_path: str, password: str = None,
+                 options: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Parse one statement into output_path; runs inside a worker process."""
+    start = time.perf_counter()
+    try:
+        result = parse_statement(path, password=password, **(options or {}))
+        _write_atomic(output_path, json.dumps(result, indent=2, ensure_ascii=False))
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {e}", 'seconds': time.perf_counter() - start}
+    return {
+        'pages': result['metadata']['page_count'],
+        'transactions': result['summary']['total_transactions'],
+        'stages': result['metadata']['stages'],
+        'seconds': time.perf_counter() - start
+    }
+
+
+class Watcher:
+    """Parse the statements dropped into a directory, each new or changed file once.
+
+    Every ``interval`` seconds the directory is listed and the size and mtime
+    of each PDF compared with the index of processed files; a restart only
+    stats the files. A new or changed file waits until it has not been
+    modified for ``settle`` seconds, in case it is still being copied in, and
+    is then hashed. Content processed before (a touched file, or a copy under
+    another name) only updates the index; anything else goes to a pool of
+    ``workers`` processes that write ``<name>.json`` to the output directory.
+    A file that failed is retried once it changes.
+
+    A worker that dies (out of memory, say) breaks the pool; it is replaced,
+    and the files that were in flight are parsed again one at a time, so only
+    the file that takes its process down is recorded as failed.
+
+    The index is a JSON file, saved after every batch of finished files.
+    Throughput and backlog are kept in ``metrics`` (see ``stats``).
+    """
+
+    def __init__(self, directory: str, output_dir: str, workers: int = 1, password: str = None,
+                 options: Dict[str, Any] = None, index_path: str = None, interval: float = 1.0,
+                 settle: float = 2.0):
+        self.directory = directory
+        self.output_dir = output_dir
+        self.workers = workers
+        self.password = password
+        self.options = options or {}
+        self.index_path = index_path or os.path.join(output_dir, INDEX_NAME)
+        self.interval = interval
+        self.settle = settle
+        self.metrics = MetricsRegistry('enbd_watch')
+        self.counts: Dict[str, int] = {}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._digests: Dict[str, str] = {}
+        self._waiting: Dict[str, FileState] = {}
+        self._ready = deque()
+        self._running = {}
+        self._queued = set()
+        self._queued_digests = set()
+        # Files that were in flight when a worker died, run alone until they finish
+        self._suspects = set()
+        self._broken = False
+        self._dirty = False
+        self._stopping = False
+        self.started = time.time()
+        os.makedirs(output_dir, exist_ok=True)
+        self.load()
+
+    def load(self) -> None:
+        """Read the index of processed files, if there is one of this version."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        except ValueError as e:
+            raise ValueError(f"{self.index_path} is not a watch index: {e}") from None
+        self.files = dict(data.get('files', {})) if data.get('version') == INDEX_VERSION else {}
+        self._digests = {entry['digest']: name for name, entry in self.files.items()
+                         if entry.get('status') == 'ok'}
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        _write_atomic(self.index_path, json.dumps({'version': INDEX_VERSION, 'files': self.files},
+                                                  indent=1, ensure_ascii=False))
+        self._dirty = False
+
+    def _count(self, name: str, n: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + n
+        self.metrics.increment(name, n)
+
+    def scan(self) -> None:
+        """List the directory and queue the files that are new or changed and settled."""
+        now = time.time()
+        present = set()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith('.pdf') or not entry.is_file():
+                    continue
+                name = entry.name
+                present.add(name)
+                if name in self._queued:
+                    # A later change is noticed once this run of it is recorded
+                    continue
+                stat = entry.stat()
+                state = (stat.st_size, stat.st_mtime_ns)
+                known = self.files.get(name)
+                if known is not None and (known['size'], known['mtime_ns']) == state:
+                    continue
+                if now - stat.st_mtime < self.settle:
+                    self._waiting[name] = state
+                    continue
+                self._waiting.pop(name, None)
+                if not stat.st_size:
+                    # Settled but empty: recorded as failed, and looked at again once written
+                    try:
+                        self._record(name, state, file_digest(entry.path), {'error': 'empty file'})
+                    except OSError:
+                        pass
+                    continue
+                self._queue(name, state)
+        for name in set(self._waiting) - present:
+            del self._waiting[name]
+
+    def _queue(self, name: str, state: FileState) -> None:
+        try:
+            digest = file_digest(os.path.join(self.directory, name))
+        except OSError:
+            # Removed or replaced while being hashed; the next scan sees it again
+            return
+        known = self.files.get(name)
+        if known is not None and known['digest'] == digest:
+            known['size'], known['mtime_ns'] = state
+            self._dirty = True
+            self._count('files_unchanged')
+            return
+        original = self._digests.get(digest)
+        if original is not None and original in self.files:
+            self.files[name] = {'size': state[0], 'mtime_ns': state[1], 'digest': digest,
+                                'status': 'duplicate', 'duplicate_of': original,
+                                'output': self.files[original]['output'],
+                                'processed_at': datetime.now().isoformat()}
+            self._dirty = True
+            self._count('files_duplicate')
+            return
+        if digest in self._queued_digests:
+            # A copy of a file being parsed; it is a duplicate once that one is done
+            self._waiting[name] = state
+            return
+        self._ready.append((name, state, digest))
+        self._queued.add(name)
+        self._queued_digests.add(digest)
+
+    def dispatch(self, executor) -> None:
+        """Hand queued files to the pool, keeping at most two per worker in flight.
+
+        A suspect file only runs with nothing else in flight.
+        """
+        from concurrent.futures.process import BrokenProcessPool
+
+        while self._ready and len(self._running) < self.workers * 2 and not self._stopping:
+            name, state, digest = self._ready[0]
+            alone = name in self._suspects
+            if self._running and (alone or any(entry[3] for entry in self._running.values())):
+                break
+            try:
+                future = executor.submit(_watch_parse, os.path.join(self.directory, name),
+                                         os.path.join(self.output_dir, output_name(name)),
+                                         self.password, self.options)
+            except BrokenProcessPool:
+                self._broken = True
+                break
+            self._ready.popleft()
+            self._running[future] = (name, state, digest, alone)
+
+    def collect(self, timeout: float = None) -> None:
+        """Record the files finished within timeout seconds, then save the index."""
+        from concurrent.futures import FIRST_COMPLETED, wait
+        from concurrent.futures.process import BrokenProcessPool
+
+        if not self._running:
+            if timeout:
+                time.sleep(timeout)
+            return
+        done, _ = wait(self._running, timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            name, state, digest, alone = self._running.pop(future)
+            try:
+                record = future.result()
+            except BrokenProcessPool as e:
+                # A worker died; the pool is replaced before anything else runs
+                self._broken = True
+                if not alone:
+                    # Any of the files in flight may have done it; find out on its own
+                    self._suspects.add(name)
+                    self._ready.appendleft((name, state, digest))
+                    continue
+                record = {'error': f"{type(e).__name__}: the parse process died", 'seconds': 0.0}
+            except Exception as e:
+                record = {'error': f"{type(e).__name__}: {e}", 'seconds': 0.0}
+            self._queued.discard(name)
+            self._queued_digests.discard(digest)
+            self._suspects.discard(name)
+            self._record(name, state, digest, record)
+        self.save()
+
+    def _record(self, name: str, state: FileState, digest: str, record: Dict[str, Any]) -> None:
+        entry = {'size': state[0], 'mtime_ns': state[1], 'digest': digest,
+                 'processed_at': datetime.now().isoformat()}
+        if 'error' in record:
+            entry.update(status='error', error=record['error'])
+            self._count('files_failed')
+            print(f"Error: {name}: {record['error']}", file=sys.stderr)
+        else:
+            entry.update(status='ok', output=output_name(name), pages=record['pages'],
+                         transactions=record['transactions'])
+            self._digests[digest] = name
+            self._count('files_processed')
+            self._count('pages_processed', record['pages'])
+            self._count('transactions_processed', record['transactions'])
+            for stage, seconds in record['stages'].items():
+                self.metrics.observe(stage, seconds)
+            self.metrics.observe('file', record['seconds'])
+            print(f"{name}: {record['transactions']} transactions, {record['pages']} pages "
+                  f"in {record['seconds']:.2f}s ({self.backlog()} waiting)", file=sys.stderr)
+        self.files[name] = entry
+        self._dirty = True
+
+    def backlog(self) -> int:
+        """Files seen but not finished: still settling, queued or being parsed."""
+        return len(self._waiting) + len(self._ready) + len(self._running)
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = time.time() - self.started
+        processed = self.counts.get('files_processed', 0)
+        return {
+            'files_processed': processed,
+            'files_failed': self.counts.get('files_failed', 0),
+            'files_duplicate': self.counts.get('files_duplicate', 0),
+            'files_unchanged': self.counts.get('files_unchanged', 0),
+            'pages_processed': self.counts.get('pages_processed', 0),
+            'settling': len(self._waiting),
+            'queued': len(self._ready),
+            'in_flight': len(self._running),
+            'backlog': self.backlog(),
+            'indexed': len(self.files),
+            'uptime_seconds': round(elapsed, 3),
+            'files_per_second': round(processed / elapsed, 3) if elapsed else None,
+            'pages_per_second': round(self.counts.get('pages_processed', 0) / elapsed, 3) if elapsed else None
+        }
+
+    def publish(self, metrics_path: str = None) -> None:
+        """Update the backlog gauges and write the metrics file, if any."""
+        stats = self.stats()
+        for gauge in ('backlog', 'settling', 'queued', 'in_flight', 'indexed'):
+            self.metrics.set_gauge(gauge, stats[gauge])
+        if metrics_path:
+            _write_atomic(metrics_path, self.metrics.render())
+
+    def stop(self) -> None:
+        """Finish the files being parsed, then return from run()."""
+        self._stopping = True
+
+    def _pool(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_ignore_sigint)
+
+    def _replace_pool(self, executor):
+        """Start a new pool once every future of the broken one is accounted for."""
+        while self._running:
+            self.collect()
+        executor.shutdown()
+        self._broken = False
+        self._count('pool_restarts')
+        print(f"A parse process died; restarted the pool ({len(self._suspects)} files to retry)",
+              file=sys.stderr)
+        return self._pool()
+
+    def run(self, once: bool = False, metrics_path: str = None) -> Dict[str, Any]:
+        """Watch until stop(), or with once=True until the directory is processed; returns stats()."""
+        executor = self._pool()
+        try:
+            while not self._stopping:
+                self.scan()
+                if once and not self.backlog():
+                    break
+                self.dispatch(executor)
+                self.collect(self.interval)
+                if self._broken:
+                    executor = self._replace_pool(executor)
+                self.publish(metrics_path)
+            while self._running:
+                self.collect()
+        finally:
+            executor.shutdown()
+            self.save()
+            self.publish(metrics_path)
+        return self.stats()
+
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point for ``enbd_parser.py watch``."""
+    import argparse
+
+    from enbd_parser import EXTRACTION_MODES, LAYOUTS
+
+    arg_parser = argparse.ArgumentParser(
+        prog='enbd_parser.py watch',
+        description='Parse statements as they land in a directory, each new or changed file once.')
+    arg_parser.add_argument('directory', help='directory to watch for statement PDFs')
+    arg_parser.add_argument('output_dir', help='directory to write <name>.json results to')
+    arg_parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                            help='parallel parse processes (default: CPU count)')
+    arg_parser.add_argument('-p', '--password', help='password for protected statements')
+    arg_parser.add_argument('--index', help=f'processed-files index (default: OUTPUT_DIR/{INDEX_NAME})')
+    arg_parser.add_argument('--interval', type=float, default=1.0,
+                            help='seconds between directory scans (default: 1)')
+    arg_parser.add_argument('--settle', type=float, default=2.0,
+                            help='seconds a file must be left unmodified before it is parsed (default: 2)')
+    arg_parser.add_argument('--once', action='store_true',
+                            help='process what is in the directory, then exit')
+    arg_parser.add_argument('--metrics-file', metavar='PATH',
+                            help='keep throughput and backlog metrics here, in the Prometheus text format')
+    arg_parser.add_argument('--layout', choices=LAYOUTS, default='records',
+                            help='result layout (default: records)')
+    arg_parser.add_argument('--extraction', choices=EXTRACTION_MODES, default='text',
+                            help='read rows from page text or from word positions (default: text)')
+    arg_parser.add_argument('--no-page-filter', dest='page_filter', action='store_false',
+                            help='fully extract every page, even those without dates')
+    arg_parser.add_argument('--merchant-map', metavar='PATH',
+                            help='categorize through, and learn into, this merchant map JSON file')
+    arg_parser.add_argument('--low-memory', action='store_true',
+                            help='reopen each PDF every few pages to keep memory flat')
+    args = arg_parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        arg_parser.error(f'{args.directory}: not a directory')
+    if args.workers < 1:
+        arg_parser.error('--workers must be at least 1')
+    if args.interval <= 0 or args.settle < 0:
+        arg_parser.error('--interval must be positive and --settle not negative')
+
+    options = {'layout': args.layout, 'extraction': args.extraction, 'page_filter': args.page_filter,
+               'merchant_map': args.merchant_map, 'low_memory': args.low_memory}
+    watcher = Watcher(args.directory, args.output_dir, args.workers, args.password, options,
+                      args.index, args.interval, args.settle)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: watcher.stop())
+    print(f"Watching {args.directory} ({len(watcher.files)} files indexed)", file=sys.stderr)
+    stats = watcher.run(args.once, args.metrics_file)
+    print(f"Processed {stats['files_processed'] + stats['files_failed']} files ({stats['files_failed']} failed, "
+          f"{stats['files_duplicate']} duplicates, {stats['files_unchanged']} unchanged) and "
+          f"{stats['pages_processed']} pages: {stats['files_per_second']} files/s, "
+          f"{stats['pages_per_second']} pages/s", file=sys.stderr)
+    return 1 if args.once and stats['files_failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())